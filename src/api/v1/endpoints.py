@@ -1,34 +1,229 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from asyncpg.pool import Pool
+from typing import Optional
+import asyncio
+import time
 
-from src.schemas.user import ChatRequest
+from src.core.config import settings
+from src.core.encoding import FastJSONResponse, dumps
+from src.core.metrics import registry
+from src.schemas.job import JobSearchRequest
+from src.schemas.user import ChatBatchRequest, ChatRequest, UserProfile
+from src.services.admission import AdmissionRejected, admission
 from src.services.user_service import get_user_profile
-from src.services.chat_service import run_chat
-from src.db.session import get_db_pool
+from src.dependencies.tools import MAX_PAGE_SIZE, PAGE_SIZE, recommend_jobs, search_jobs
+from src.services.batch_service import run_chat_batch
+from src.services.chat_service import run_chat, stream_chat
+from src.services.history_service import Conversation, load_conversation_safely
+from src.services.intent_router import router_stats
+from src.services.recommendations import recommendations
+from src.services.saved_searches import saved_searches
+from src.db.job_search import search_stats
+from src.db.session import db_manager, get_db_pool
+from src.services.dimension_cache import dimension_cache
+from src.services.health_monitor import health_monitor
+from src.services.job_index import job_index
+from src.services.job_ranker import job_ranker
+from src.services.profile_cache import profile_cache
+from src.services.response_cache import response_cache
 
 router = APIRouter()
 
+chat_seconds = registry.histogram("chat_seconds", "End-to-end /chat requests, by response type", ("response_type",))
+
+async def load_chat_context(request: ChatRequest, pool: Pool) -> tuple[Optional[UserProfile], Optional[Conversation]]:
+    # The profile and the conversation history are independent, so fetch them concurrently
+    if not settings.history_enabled:
+        return await get_user_profile(request.user_id, pool), None
+    return await asyncio.gather(
+        get_user_profile(request.user_id, pool),
+        load_conversation_safely(pool, request.user_id, request.session_id),
+    )
+
 @router.post("/chat")
 async def chat(request: ChatRequest, pool: Pool = Depends(get_db_pool)):
-    # No more global variable checks needed!
-    user_profile = await get_user_profile(request.user_id, pool)
+    started = time.perf_counter()
+    response_type = "exception"
+    try:
+        user_profile, conversation = await load_chat_context(request, pool)
+        if not user_profile:
+            response_type = "not_found"
+            raise HTTPException(404, detail="User profile not found")
+
+        response = await run_chat(
+            user_message=request.message,
+            user_profile=user_profile,
+            pool=pool,
+            conversation=conversation,
+            user_id=request.user_id,
+        )
+        response_type = response["response_type"]
+        return FastJSONResponse(response)
+    except AdmissionRejected:
+        # Answered 429/503 with Retry-After by the app's exception handler
+        response_type = "shed"
+        raise
+    finally:
+        chat_seconds.observe(time.perf_counter() - started, response_type)
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request, pool: Pool = Depends(get_db_pool)):
+    user_profile, conversation = await load_chat_context(request, pool)
     if not user_profile:
         raise HTTPException(404, detail="User profile not found")
 
-    response = await run_chat(
+    events = stream_chat(
         user_message=request.message,
         user_profile=user_profile,
-        pool=pool
+        pool=pool,
+        conversation=conversation,
+        user_id=request.user_id,
     )
+    # Admission is decided by the first event, before the model is called. Waiting for
+    # it here lets a shed request get a 429/503 instead of a 200 stream with an error in it.
+    first = await anext(events)
 
-    return response
+    async def event_source():
+        try:
+            event, data = first
+            if event != "admitted":
+                yield f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+            async for event, data in events:
+                if await http_request.is_disconnected():
+                    break
+                yield f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+        finally:
+            # Stops the agent run, and with it the in-flight model request
+            await events.aclose()
 
-@router.get("/health")
-async def health(pool: Pool = Depends(get_db_pool)):
-    # Optional: Actually test the database connection in health check
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/chat/batch")
+async def chat_batch(request: ChatBatchRequest, pool: Pool = Depends(get_db_pool)):
+    async def lines():
+        results = run_chat_batch(request.requests, pool, settings.chat_batch_concurrency)
+        try:
+            async for result in results:
+                yield dumps(result) + b"\n"
+        finally:
+            await results.aclose()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/jobs/search")
+async def jobs_search(request: JobSearchRequest, pool: Pool = Depends(get_db_pool)):
+    # "Show more" for a chat search result: pages through get_jobs results without the model
     try:
-        async with pool.acquire() as conn:
-            await conn.fetchval("SELECT 1")
-        return {"status": "ok", "database": "connected"}
-    except Exception as e:
-        return {"status": "error", "database": "disconnected", "error": str(e)}
\ No newline at end of file
+        result = await search_jobs(pool, **request.model_dump())
+    except ValueError as e:
+        raise HTTPException(400, detail=str(e))
+    if result.error is not None:
+        raise HTTPException(500, detail=result.error)
+    return FastJSONResponse(result.as_dict())
+
+@router.get("/users/{user_id}/recommendations")
+async def user_recommendations(user_id: str, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), pool: Pool = Depends(get_db_pool)):
+    # Precomputed "jobs for me", best first, in the /jobs/search envelope; no model call
+    if not settings.recommendations_enabled:
+        raise HTTPException(404, detail="Recommendations are disabled")
+    result = await recommend_jobs(pool, user_id, limit)
+    if result.error is not None:
+        raise HTTPException(500, detail=result.error)
+    return FastJSONResponse(result.as_dict())
+
+@router.get("/users/{user_id}/saved-searches")
+async def user_saved_searches(user_id: str, pool: Pool = Depends(get_db_pool)):
+    # Searches saved from the user's get_jobs calls, with their unseen notification counts
+    if not settings.saved_searches_enabled:
+        raise HTTPException(404, detail="Saved searches are disabled")
+    return FastJSONResponse({"searches": await saved_searches.searches(pool, user_id)})
+
+@router.delete("/users/{user_id}/saved-searches/{search_id}")
+async def delete_saved_search(user_id: str, search_id: int, pool: Pool = Depends(get_db_pool)):
+    if not settings.saved_searches_enabled:
+        raise HTTPException(404, detail="Saved searches are disabled")
+    if not await saved_searches.delete(pool, user_id, search_id):
+        raise HTTPException(404, detail="No such saved search")
+    return {"deleted": search_id}
+
+@router.get("/users/{user_id}/notifications")
+async def user_notifications(
+    user_id: str,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    mark_seen: bool = True,
+    pool: Pool = Depends(get_db_pool),
+):
+    # New posts matching the user's saved searches; no model call and no search
+    if not settings.saved_searches_enabled:
+        raise HTTPException(404, detail="Saved searches are disabled")
+    return FastJSONResponse({"notifications": await saved_searches.notifications(pool, user_id, limit, mark_seen)})
+
+@router.get("/health")
+async def health():
+    # The background health check's last result; probes never take a connection themselves
+    snapshot = health_monitor.current()
+    return {key: snapshot[key] for key in ("status", "database", "error", "age_s") if key in snapshot}
+
+@router.get("/live")
+async def live():
+    # The process is up and its event loop is answering
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def ready():
+    # 503 while the last database check failed or the checker has stopped
+    return JSONResponse(health_monitor.current(), status_code=200 if health_monitor.is_ready() else 503)
+
+@router.get("/pool/stats")
+async def pool_stats():
+    # In-use, idle and waiting connections plus the acquire wait histogram, per worker
+    return db_manager.get_pool().stats()
+
+@router.get("/admission/stats")
+async def admission_stats():
+    # Running and queued model-bound requests and shed counts, per worker
+    return admission.stats()
+
+@router.get("/cache/stats")
+async def cache_stats():
+    # Per-worker numbers, used to size the caches
+    return {
+        "profile_cache": profile_cache.stats(),
+        "dimension_cache": dimension_cache.stats(),
+        "response_cache": response_cache.stats(),
+    }
+
+@router.get("/search/stats")
+async def search_query_stats():
+    # Per-variant timings for the job search statements, used to pick specialised variants
+    return {key: stats.as_dict() for key, stats in sorted(search_stats.items())}
+
+@router.get("/index/stats")
+async def index_stats():
+    # This worker's job search snapshot, its pending changes and which published generation it maps
+    return job_index.stats()
+
+@router.get("/ranking/stats")
+async def ranking_stats():
+    # Size of this worker's relevance model and how often its matrix was compacted
+    return job_ranker.stats()
+
+@router.get("/recommendations/stats")
+async def recommendation_stats():
+    # Rebuilds and change-feed work done by this worker's refresh loop
+    return recommendations.stats()
+
+@router.get("/saved-searches/stats")
+async def saved_search_stats():
+    # Searches saved and posts matched by this worker
+    return saved_searches.stats()
+
+@router.get("/router/stats")
+async def intent_router_stats():
+    # How often the rule-based fast path answered without the model
+    return router_stats.as_dict()
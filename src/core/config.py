@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     groq_api_key: str = Field(..., validation_alias="GROQ_API_KEY")
@@ -7,6 +8,127 @@ class Settings(BaseSettings):
     db_url: str = Field(..., validation_alias="DB_URL")
     logfire_write_token : str = Field(...,validation_alias="LOGFIRE_WRITE_TOKEN")
 
+    # Models as "provider:model" (openai or groq). With a secondary, a request whose first chunk hasn't
+    # arrived within the hedge delay is also sent to it and the first to answer wins (see
+    # src/services/model_router.py). Hedging is off, using the primary alone, until MODEL_SECONDARY is set.
+    model_primary: str = Field("openai:gpt-4o-mini", validation_alias="MODEL_PRIMARY")
+    model_secondary: str = Field("", validation_alias="MODEL_SECONDARY")
+    model_hedge_delay: float = Field(2.0, validation_alias="MODEL_HEDGE_DELAY")
+    # A provider's breaker opens after this many errors or over-budget requests in a row, for the cooldown
+    model_breaker_failures: int = Field(3, validation_alias="MODEL_BREAKER_FAILURES")
+    model_breaker_latency_budget: float = Field(20.0, validation_alias="MODEL_BREAKER_LATENCY_BUDGET")
+    model_breaker_cooldown: float = Field(30.0, validation_alias="MODEL_BREAKER_COOLDOWN")
+    # Point the providers elsewhere, e.g. at the stub servers in src/tests/stub_model_server.py
+    openai_base_url: Optional[str] = Field(None, validation_alias="OPENAI_BASE_URL")
+    groq_base_url: Optional[str] = Field(None, validation_alias="GROQ_BASE_URL")
+
+    # Admission control for model-bound chat requests (see src/services/admission.py). Past
+    # max_in_flight agent runs, requests queue (at most max_queue, each for at most queue_timeout
+    # seconds) and are otherwise answered 503. Users over their request or LLM token rate get 429.
+    admission_enabled: bool = Field(True, validation_alias="ADMISSION_ENABLED")
+    admission_max_in_flight: int = Field(32, validation_alias="ADMISSION_MAX_IN_FLIGHT")
+    admission_max_queue: int = Field(128, validation_alias="ADMISSION_MAX_QUEUE")
+    admission_queue_timeout: float = Field(10.0, validation_alias="ADMISSION_QUEUE_TIMEOUT")
+    user_requests_per_minute: float = Field(20.0, validation_alias="USER_REQUESTS_PER_MINUTE")
+    user_request_burst: int = Field(10, validation_alias="USER_REQUEST_BURST")
+    user_tokens_per_minute: float = Field(40000.0, validation_alias="USER_TOKENS_PER_MINUTE")
+    user_token_burst: int = Field(40000, validation_alias="USER_TOKEN_BURST")
+
+    # Connection pool (see src/db/session.py). Checkouts that wait longer than the acquire
+    # timeout fail with TimeoutError; idle connections above min_size close after the lifetime.
+    db_pool_min_size: int = Field(5, validation_alias="DB_POOL_MIN_SIZE")
+    db_pool_max_size: int = Field(20, validation_alias="DB_POOL_MAX_SIZE")
+    db_pool_acquire_timeout: float = Field(5.0, validation_alias="DB_POOL_ACQUIRE_TIMEOUT")
+    db_pool_max_inactive_lifetime: float = Field(300.0, validation_alias="DB_POOL_MAX_INACTIVE_LIFETIME")
+
+    # Multi-process serving with `python -m src.serve` (see src/serve.py): a master process publishes
+    # a job search snapshot and preloads the agent, the dimension tables and the ranking model, then
+    # forks `workers` processes that share them copy-on-write. With a connection budget, the pools of all
+    # processes together stay within it: one connection is left for the master and each worker's
+    # max_size is an equal share of the rest.
+    workers: int = Field(1, validation_alias="WORKERS")
+    db_connection_budget: Optional[int] = Field(None, validation_alias="DB_CONNECTION_BUDGET")
+
+    # Seconds between background health checks; /ready and /health serve the last result
+    health_check_interval: float = Field(5.0, validation_alias="HEALTH_CHECK_INTERVAL")
+    # Share of max_size in use at which the health check logs pool saturation
+    db_pool_saturation_warning: float = Field(0.8, validation_alias="DB_POOL_SATURATION_WARNING")
+
+    # In-process job search index (see src/services/job_index.py)
+    job_index_enabled: bool = Field(False, validation_alias="JOB_INDEX_ENABLED")
+    job_index_poll_interval: float = Field(5.0, validation_alias="JOB_INDEX_POLL_INTERVAL")
+    # Under src.serve the master publishes a snapshot of the index to this directory every
+    # snapshot_interval seconds; workers map it and switch to each new one on their next poll
+    job_index_snapshot_dir: str = Field("/tmp/job-search-index", validation_alias="JOB_INDEX_SNAPSHOT_DIR")
+    job_index_snapshot_interval: float = Field(300.0, validation_alias="JOB_INDEX_SNAPSHOT_INTERVAL")
+
+    # Relevance ranking of job search results (see src/services/job_ranker.py). With "relevance",
+    # the newest `candidates` matches are re-ordered by TF-IDF similarity of title and description
+    # to the searched title and the user's skills, blended with recency (recency_weight, halving
+    # every half_life_days). Requests can ask for either order; "newest" is used until the model loads.
+    job_ranking_enabled: bool = Field(False, validation_alias="JOB_RANKING_ENABLED")
+    job_ranking_default_sort: Literal["relevance", "newest"] = Field("relevance", validation_alias="JOB_RANKING_DEFAULT_SORT")
+    job_ranking_candidates: int = Field(500, validation_alias="JOB_RANKING_CANDIDATES")
+    job_ranking_recency_weight: float = Field(0.3, validation_alias="JOB_RANKING_RECENCY_WEIGHT")
+    job_ranking_half_life_days: float = Field(30.0, validation_alias="JOB_RANKING_HALF_LIFE_DAYS")
+    job_ranking_poll_interval: float = Field(5.0, validation_alias="JOB_RANKING_POLL_INTERVAL")
+
+    # Seconds before the city/country/job_role/job_type/currency cache is reloaded
+    dimension_cache_ttl: float = Field(300.0, validation_alias="DIMENSION_CACHE_TTL")
+
+    # Per-worker user profile cache (see src/services/profile_cache.py). Set the channel to
+    # "user_profile_changed" to drop entries when migration 0007's triggers report a change.
+    profile_cache_size: int = Field(10000, validation_alias="PROFILE_CACHE_SIZE")
+    profile_cache_ttl: float = Field(60.0, validation_alias="PROFILE_CACHE_TTL")
+    profile_cache_channel: Optional[str] = Field(None, validation_alias="PROFILE_CACHE_CHANNEL")
+
+    # Comma-separated get_jobs filter combinations that get their own prepared statement,
+    # e.g. "title+city,city+job_type". Everything else uses the canonical statement.
+    job_search_specialized: str = Field("", validation_alias="JOB_SEARCH_SPECIALIZED")
+    # Job search totals are counted exactly up to this many matches and estimated by the planner beyond it
+    job_search_exact_count_limit: int = Field(1000, validation_alias="JOB_SEARCH_EXACT_COUNT_LIMIT")
+
+    # What to do with src/db/migrations/*.sql at startup: "apply" pending ones, "check" and refuse
+    # to start if any are pending, or "off". `python -m src.db.migrations apply` runs them by hand.
+    migrations_mode: Literal["apply", "check", "off"] = Field("apply", validation_alias="MIGRATIONS_MODE")
+
+    # Conversation memory (see src/services/history_service.py)
+    history_enabled: bool = Field(True, validation_alias="HISTORY_ENABLED")
+    history_token_budget: int = Field(2000, validation_alias="HISTORY_TOKEN_BUDGET")
+    history_summary_tokens: int = Field(500, validation_alias="HISTORY_SUMMARY_TOKENS")
+
+    # Exact-match cache of chat responses (see src/services/response_cache.py)
+    response_cache_enabled: bool = Field(True, validation_alias="RESPONSE_CACHE_ENABLED")
+    response_cache_size: int = Field(1000, validation_alias="RESPONSE_CACHE_SIZE")
+    response_cache_ttl: float = Field(300.0, validation_alias="RESPONSE_CACHE_TTL")
+    response_cache_stale_ttl: float = Field(60.0, validation_alias="RESPONSE_CACHE_STALE_TTL")
+    # Only entries with this many fresh hits are served stale while they refresh
+    response_cache_stale_min_hits: int = Field(3, validation_alias="RESPONSE_CACHE_STALE_MIN_HITS")
+    response_cache_freshness_interval: float = Field(30.0, validation_alias="RESPONSE_CACHE_FRESHNESS_INTERVAL")
+
+    # Answer greetings and unambiguous searches without the model (see src/services/intent_router.py)
+    intent_router_enabled: bool = Field(True, validation_alias="INTENT_ROUTER_ENABLED")
+
+    # Precomputed per-user job recommendations (see src/services/recommendations.py): up to
+    # per_user posts for every profile, ranked from the newest `candidates` posts in each list
+    # sharing the user's role and/or location, and refreshed from the change feeds every interval.
+    # headroom extra posts per user are kept so a closed post rarely forces a re-rank.
+    recommendations_enabled: bool = Field(True, validation_alias="RECOMMENDATIONS_ENABLED")
+    recommendations_per_user: int = Field(20, validation_alias="RECOMMENDATIONS_PER_USER")
+    recommendations_headroom: int = Field(10, validation_alias="RECOMMENDATIONS_HEADROOM")
+    recommendations_candidates: int = Field(50, validation_alias="RECOMMENDATIONS_CANDIDATES")
+    recommendations_refresh_interval: float = Field(30.0, validation_alias="RECOMMENDATIONS_REFRESH_INTERVAL")
+
+    # Saved searches (see src/services/saved_searches.py): a user's successful get_jobs searches are
+    # saved, the per_user most recently used kept, and posts changed since the last refresh are matched
+    # against them every interval. New matches become the user's notifications.
+    saved_searches_enabled: bool = Field(True, validation_alias="SAVED_SEARCHES_ENABLED")
+    saved_searches_per_user: int = Field(20, validation_alias="SAVED_SEARCHES_PER_USER")
+    saved_searches_refresh_interval: float = Field(30.0, validation_alias="SAVED_SEARCHES_REFRESH_INTERVAL")
+
+    # Agent runs in flight at once for a single /chat/batch call
+    chat_batch_concurrency: int = Field(8, validation_alias="CHAT_BATCH_CONCURRENCY")
+
     class Config:
         env_file = "./.env"
 
@@ -0,0 +1,22 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+
+def dumps(data: Any) -> bytes:
+    """
+    JSON encoding in pydantic-core's Rust serializer. Handles datetimes and
+    pydantic models natively and falls back to str() like json.dumps(default=str).
+    """
+    return to_json(data, fallback=str)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    A JSONResponse rendered by dumps(). Returning one from an endpoint also
+    skips FastAPI's jsonable_encoder pass over the content.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
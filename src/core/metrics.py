@@ -0,0 +1,171 @@
+# In-process metrics, served at /metrics in the Prometheus text format so they
+# can be scraped even when Logfire is unreachable. Each worker process keeps its
+# own numbers.
+#
+# Recording never takes a lock. Every observe()/inc() runs on the event loop
+# thread and contains no await, so updates can't interleave; the cost is a
+# dict lookup, a bisect and a few additions.
+from bisect import bisect_left
+from typing import Callable, Sequence
+
+# Upper bounds in seconds, from a cache hit up to a slow model response
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. counts[i] is the number of observations at or
+    below buckets[i] and above the bucket before it; the last slot counts
+    everything above the largest bucket.
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        # Counts per upper bound, the way Prometheus reports them
+        result, running = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            result.append((_number(bound), running))
+        result.append(("+Inf", self.count))
+        return result
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "sum": round(self.sum, 6), "buckets": dict(self.cumulative())}
+
+
+class HistogramFamily:
+    """A histogram per combination of label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.children: dict[tuple[str, ...], Histogram] = {}
+
+    def labels(self, *values: str) -> Histogram:
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = Histogram(self.buckets)
+        return child
+
+    def observe(self, value: float, *labels: str) -> None:
+        self.labels(*labels).observe(value)
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        lines = []
+        for values, child in sorted(self.children.items()):
+            labels = dict(zip(self.labelnames, values))
+            for bound, count in child.cumulative():
+                lines.append((f"{self.name}_bucket", _labels({**labels, "le": bound}), count))
+            lines.append((f"{self.name}_sum", _labels(labels), child.sum))
+            lines.append((f"{self.name}_count", _labels(labels), child.count))
+        return lines
+
+
+class Counter:
+    """A monotonically increasing count per combination of label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        return [
+            (self.name, _labels(dict(zip(self.labelnames, values))), value)
+            for values, value in sorted(self.values.items())
+        ]
+
+
+class Gauge:
+    """A value read when metrics are scraped, e.g. the pool's current size."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], read: Callable[[], dict[tuple[str, ...], float]]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.read = read
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        return [
+            (self.name, _labels(dict(zip(self.labelnames, values))), value)
+            for values, value in sorted(self.read().items())
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.metrics: list = []
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> HistogramFamily:
+        return self._register(HistogramFamily(f"{self.namespace}_{name}", help, labelnames, buckets))
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str], read: Callable[[], dict[tuple[str, ...], float]]) -> Gauge:
+        return self._register(Gauge(f"{self.namespace}_{name}", help, labelnames, read))
+
+    def _register(self, metric):
+        if any(existing.name == metric.name for existing in self.metrics):
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _number(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+registry = MetricsRegistry("castlink")
+
+# Shared by every stage, so a scrape shows where failures cluster
+errors = registry.counter("errors_total", "Errors caught and reported, by stage and exception type", ("stage", "type"))
@@ -0,0 +1,18 @@
+import logfire
+
+from src.core.config import settings
+
+_configured = False
+
+
+def configure_observability() -> None:
+    """
+    Configures logfire once per process. The app calls this at import and the
+    agent builder calls it again for scripts that skip src.main; later calls do
+    nothing.
+    """
+    global _configured
+    if _configured:
+        return
+    logfire.configure(token=settings.logfire_write_token)
+    _configured = True
@@ -0,0 +1,462 @@
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Optional
+
+import asyncpg
+from asyncpg.pool import Pool
+
+from src.core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+# Filters in the order they appear as parameters of the canonical statement.
+# Values are already normalised by the caller: title is a LIKE pattern, keywords
+# a websearch_to_tsquery string (see keyword_query) and the dimension filters are
+# lists of IDs resolved through the dimension cache.
+FILTERS = (
+    ("title", "LOWER(jp.title) LIKE LOWER(${n}::text)", "text"),
+    ("keywords", "jp.search_vector @@ websearch_to_tsquery('english', ${n}::text)", "text"),
+    ("min_salary", 'jp."MaxSalary" >= ${n}::int', "int"),
+    ("max_salary", 'jp."MinSalary" <= ${n}::int', "int"),
+    ("city", "jp.city_id = ANY(${n}::text[])", "text[]"),
+    ("country", "jp.country_id = ANY(${n}::text[])", "text[]"),
+    ("job_type", "jp.job_type_id = ANY(${n}::text[])", "text[]"),
+    ("job_category", "jp.category_id = ANY(${n}::text[])", "text[]"),
+    ("currency", "jp.currency_id = ANY(${n}::text[])", "text[]"),
+)
+FILTER_NAMES = tuple(name for name, _, _ in FILTERS)
+# Parameter number of the keywords filter in the canonical statement
+KEYWORDS_PARAM = FILTER_NAMES.index("keywords") + 1
+
+# Web search syntax in a keywords string: a quoted phrase, "or", or a -excluded word
+WEBSEARCH_SYNTAX = re.compile(r'"|(^|\s)-\w|\bor\b', re.IGNORECASE)
+
+
+def keyword_query(keywords: str) -> str:
+    """
+    websearch_to_tsquery input for the keywords filter. Plain words match posts
+    with any of them, and the match rank puts posts with more of them first;
+    with quotes, "or" or "-word" the string is taken as written, where plain
+    words are all required.
+    """
+    if WEBSEARCH_SYNTAX.search(keywords):
+        return keywords
+    return " or ".join(keywords.split())
+
+
+# Keyset pagination: the page starts after the (created_at, id) of the previous
+# page's last post. Posts are ordered newest first, then by id, the same order as
+# the in-memory index. The first condition bounds the created_at index scan, so a
+# deep page costs the same as the first one. The first page passes 'infinity'.
+KEYSET_CONDITION = "jp.created_at <= ${n}::timestamp AND (jp.created_at < ${n}::timestamp OR jp.id > ${m}::text)"
+# Passed as the first page's "after" position; asyncpg sends datetime.max as 'infinity'
+FIRST_PAGE = (datetime.max, "")
+
+# Keyword searches in relevance order sort on the match rank first, which is computed
+# for every match. ts_rank weighs title words over description words at about a
+# third of the cost of ts_rank_cd. Normalisation 32 is rank / (rank + 1), in [0, 1);
+# it is a float4 and recomputes to the same value, so the previous page's rank works
+# as a keyset position.
+MATCH_RANK = "ts_rank(jp.search_vector, websearch_to_tsquery('english', ${k}::text), 32)"
+RANKED_KEYSET_CONDITION = (
+    "({rank} < ${r}::real OR ({rank} = ${r}::real"
+    " AND jp.created_at <= ${n}::timestamp AND (jp.created_at < ${n}::timestamp OR jp.id > ${m}::text)))"
+)
+# The first ranked page starts above any rank
+FIRST_RANKED_PAGE = (datetime.max, "", float("inf"))
+
+
+def _where(conditions: list[str]) -> str:
+    return "\n      AND ".join(['jp."IsAccepting" = true', *conditions])
+
+
+def _select(conditions: list[str], first_param: int) -> str:
+    """Page statement: `conditions`, then the keyset position and the limit as the last three parameters."""
+    keyset = KEYSET_CONDITION.format(n=first_param, m=first_param + 1)
+    return f"""
+    SELECT
+        jp.id,
+        jp.title,
+        jp.created_at
+    FROM job_posts jp
+    WHERE {_where([*conditions, keyset])}
+    ORDER BY jp.created_at DESC, jp.id
+    LIMIT ${first_param + 2}
+    """
+
+
+def _select_ranked(conditions: list[str], first_param: int, keywords_param: int) -> str:
+    """
+    Keyword search page in match rank order: `conditions`, then the keyset
+    position (created_at, id, rank) and the limit as the last four parameters.
+    """
+    rank = MATCH_RANK.format(k=keywords_param)
+    keyset = RANKED_KEYSET_CONDITION.format(rank=rank, n=first_param, m=first_param + 1, r=first_param + 2)
+    return f"""
+    SELECT
+        jp.id,
+        jp.title,
+        jp.created_at,
+        {rank} AS match_rank
+    FROM job_posts jp
+    WHERE {_where([*conditions, keyset])}
+    ORDER BY match_rank DESC, jp.created_at DESC, jp.id
+    LIMIT ${first_param + 3}
+    """
+
+
+def _count(conditions: list[str], first_param: int) -> str:
+    """Counts matches up to the limit in the last parameter, so a broad search stops early."""
+    return f"""
+    SELECT count(*) FROM (
+        SELECT 1
+        FROM job_posts jp
+        WHERE {_where(conditions)}
+        LIMIT ${first_param}
+    ) capped
+    """
+
+
+# One statement for every filter combination: a NULL parameter means "filter unused".
+# Its text never changes, so each connection prepares and plans it once.
+CANONICAL_CONDITIONS = [
+    f"(${i}::{pg_type} IS NULL OR {condition.format(n=i)})" for i, (_, condition, pg_type) in enumerate(FILTERS, 1)
+]
+CANONICAL_QUERY = _select(CANONICAL_CONDITIONS, len(FILTERS) + 1)
+CANONICAL_COUNT_QUERY = _count(CANONICAL_CONDITIONS, len(FILTERS) + 1)
+CANONICAL_RANKED_QUERY = _select_ranked(CANONICAL_CONDITIONS, len(FILTERS) + 1, KEYWORDS_PARAM)
+
+
+def variant_key(used: tuple[str, ...]) -> str:
+    return "+".join(used) or "none"
+
+
+def _specialized_conditions(used: tuple[str, ...], first_param: int = 1) -> list[str]:
+    conditions = {name: condition for name, condition, _ in FILTERS}
+    return [conditions[name].format(n=i) for i, name in enumerate(used, first_param)]
+
+
+def build_specialized_query(used: tuple[str, ...]) -> str:
+    """Statement containing only the filters in `used`, with parameters in FILTERS order."""
+    return _select(_specialized_conditions(used), len(used) + 1)
+
+
+def build_specialized_count_query(used: tuple[str, ...]) -> str:
+    return _count(_specialized_conditions(used), len(used) + 1)
+
+
+def build_specialized_ranked_query(used: tuple[str, ...]) -> Optional[str]:
+    """Match rank ordered statement for a variant with the keywords filter, None without it."""
+    if "keywords" not in used:
+        return None
+    return _select_ranked(_specialized_conditions(used), len(used) + 1, used.index("keywords") + 1)
+
+
+def _parse_specialized(raw: str) -> dict[str, tuple[str, str, Optional[str]]]:
+    # "title+city,city+job_type" -> {variant key: (page statement, count statement, ranked page statement)}
+    specialized = {}
+    for variant in filter(None, (item.strip() for item in raw.split(","))):
+        names = set(variant.split("+")) - {"none"}
+        if names - set(FILTER_NAMES):
+            logger.warning(f"Ignoring unknown filters in JOB_SEARCH_SPECIALIZED variant '{variant}'")
+            continue
+        used = tuple(name for name in FILTER_NAMES if name in names)
+        specialized[variant_key(used)] = (
+            build_specialized_query(used),
+            build_specialized_count_query(used),
+            build_specialized_ranked_query(used),
+        )
+    return specialized
+
+
+# Variants measured to be hot enough to deserve their own statement (JOB_SEARCH_SPECIALIZED)
+SPECIALIZED_QUERIES = _parse_specialized(settings.job_search_specialized)
+
+
+@lru_cache(maxsize=256)
+def build_batch_queries(shapes: tuple[tuple[str, ...], ...]) -> tuple[str, str]:
+    """
+    Page and count statements for several searches at once, one UNION ALL
+    branch per search with the filters in `shapes[n]` and its own parameters.
+    A branch is the specialised statement for its filters, so it is planned
+    like a single search of that shape. Per branch, the page statement takes
+    the filter values, the keyset position and the limit; the count statement
+    the filter values and the cap. Rows carry the branch number as `n`.
+    """
+    pages, counts = [], []
+    page_param = count_param = 1
+    for n, used in enumerate(shapes):
+        page_conditions = _specialized_conditions(used, page_param)
+        page_param += len(used)
+        pages.append(f"SELECT {n} AS n, page.* FROM ({_select(page_conditions, page_param)}) page")
+        page_param += 3
+        count_conditions = _specialized_conditions(used, count_param)
+        count_param += len(used)
+        counts.append(f"SELECT {n} AS n, ({_count(count_conditions, count_param)}) AS total")
+        count_param += 1
+    page_query = "\nUNION ALL\n".join(f"({page})" for page in pages) + "\nORDER BY n, created_at DESC, id"
+    return page_query, "\nUNION ALL\n".join(counts)
+
+
+# Batch statements are planned for each call's values: their text is shared by all
+# searches with the same filters, and a generic plan, blind to how selective each
+# branch's values are, was up to 9x slower. Each branch is a short capped scan, so
+# parallel workers cost more to start than they save.
+BATCH_SETTINGS = "SET LOCAL plan_cache_mode = force_custom_plan; SET LOCAL max_parallel_workers_per_gather = 0"
+
+
+async def _fetch_batch(conn: asyncpg.Connection, query: str, params: list) -> list[asyncpg.Record]:
+    async with conn.transaction():
+        await conn.execute(BATCH_SETTINGS)
+        return await conn.fetch(query, *params)
+
+
+@dataclass(slots=True)
+class VariantStats:
+    statement: str
+    executions: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    planning_ms: Optional[float] = None
+    execution_ms: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "statement": self.statement,
+            "executions": self.executions,
+            "mean_ms": self.total_ms / self.executions if self.executions else None,
+            "max_ms": self.max_ms,
+            "explain_planning_ms": self.planning_ms,
+            "explain_execution_ms": self.execution_ms,
+        }
+
+
+search_stats: dict[str, VariantStats] = {}
+
+
+# Keyset position after a job: (created_at, id), plus the match rank in match rank order
+Position = tuple[datetime, str] | tuple[datetime, str, float]
+
+
+@dataclass(slots=True)
+class JobPage:
+    jobs: list[dict]
+    # Position of the last job, set only when more matches follow it
+    next_after: Optional[Position] = None
+    # Matches across all pages; only computed for the first page
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+
+
+def _used(filters: dict[str, Any]) -> tuple[str, ...]:
+    return tuple(name for name in FILTER_NAMES if filters.get(name) is not None)
+
+
+def _plan(
+    filters: dict[str, Any],
+    limit: int,
+    after: Optional[Position] = None,
+    by_match: bool = False,
+) -> tuple[str, str, list]:
+    # `by_match` orders a keyword search by match rank; it needs the keywords filter
+    used = _used(filters)
+    key = variant_key(used)
+    position = list(after or (FIRST_RANKED_PAGE if by_match else FIRST_PAGE))
+    if key in SPECIALIZED_QUERIES:
+        query = SPECIALIZED_QUERIES[key][2 if by_match else 0]
+        return key, query, [filters[name] for name in used] + position + [limit]
+    query = CANONICAL_RANKED_QUERY if by_match else CANONICAL_QUERY
+    return key, query, [filters.get(name) for name in FILTER_NAMES] + position + [limit]
+
+
+def _plan_count(filters: dict[str, Any], cap: int) -> tuple[str, list]:
+    used = _used(filters)
+    key = variant_key(used)
+    if key in SPECIALIZED_QUERIES:
+        return SPECIALIZED_QUERIES[key][1], [filters[name] for name in used] + [cap]
+    return CANONICAL_COUNT_QUERY, [filters.get(name) for name in FILTER_NAMES] + [cap]
+
+
+async def prepare_connection(conn: asyncpg.Connection) -> None:
+    """
+    Pool `init` hook. Running each statement once with LIMIT 0 puts it in the
+    connection's statement cache, so requests never pay for parsing or planning it.
+    """
+    # Every parameter carries an explicit cast, so NULLs are enough to prepare them
+    await conn.fetch(CANONICAL_QUERY, *[None] * (len(FILTERS) + 2), 0)
+    await conn.fetchval(CANONICAL_COUNT_QUERY, *[None] * len(FILTERS), 0)
+    await conn.fetch(CANONICAL_RANKED_QUERY, *[None] * (len(FILTERS) + 3), 0)
+    for key, (query, count_query, ranked_query) in SPECIALIZED_QUERIES.items():
+        param_count = 0 if key == "none" else len(key.split("+"))
+        await conn.fetch(query, *[None] * (param_count + 2), 0)
+        await conn.fetchval(count_query, *[None] * param_count, 0)
+        if ranked_query:
+            await conn.fetch(ranked_query, *[None] * (param_count + 3), 0)
+
+
+def _record(key: str, statement: str, elapsed_ms: float) -> None:
+    stats = search_stats.get(key)
+    if stats is None:
+        stats = search_stats[key] = VariantStats(statement)
+    stats.executions += 1
+    stats.total_ms += elapsed_ms
+    stats.max_ms = max(stats.max_ms, elapsed_ms)
+
+
+async def fetch_jobs(
+    pool: Pool,
+    filters: dict[str, Any],
+    limit: int,
+    after: Optional[Position] = None,
+    by_match: bool = False,
+) -> list[asyncpg.Record]:
+    key, query, params = _plan(filters, limit, after, by_match)
+    async with pool.acquire() as conn:
+        start = time.perf_counter()
+        rows = await conn.fetch(query, *params)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+    canonical = query is CANONICAL_QUERY or query is CANONICAL_RANKED_QUERY
+    _record(key, "canonical" if canonical else "specialized", elapsed_ms)
+    return rows
+
+
+def _page(rows: list[asyncpg.Record], limit: int, by_match: bool = False) -> JobPage:
+    # Rows for `limit` + 1 jobs: the extra one only says that there is a next page
+    page = JobPage(jobs=[{"job_id": row["id"], "title": row["title"]} for row in rows[:limit]])
+    if by_match:
+        for job, row in zip(page.jobs, rows):
+            job["match_rank"] = round(row["match_rank"], 4)
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        page.next_after = (last["created_at"], last["id"], *((last["match_rank"],) if by_match else ()))
+    return page
+
+
+async def fetch_page(
+    pool: Pool,
+    filters: dict[str, Any],
+    limit: int,
+    after: Optional[Position] = None,
+    by_match: bool = False,
+) -> JobPage:
+    # One extra row tells whether there is a next page without a separate query
+    return _page(await fetch_jobs(pool, filters, limit + 1, after, by_match), limit, by_match)
+
+
+async def fetch_pages(pool: Pool, filter_sets: list[dict[str, Any]], limit: int) -> list[JobPage]:
+    """First pages of several searches, newest first, from one statement (see build_batch_queries)."""
+    shapes = tuple(_used(filters) for filters in filter_sets)
+    query, _ = build_batch_queries(shapes)
+    params = []
+    for filters, used in zip(filter_sets, shapes):
+        params += [filters[name] for name in used] + list(FIRST_PAGE) + [limit + 1]
+    async with pool.acquire() as conn:
+        start = time.perf_counter()
+        rows = await _fetch_batch(conn, query, params)
+        _record("batch", "batch", (time.perf_counter() - start) * 1000)
+
+    grouped: list[list[asyncpg.Record]] = [[] for _ in filter_sets]
+    for row in rows:
+        grouped[row["n"]].append(row)
+    return [_page(group, limit) for group in grouped]
+
+
+async def _estimate(conn: asyncpg.Connection, query: str, params: list, exact_limit: int) -> int:
+    # The capped subquery's scan node carries the planner's estimate for the uncapped search
+    raw = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *params[:-1], None)
+    plan = json.loads(raw)[0]["Plan"]
+    while plan.get("Plans") and plan["Node Type"] in ("Aggregate", "Limit", "Subquery Scan"):
+        plan = plan["Plans"][0]
+    return max(int(plan["Plan Rows"]), exact_limit + 1)
+
+
+async def count_jobs(pool: Pool, filters: dict[str, Any], exact_limit: int) -> tuple[int, bool]:
+    """
+    Number of accepting posts matching `filters`, and whether it is an estimate.
+    Counting stops after `exact_limit` matches; past that the planner's row
+    estimate is used, so a broad search never counts the whole table.
+    """
+    query, params = _plan_count(filters, exact_limit + 1)
+    async with pool.acquire() as conn:
+        count = await conn.fetchval(query, *params)
+        if count <= exact_limit:
+            return count, False
+        return await _estimate(conn, query, params, exact_limit), True
+
+
+async def count_jobs_batch(pool: Pool, filter_sets: list[dict[str, Any]], exact_limit: int) -> list[tuple[int, bool]]:
+    """count_jobs for several searches, with one statement for the exact counts."""
+    shapes = tuple(_used(filters) for filters in filter_sets)
+    _, query = build_batch_queries(shapes)
+    params = []
+    for filters, used in zip(filter_sets, shapes):
+        params += [filters[name] for name in used] + [exact_limit + 1]
+    async with pool.acquire() as conn:
+        counts = {row["n"]: row["total"] for row in await _fetch_batch(conn, query, params)}
+        totals = []
+        for n, filters in enumerate(filter_sets):
+            if counts[n] <= exact_limit:
+                totals.append((counts[n], False))
+            else:
+                # Only searches past the cap pay for a second statement
+                totals.append((await _estimate(conn, *_plan_count(filters, exact_limit + 1), exact_limit), True))
+    return totals
+
+
+async def explain_variant(pool: Pool, filters: dict[str, Any], limit: int, specialized: Optional[bool] = None) -> dict:
+    """
+    Runs EXPLAIN ANALYZE for the statement a filter set maps to and records the
+    planning and execution time Postgres reports. `specialized` forces either
+    statement so the two can be compared for the same filters.
+    """
+    key, query, params = _plan(filters, limit)
+    if specialized is True and query is CANONICAL_QUERY:
+        used = _used(filters)
+        query, params = build_specialized_query(used), [filters[name] for name in used] + list(FIRST_PAGE) + [limit]
+    elif specialized is False and query is not CANONICAL_QUERY:
+        query, params = CANONICAL_QUERY, [filters.get(name) for name in FILTER_NAMES] + list(FIRST_PAGE) + [limit]
+
+    async with pool.acquire() as conn:
+        raw = await conn.fetchval(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}", *params)
+    plan = json.loads(raw)[0]
+    result = {
+        "variant": key,
+        "statement": "canonical" if query is CANONICAL_QUERY else "specialized",
+        "planning_ms": plan["Planning Time"],
+        "execution_ms": plan["Execution Time"],
+    }
+
+    # Forced comparisons don't describe what production runs, so they aren't recorded
+    if specialized is None:
+        stats = search_stats.setdefault(key, VariantStats(result["statement"]))
+        stats.planning_ms = result["planning_ms"]
+        stats.execution_ms = result["execution_ms"]
+    return result
+
+
+async def explain_search(
+    pool: Pool,
+    filters: dict[str, Any],
+    limit: int,
+    after: Optional[Position] = None,
+    count: bool = False,
+    by_match: bool = False,
+) -> dict:
+    """
+    EXPLAIN (ANALYZE, BUFFERS) of the statement a search runs for `filters`: the
+    page statement (in match rank order with `by_match`), or with `count` the count
+    statement, for which `limit` is the cap. Returns the root node of Postgres' JSON plan.
+    """
+    if count:
+        query, params = _plan_count(filters, limit)
+    else:
+        _, query, params = _plan(filters, limit, after, by_match)
+    async with pool.acquire() as conn:
+        raw = await conn.fetchval(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", *params)
+    return json.loads(raw)[0]["Plan"]
@@ -0,0 +1,158 @@
+import logging
+import re
+from pathlib import Path
+
+import asyncpg
+from asyncpg.pool import Pool
+
+logger = logging.getLogger("uvicorn.error")
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+# Arbitrary key for pg_advisory_lock, so only one worker migrates at a time
+MIGRATION_LOCK_ID = 7_341_205
+
+# First line of a migration that must run outside a transaction, e.g. CREATE INDEX CONCURRENTLY.
+# Its statements run one at a time, so a failure part way leaves the earlier ones applied;
+# write them with IF NOT EXISTS so the retry picks up where it stopped.
+NO_TRANSACTION = "-- migrate: no-transaction"
+
+# A line of its own inside a statement of a no-transaction migration: the statement runs again
+# until it touches no rows. For backfills written to update one bounded batch at a time, so each
+# batch commits on its own and holds its row locks only as long as that batch takes.
+REPEAT = "-- migrate: repeat"
+
+
+def _statements(sql: str) -> list[str]:
+    # Statements end with ";" at the end of a line; comment-only chunks are dropped
+    chunks = re.split(r";\s*$", sql, flags=re.MULTILINE)
+    statements = []
+    for chunk in chunks:
+        code = "\n".join(line for line in chunk.splitlines() if not line.strip().startswith("--"))
+        if code.strip():
+            statements.append(chunk.strip())
+    return statements
+
+
+async def _execute(conn, statement: str) -> None:
+    if not any(line.strip() == REPEAT for line in statement.splitlines()):
+        await conn.execute(statement)
+        return
+    total = 0
+    while True:
+        # The status is e.g. "UPDATE 5000"; its last word is the row count
+        rows = int((await conn.execute(statement)).split()[-1])
+        if not rows:
+            break
+        total += rows
+        logger.info(f"Migration batch touched {rows} rows ({total} so far)")
+
+
+def migration_files() -> list[Path]:
+    return sorted(MIGRATIONS_DIR.glob("*.sql"))
+
+
+async def _ensure_table(conn) -> set[str]:
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    TEXT PRIMARY KEY,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    return {row["version"] for row in await conn.fetch("SELECT version FROM schema_migrations")}
+
+
+async def apply_migrations(pool: Pool) -> list[str]:
+    """
+    Applies every `migrations/*.sql` file not yet recorded in schema_migrations,
+    in filename order. Returns the versions that were applied.
+    """
+    applied_now = []
+    async with pool.acquire() as conn:
+        # A session lock rather than a transaction lock, because some migrations can't run in a transaction
+        await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+        try:
+            applied = await _ensure_table(conn)
+            for path in migration_files():
+                if path.stem in applied:
+                    continue
+                sql = path.read_text(encoding="utf-8")
+                if sql.startswith(NO_TRANSACTION):
+                    for statement in _statements(sql):
+                        await _execute(conn, statement)
+                    await conn.execute("INSERT INTO schema_migrations (version) VALUES ($1)", path.stem)
+                else:
+                    async with conn.transaction():
+                        await conn.execute(sql)
+                        await conn.execute("INSERT INTO schema_migrations (version) VALUES ($1)", path.stem)
+                applied_now.append(path.stem)
+                logger.info(f"Applied migration {path.stem}")
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+    return applied_now
+
+
+async def check_migrations(pool: Pool) -> list[str]:
+    """
+    Problems with the database schema without changing it: migrations not yet
+    applied, and indexes left invalid by an interrupted CREATE INDEX CONCURRENTLY.
+    An empty list means the schema is up to date.
+    """
+    async with pool.acquire() as conn:
+        applied = await _ensure_table(conn)
+        invalid = await conn.fetch("""
+            SELECT c.relname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE NOT i.indisvalid AND n.nspname = current_schema()
+        """)
+    problems = [f"migration {path.stem} is not applied" for path in migration_files() if path.stem not in applied]
+    problems += [f"index {row['relname']} is invalid; drop it and re-apply migrations" for row in invalid]
+    return problems
+
+
+async def migrate_on_startup(dsn: str, mode: str) -> None:
+    """
+    Applies or checks migrations as MIGRATIONS_MODE says, on a connection of its
+    own. The app pool prepares statements on every new connection, and those
+    need the schema the migrations create, so this runs before the pool exists.
+    """
+    if mode == "off":
+        return
+    pool = await asyncpg.create_pool(dsn=dsn, min_size=1, max_size=1)
+    try:
+        if mode == "apply":
+            await apply_migrations(pool)
+            return
+        problems = await check_migrations(pool)
+    finally:
+        await pool.close()
+    if problems:
+        raise RuntimeError(f"Database schema is not up to date: {'; '.join(problems)}")
+
+
+if __name__ == "__main__":
+    # python -m src.db.migrations [apply|check], against DB_URL
+    import asyncio
+    import sys
+
+    from src.core.config import settings
+
+    async def main(mode: str) -> int:
+        pool = await asyncpg.create_pool(dsn=settings.db_url, min_size=1, max_size=1)
+        try:
+            if mode == "apply":
+                applied = await apply_migrations(pool)
+                print(f"applied: {', '.join(applied) or 'nothing'}")
+            problems = await check_migrations(pool)
+        finally:
+            await pool.close()
+        for problem in problems:
+            print(problem)
+        return 1 if problems else 0
+
+    mode = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if mode not in ("apply", "check"):
+        sys.exit("usage: python -m src.db.migrations [apply|check]")
+    sys.exit(asyncio.run(main(mode)))
@@ -0,0 +1,16 @@
+-- Append-only per-user conversation log. Each row is one chat turn (the
+-- serialized pydantic-ai messages it added) or a summary that replaces every
+-- turn up to and including `covers_until`.
+CREATE TABLE IF NOT EXISTS chat_history (
+    id           BIGSERIAL PRIMARY KEY,
+    user_id      TEXT NOT NULL,
+    session_id   TEXT NOT NULL,
+    messages     JSONB NOT NULL,
+    token_count  INTEGER NOT NULL,
+    is_summary   BOOLEAN NOT NULL DEFAULT false,
+    covers_until BIGINT,
+    created_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS chat_history_session_idx
+    ON chat_history (user_id, session_id, is_summary, id DESC);
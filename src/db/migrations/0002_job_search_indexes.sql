@@ -0,0 +1,47 @@
+-- migrate: no-transaction
+-- Indexes for the get_jobs hot path. job_posts is owned by the main platform's
+-- Prisma schema, which only indexes primary keys and unique columns. Every index
+-- is built CONCURRENTLY so applying this against a live database doesn't block
+-- writes, and IF NOT EXISTS lets it coexist with indexes created by hand.
+
+-- Trigram matching for the title substring filter (LOWER(title) LIKE '%term%')
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Unfiltered searches and keyset pages: matches ORDER BY created_at DESC, id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_posts_accepting_created_idx
+    ON job_posts (created_at DESC, id) WHERE "IsAccepting";
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_posts_accepting_title_trgm_idx
+    ON job_posts USING gin (lower(title) gin_trgm_ops) WHERE "IsAccepting";
+
+-- Salary range filters: min_salary compares against MaxSalary and vice versa
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_posts_accepting_max_salary_idx
+    ON job_posts ("MaxSalary") WHERE "IsAccepting";
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_posts_accepting_min_salary_idx
+    ON job_posts ("MinSalary") WHERE "IsAccepting";
+
+-- Dimension filters, with the page order as trailing columns so a single
+-- dimension value is read newest first without a sort
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_posts_accepting_city_idx
+    ON job_posts (city_id, created_at DESC, id) WHERE "IsAccepting";
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_posts_accepting_country_idx
+    ON job_posts (country_id, created_at DESC, id) WHERE "IsAccepting";
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_posts_accepting_job_type_idx
+    ON job_posts (job_type_id, created_at DESC, id) WHERE "IsAccepting";
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_posts_accepting_category_idx
+    ON job_posts (category_id, created_at DESC, id) WHERE "IsAccepting";
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_posts_accepting_currency_idx
+    ON job_posts (currency_id, created_at DESC, id) WHERE "IsAccepting";
+
+-- Change feeds: the job index sync and the response cache freshness check
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_posts_updated_at_idx
+    ON job_posts (updated_at);
+
+-- get_user_profile joins skills on the profile
+CREATE INDEX CONCURRENTLY IF NOT EXISTS skills_user_profile_id_idx
+    ON skills (user_profile_id);
@@ -0,0 +1,46 @@
+-- migrate: no-transaction
+-- Precomputed job recommendations (see src/services/recommendations.py). The
+-- indexes on user_profile and skills are built CONCURRENTLY like 0002's, since
+-- those tables belong to the main platform and take writes while this runs.
+
+-- The profile fields the scorer reads, copied from user_profile and skills so
+-- matching a changed post against every profile is an indexed join.
+-- Skills are lowercased for substring matching against post text.
+CREATE TABLE IF NOT EXISTS recommendation_profiles (
+    user_id      TEXT PRIMARY KEY,
+    job_role_id  TEXT,
+    city_id      TEXT,
+    country_id   TEXT,
+    skills       TEXT[] NOT NULL DEFAULT '{}',
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS recommendation_profiles_role_idx ON recommendation_profiles (job_role_id);
+CREATE INDEX IF NOT EXISTS recommendation_profiles_city_idx ON recommendation_profiles (city_id);
+CREATE INDEX IF NOT EXISTS recommendation_profiles_country_idx ON recommendation_profiles (country_id);
+
+-- Each user's top posts. Reads go through (user_id, score DESC); the job_id
+-- index finds every list holding a post that changed.
+CREATE TABLE IF NOT EXISTS job_recommendations (
+    user_id TEXT NOT NULL,
+    job_id  TEXT NOT NULL,
+    score   DOUBLE PRECISION NOT NULL,
+    reasons TEXT[] NOT NULL,
+    PRIMARY KEY (user_id, job_id)
+);
+
+CREATE INDEX IF NOT EXISTS job_recommendations_user_score_idx
+    ON job_recommendations (user_id, score DESC, job_id);
+
+CREATE INDEX IF NOT EXISTS job_recommendations_job_idx ON job_recommendations (job_id);
+
+-- How far each change feed (job_posts, user_profile, skills) has been applied
+CREATE TABLE IF NOT EXISTS recommendation_watermarks (
+    source     TEXT PRIMARY KEY,
+    updated_at TIMESTAMP NOT NULL
+);
+
+-- Change feeds for profile edits, read with updated_at >= watermark
+CREATE INDEX CONCURRENTLY IF NOT EXISTS user_profile_updated_at_idx ON user_profile (updated_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS skills_updated_at_idx ON skills (updated_at);
@@ -0,0 +1,27 @@
+-- Full-text search over job post titles and descriptions (the get_jobs
+-- `keywords` filter). job_posts belongs to the main platform, so the vector is
+-- a plain nullable column kept up to date by a trigger rather than a stored
+-- generated column: adding it doesn't rewrite the table, and 0005 backfills
+-- existing rows and builds the index without blocking writes.
+ALTER TABLE job_posts ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+-- Title words rank above description words (weights A and B for ts_rank_cd)
+CREATE OR REPLACE FUNCTION job_posts_search_vector(title TEXT, description TEXT) RETURNS tsvector
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+$$;
+
+CREATE OR REPLACE FUNCTION job_posts_search_vector_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := job_posts_search_vector(NEW.title, NEW.description);
+    RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS job_posts_search_vector_update ON job_posts;
+
+CREATE TRIGGER job_posts_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description ON job_posts
+    FOR EACH ROW EXECUTE FUNCTION job_posts_search_vector_update();
@@ -0,0 +1,13 @@
+-- migrate: no-transaction
+-- Backfill and index for the search_vector column added in 0004. The backfill
+-- runs in batches of 5000 posts, each committed on its own, so a batch holds its
+-- row locks only while it runs and a retry after a failure carries on from the
+-- rows still NULL. A write to a post in the current batch waits for that batch.
+-- updated_at is left alone, so the change feeds don't see every post as changed.
+-- migrate: repeat
+UPDATE job_posts
+SET search_vector = job_posts_search_vector(title, description)
+WHERE id IN (SELECT id FROM job_posts WHERE search_vector IS NULL LIMIT 5000);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_posts_accepting_search_vector_idx
+    ON job_posts USING gin (search_vector) WHERE "IsAccepting";
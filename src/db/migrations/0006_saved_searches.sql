@@ -0,0 +1,57 @@
+-- Saved job searches and the notifications for posts matching them (see
+-- src/services/saved_searches.py).
+
+-- One row per distinct search a user ran. `filters` are the get_jobs filters as
+-- given, for showing and re-running the search; the columns after it are the same
+-- filters as the matcher checks them against a post: a lowercase LIKE pattern, the
+-- parsed keywords query and dimension IDs, NULL when unused.
+CREATE TABLE IF NOT EXISTS saved_searches (
+    id            BIGSERIAL PRIMARY KEY,
+    user_id       TEXT NOT NULL,
+    filters       JSONB NOT NULL,
+    title_pattern TEXT,
+    keywords      TSQUERY,
+    min_salary    INT,
+    max_salary    INT,
+    city_ids      TEXT[],
+    country_ids   TEXT[],
+    job_type_ids  TEXT[],
+    category_ids  TEXT[],
+    currency_ids  TEXT[],
+    created_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_used_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+    UNIQUE (user_id, filters)
+);
+
+CREATE INDEX IF NOT EXISTS saved_searches_user_idx ON saved_searches (user_id, last_used_at DESC);
+
+-- Reverse predicate index: each search under the keys of two of its filters,
+-- e.g. "city:city_006&title:act", or one, e.g. "min_salary:7". A changed post
+-- looks up the keys it satisfies, so only searches that can match it are checked.
+CREATE TABLE IF NOT EXISTS saved_search_keys (
+    key       TEXT NOT NULL,
+    search_id BIGINT NOT NULL REFERENCES saved_searches (id) ON DELETE CASCADE,
+    PRIMARY KEY (key, search_id)
+);
+
+CREATE INDEX IF NOT EXISTS saved_search_keys_search_idx ON saved_search_keys (search_id);
+
+-- A post that matched a saved search after it was saved. Reads go through the
+-- user's unseen notifications, newest first.
+CREATE TABLE IF NOT EXISTS saved_search_notifications (
+    search_id  BIGINT NOT NULL REFERENCES saved_searches (id) ON DELETE CASCADE,
+    job_id     TEXT NOT NULL,
+    user_id    TEXT NOT NULL,
+    matched_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    seen_at    TIMESTAMPTZ,
+    PRIMARY KEY (search_id, job_id)
+);
+
+CREATE INDEX IF NOT EXISTS saved_search_notifications_unseen_idx
+    ON saved_search_notifications (user_id, matched_at DESC) WHERE seen_at IS NULL;
+
+-- How far the job_posts change feed has been matched
+CREATE TABLE IF NOT EXISTS saved_search_watermarks (
+    source     TEXT PRIMARY KEY,
+    updated_at TIMESTAMP NOT NULL
+);
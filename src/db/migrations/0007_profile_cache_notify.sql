@@ -0,0 +1,48 @@
+-- Invalidation for the per-worker user profile cache (src/services/profile_cache.py):
+-- every change to a profile or its skills sends NOTIFY user_profile_changed, '<user_id>'.
+-- Workers listen when PROFILE_CACHE_CHANNEL=user_profile_changed. Notifications are
+-- sent on commit, and repeats for one user in a transaction are sent once.
+
+CREATE OR REPLACE FUNCTION user_profile_notify_change() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM pg_notify('user_profile_changed', OLD.user_id);
+    END IF;
+    IF TG_OP <> 'DELETE' AND NEW.user_id IS DISTINCT FROM OLD.user_id THEN
+        PERFORM pg_notify('user_profile_changed', NEW.user_id);
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+-- skills rows point at user_profile.id; the cache is keyed by user_profile.user_id
+CREATE OR REPLACE FUNCTION skills_notify_change() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    changed_user_id TEXT;
+BEGIN
+    FOR changed_user_id IN
+        SELECT user_id FROM user_profile
+        WHERE id IN (
+            CASE WHEN TG_OP <> 'INSERT' THEN OLD.user_profile_id END,
+            CASE WHEN TG_OP <> 'DELETE' THEN NEW.user_profile_id END
+        )
+    LOOP
+        PERFORM pg_notify('user_profile_changed', changed_user_id);
+    END LOOP;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS user_profile_notify_change ON user_profile;
+
+CREATE TRIGGER user_profile_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON user_profile
+    FOR EACH ROW EXECUTE FUNCTION user_profile_notify_change();
+
+DROP TRIGGER IF EXISTS skills_notify_change ON skills;
+
+CREATE TRIGGER skills_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON skills
+    FOR EACH ROW EXECUTE FUNCTION skills_notify_change();
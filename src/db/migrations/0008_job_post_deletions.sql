@@ -0,0 +1,41 @@
+-- Tombstones for job posts deleted outright. The in-memory search index and the
+-- ranker follow job_posts by updated_at, where a deleted row never shows up, so
+-- they read deletions from here instead (src/services/job_index.py). deleted_at is
+-- a plain TIMESTAMP like job_posts.updated_at.
+CREATE TABLE IF NOT EXISTS job_post_deletions (
+    job_id     TEXT PRIMARY KEY,
+    deleted_at TIMESTAMP NOT NULL DEFAULT clock_timestamp()::timestamp
+);
+
+CREATE INDEX IF NOT EXISTS job_post_deletions_deleted_at_idx ON job_post_deletions (deleted_at);
+
+CREATE OR REPLACE FUNCTION job_posts_record_deletion() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO job_post_deletions (job_id) VALUES (OLD.id)
+    ON CONFLICT (job_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+    RETURN NULL;
+END
+$$;
+
+-- Once per statement: a week is far longer than any process runs on a snapshot
+-- without picking up newer tombstones
+CREATE OR REPLACE FUNCTION job_post_deletions_prune() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM job_post_deletions WHERE deleted_at < localtimestamp - interval '7 days';
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS job_posts_record_deletion ON job_posts;
+
+CREATE TRIGGER job_posts_record_deletion
+    AFTER DELETE ON job_posts
+    FOR EACH ROW EXECUTE FUNCTION job_posts_record_deletion();
+
+DROP TRIGGER IF EXISTS job_post_deletions_prune ON job_posts;
+
+CREATE TRIGGER job_post_deletions_prune
+    AFTER DELETE ON job_posts
+    FOR EACH STATEMENT EXECUTE FUNCTION job_post_deletions_prune();
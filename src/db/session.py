@@ -1,34 +1,192 @@
+import asyncio
 import asyncpg
+import time
 from typing import Optional
 import logging
 from src.core.config import settings
+from src.core.metrics import registry
+from src.db.job_search import prepare_connection
 
 logger = logging.getLogger(__name__)
 logger = logging.getLogger("uvicorn.error")
 
+acquire_wait = registry.histogram(
+    "db_pool_acquire_wait_seconds", "Time spent waiting for a pool connection"
+).labels()
+acquire_timeouts = registry.counter("db_pool_acquire_timeouts_total", "Pool checkouts that hit the acquire timeout")
+
+class _Checkout:
+    # What InstrumentedPool.acquire() returns: awaited for a connection to release by
+    # hand, or used with `async with`, like asyncpg's own acquire()
+    __slots__ = ("pool", "timeout", "connection")
+
+    def __init__(self, pool: "InstrumentedPool", timeout: Optional[float]):
+        self.pool = pool
+        self.timeout = timeout
+        self.connection: Optional[asyncpg.Connection] = None
+
+    def __await__(self):
+        return self.pool._checkout(self.timeout).__await__()
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        self.connection = await self.pool._checkout(self.timeout)
+        return self.connection
+
+    async def __aexit__(self, *exc_info) -> None:
+        connection, self.connection = self.connection, None
+        await self.pool.release(connection)
+
+class InstrumentedPool:
+    """
+    asyncpg pool with a default acquire timeout and saturation numbers: how
+    many callers are waiting for a connection and how long they waited.
+
+    Wraps a pool from asyncpg.create_pool and only uses its public API, so
+    asyncpg upgrades can't break it. Its query helpers check out through
+    acquire() like every other caller, so every checkout is timed.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, acquire_timeout: Optional[float] = None):
+        self.pool = pool
+        self.acquire_timeout = acquire_timeout
+        self.acquire_timeouts = 0
+        self.waiting = 0
+        # Most callers waiting at once since the last take_peak_waiting()
+        self.peak_waiting = 0
+
+    @classmethod
+    async def create(cls, dsn: str, *, acquire_timeout: Optional[float] = None, **kwargs) -> "InstrumentedPool":
+        return cls(await asyncpg.create_pool(dsn, **kwargs), acquire_timeout)
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _Checkout:
+        return _Checkout(self, timeout)
+
+    async def _checkout(self, timeout: Optional[float]) -> asyncpg.Connection:
+        started = time.perf_counter()
+        # No idle connection and no room to open another, so this caller queues until one is released
+        blocked = self.pool.get_idle_size() == 0 and self.pool.get_size() >= self.pool.get_max_size()
+        if blocked:
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+        try:
+            return await self.pool.acquire(timeout=timeout if timeout is not None else self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            acquire_timeouts.inc()
+            raise
+        finally:
+            if blocked:
+                self.waiting -= 1
+            acquire_wait.observe(time.perf_counter() - started)
+
+    async def release(self, connection: asyncpg.Connection, *, timeout: Optional[float] = None) -> None:
+        await self.pool.release(connection, timeout=timeout)
+
+    async def execute(self, query: str, *args, timeout: Optional[float] = None) -> str:
+        async with self.acquire() as conn:
+            return await conn.execute(query, *args, timeout=timeout)
+
+    async def fetch(self, query: str, *args, timeout: Optional[float] = None) -> list[asyncpg.Record]:
+        async with self.acquire() as conn:
+            return await conn.fetch(query, *args, timeout=timeout)
+
+    async def fetchrow(self, query: str, *args, timeout: Optional[float] = None) -> Optional[asyncpg.Record]:
+        async with self.acquire() as conn:
+            return await conn.fetchrow(query, *args, timeout=timeout)
+
+    async def fetchval(self, query: str, *args, column: int = 0, timeout: Optional[float] = None):
+        async with self.acquire() as conn:
+            return await conn.fetchval(query, *args, column=column, timeout=timeout)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    def get_size(self) -> int:
+        return self.pool.get_size()
+
+    def get_idle_size(self) -> int:
+        return self.pool.get_idle_size()
+
+    def get_min_size(self) -> int:
+        return self.pool.get_min_size()
+
+    def get_max_size(self) -> int:
+        return self.pool.get_max_size()
+
+    def take_peak_waiting(self) -> int:
+        peak, self.peak_waiting = self.peak_waiting, self.waiting
+        return peak
+
+    def stats(self) -> dict:
+        size, idle = self.get_size(), self.get_idle_size()
+        return {
+            "size": size,
+            "min_size": self.get_min_size(),
+            "max_size": self.get_max_size(),
+            "in_use": size - idle,
+            "idle": idle,
+            "waiting": self.waiting,
+            "acquire_timeouts": self.acquire_timeouts,
+            "acquire_wait_seconds": acquire_wait.as_dict(),
+        }
+
+def pool_sizes() -> tuple[int, int]:
+    """
+    min_size and max_size of this process's pool. With DB_CONNECTION_BUDGET, the
+    budget covers every process of `python -m src.serve`: one connection is left
+    for the master and the WORKERS split the rest evenly, less the profile cache
+    listener's own connection in each worker when PROFILE_CACHE_CHANNEL is set.
+    """
+    if settings.db_connection_budget is None:
+        return settings.db_pool_min_size, settings.db_pool_max_size
+    listeners = 1 if settings.profile_cache_channel else 0
+    share = (settings.db_connection_budget - 1) // settings.workers - listeners
+    if share < 1:
+        raise ValueError(
+            f"DB_CONNECTION_BUDGET={settings.db_connection_budget} leaves no connection "
+            f"for each of {settings.workers} workers"
+        )
+    return min(settings.db_pool_min_size, share), share
+
 class DatabaseManager:
     def __init__(self):
-        self.pool: Optional[asyncpg.pool.Pool] = None
-   
+        self.pool: Optional[InstrumentedPool] = None
+
     async def init_pool(self):
-        self.pool = await asyncpg.create_pool(
-            dsn=settings.db_url,
-            min_size=5,
-            max_size=20
+        min_size, max_size = pool_sizes()
+        self.pool = await InstrumentedPool.create(
+            settings.db_url,
+            min_size=min_size,
+            max_size=max_size,
+            max_queries=50000,
+            max_inactive_connection_lifetime=settings.db_pool_max_inactive_lifetime,
+            acquire_timeout=settings.db_pool_acquire_timeout,
+            init=prepare_connection,
+        )
+        logger.info(
+            f"Database connection pool initialized "
+            f"(min_size={min_size}, max_size={max_size})."
         )
-        logger.info("Database connection pool initialized.")
-   
+
     async def close_pool(self):
         if self.pool:
             await self.pool.close()
             logger.info("Database connection pool closed.")
-   
-    def get_pool(self) -> asyncpg.pool.Pool:
+
+    def get_pool(self) -> InstrumentedPool:
         if not self.pool:
             raise RuntimeError("Database pool not initialized")
         return self.pool
 
 db_manager = DatabaseManager()
 
-async def get_db_pool() -> asyncpg.pool.Pool:
-    return db_manager.get_pool()
\ No newline at end of file
+def _pool_connections() -> dict[tuple[str, ...], float]:
+    if db_manager.pool is None:
+        return {}
+    stats = db_manager.pool.stats()
+    return {(state,): stats[state] for state in ("in_use", "idle", "waiting", "max_size")}
+
+registry.gauge("db_pool_connections", "Pool connections by state, read at scrape time", ("state",), _pool_connections)
+
+async def get_db_pool() -> InstrumentedPool:
+    return db_manager.get_pool()
@@ -1,17 +1,124 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from pydantic_ai import RunContext
+import asyncio
+import base64
+import binascii
 import json
-from typing import Optional
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Literal, Optional
 from asyncpg.pool import Pool
 
+from src.core.config import settings
+from src.core.metrics import errors, registry
+from src.db.session import InstrumentedPool
+from src.db.job_search import (
+    FILTER_NAMES, JobPage, Position, count_jobs, count_jobs_batch, fetch_page, fetch_pages, keyword_query, variant_key,
+)
+from src.schemas.job import JobFilters
+from src.schemas.user import UserProfile
+from src.services.dimension_cache import dimension_cache
+from src.services.job_index import job_index
+from src.services.job_ranker import job_ranker, terms
+from src.services.recommendations import recommendations
+
+PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+# get_jobs_batch: searches per call, and jobs shown per search
+MAX_BATCH_SEARCHES = 5
+BATCH_PAGE_SIZE = 5
+
+get_jobs_seconds = registry.histogram(
+    "get_jobs_seconds", "Job searches by filter combination and where they were served from", ("filters", "source")
+)
+
+@dataclass(slots=True)
+class JobSearchResult:
+    jobs: list[dict]
+    total_found: int
+    total_is_estimate: bool
+    next_cursor: Optional[str]
+    filters_applied: dict
+    error: Optional[str] = None
+    # get_jobs_batch only: total_found, total_is_estimate and next_cursor of each search
+    searches: Optional[list[dict]] = None
+
+    def as_dict(self) -> dict:
+        """The envelope returned by /jobs/search and used for search_params in /chat."""
+        result = {
+            "jobs": self.jobs,
+            "total_found": self.total_found,
+            "total_is_estimate": self.total_is_estimate,
+            "next_cursor": self.next_cursor,
+            "filters_applied": self.filters_applied,
+        }
+        if self.searches is not None:
+            result["searches"] = self.searches
+        if self.error is not None:
+            result = {"error": self.error, **result}
+        return result
+
+    def for_model(self) -> str:
+        """
+        What the model sees: the count and the titles, nothing else. The caller
+        already knows the filters it passed, and the IDs and cursor go to the
+        client in the structured response, not through the model.
+        """
+        if self.error is not None:
+            return f"Search failed: {self.error}"
+        if self.searches is not None:
+            return self._searches_for_model()
+        if not self.jobs:
+            return f"{_count(self.total_found, self.total_is_estimate)} found."
+        more = ", more available" if self.next_cursor else ""
+        return "\n".join([
+            f"{_count(self.total_found, self.total_is_estimate)} found, showing {len(self.jobs)}{more}:",
+            *(_job_line(job) for job in self.jobs),
+        ])
+
+    def _searches_for_model(self) -> str:
+        # Each job is listed under the first search that found it, and only mentioned by the others
+        lines = [f"{_count(self.total_found, self.total_is_estimate)} found by {len(self.searches)} searches."]
+        for i, search in enumerate(self.searches):
+            found = [job for job in self.jobs if i in job["searches"]]
+            listed = [job for job in found if job["searches"][0] == i]
+            header = f"Search {i + 1}: {_count(search['total_found'], search['total_is_estimate'])} found"
+            if found:
+                header += f", showing {len(found)}{', more available' if search['next_cursor'] else ''}"
+            if len(listed) < len(found):
+                header += f" ({len(found) - len(listed)} listed above)"
+            lines.append(header + (":" if listed else "."))
+            for job in listed:
+                also = ", ".join(str(n + 1) for n in job["searches"][1:])
+                lines.append(_job_line(job) + (f" (also search {also})" if also else ""))
+        return "\n".join(lines)
+
 class AgentDeps(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
-    user_profile: dict
-    conn: Pool
+    user_profile: UserProfile
+    # The app's pool, or a plain asyncpg one in benchmarks and scripts
+    pool: InstrumentedPool | Pool
+    # Whose recommendations get_recommended_jobs reads; None for runs on nobody's behalf
+    user_id: Optional[str] = None
+    # Filled by the search tools during a run, by tool call ID: calls from one model step run concurrently
+    tool_results: dict[str, JobSearchResult] = Field(default_factory=dict)
+
+def _count(total: int, is_estimate: bool) -> str:
+    return f"{'about ' if is_estimate else ''}{total} {'job' if total == 1 else 'jobs'}"
+
+def _job_line(job: dict) -> str:
+    # Recommendations say which parts of the profile each job matched, keyword searches how well
+    if job.get("reasons"):
+        return f"- {job['title']} (matches {', '.join(job['reasons'])})"
+    if "match_rank" in job:
+        return f"- {job['title']} (match {job['match_rank']:.2f})"
+    return f"- {job['title']}"
 
 async def get_jobs(
     ctx: RunContext[AgentDeps],
     title: Optional[str] = None,
+    keywords: Optional[str] = None,
     min_salary: Optional[int] = None,
     max_salary: Optional[int] = None,
     city: Optional[str] = None,
@@ -19,100 +126,430 @@ async def get_jobs(
     job_type: Optional[str] = None,
     job_category: Optional[str] = None,
     currency: Optional[str] = None,
+    sort: Optional[Literal["relevance", "newest"]] = None,
 ) -> str:
     """
     Optimized dynamic job search tool that returns only job IDs and titles.
-    Allows filtering by various job_posts table fields.
-    """
-    
-    limit: int = 10
-    pool = ctx.deps.pool
-
-    # Corrected base query with the right table join for job_category -> job_role
-    base_query = """
-    SELECT
-        jp.id,
-        jp.title
-    FROM job_posts jp
-    LEFT JOIN city ct ON jp.city_id = ct.id AND (ct."isDeleted" = false OR ct."isDeleted" IS NULL)
-    LEFT JOIN country cn ON jp.country_id = cn.id AND (cn."isDeleted" = false OR cn."isDeleted" IS NULL)
-    LEFT JOIN job_role cat ON jp.category_id = cat.id AND (cat."isDeleted" = false OR cat."isDeleted" IS NULL)
-    LEFT JOIN job_type jt ON jp.job_type_id = jt.id AND (jt."isDeleted" = false OR jt."isDeleted" IS NULL)
-    LEFT JOIN currency curr ON jp.currency_id = curr.id AND (curr."isDeleted" = false OR curr."isDeleted" IS NULL)
-    """
-
-    # --- Refactored Query Building ---
-    conditions = ["jp.\"IsAccepting\" = true"]
-    params = []
-
-    # A more robust way to add filters without manually tracking param counts
-    def add_filter(condition: str, value):
-        if value is not None:
-            params.append(value)
-            # The placeholder is determined by the final position in the params list
-            conditions.append(condition.format(len(params)))
-
-    add_filter('LOWER(jp.title) LIKE LOWER(${})', f"%{title}%" if title else None)
-    add_filter('jp."MaxSalary" >= ${}', min_salary)
-    add_filter('jp."MinSalary" <= ${}', max_salary)
-    add_filter('LOWER(ct.name) LIKE LOWER(${})', f"%{city}%" if city else None)
-    add_filter('LOWER(cn.name) LIKE LOWER(${})', f"%{country}%" if country else None)
-    add_filter('LOWER(jt.name) LIKE LOWER(${})', f"%{job_type}%" if job_type else None)
-    add_filter('LOWER(cat.name) LIKE LOWER(${})', f"%{job_category}%" if job_category else None)
-    add_filter('LOWER(curr.name) LIKE LOWER(${})', f"%{currency}%" if currency else None)
-
-    # Construct final query
-    where_clause = " AND ".join(conditions)
-    # Add the LIMIT parameter last
-    params.append(limit)
-    limit_param_index = len(params)
-    
-    final_query = f"""
-    {base_query}
-    WHERE {where_clause}
-    ORDER BY jp.created_at DESC
-    LIMIT ${limit_param_index}
+    Allows filtering by various job_posts table fields. `keywords` searches the
+    title and description for any of the words, best matches first, each with
+    its match rank (0-1); quote a phrase to require it. `sort` is "newest" for
+    the latest posts first or "relevance" for the best matches to the title and
+    the user's skills; leave it unset unless the user asks for one.
     """
+    # run_chat reads the typed result from deps; the model only gets the compact text
+    result = await search_jobs(
+        ctx.deps.pool,
+        title=title,
+        keywords=keywords,
+        min_salary=min_salary,
+        max_salary=max_salary,
+        city=city,
+        country=country,
+        job_type=job_type,
+        job_category=job_category,
+        currency=currency,
+        sort=sort,
+        skills=ctx.deps.user_profile.skills,
+    )
+    ctx.deps.tool_results[ctx.tool_call_id] = result
+    return result.for_model()
 
+async def get_jobs_batch(ctx: RunContext[AgentDeps], searches: list[JobFilters]) -> str:
+    """
+    Runs up to 5 job searches at once, each with the filters of get_jobs, and
+    shows the newest few jobs of each. Use it when the user names alternatives,
+    e.g. two cities or two roles, instead of calling get_jobs for each. A job
+    found by several searches is listed once.
+    """
+    result = await search_jobs_batch(ctx.deps.pool, [search.model_dump() for search in searches])
+    ctx.deps.tool_results[ctx.tool_call_id] = result
+    return result.for_model()
+
+async def get_recommended_jobs(ctx: RunContext[AgentDeps], limit: int = PAGE_SIZE) -> str:
+    """
+    Jobs picked in advance for the current user from their profile: role, city
+    or country, skills and recency. Use for "jobs for me" style requests that
+    don't add filters of their own.
+    """
+    result = await recommend_jobs(ctx.deps.pool, ctx.deps.user_id, limit)
+    ctx.deps.tool_results[ctx.tool_call_id] = result
+    return result.for_model()
+
+def encode_cursor(
+    filters: dict,
+    after: Optional[Position],
+    total: Optional[int],
+    total_is_estimate: bool,
+    ranked: Optional[tuple[int, list[str]]] = None,
+) -> str:
+    """
+    Opaque "show more" token. It carries the filters, the position after the
+    last job shown and the first page's total, so the next page needs nothing else.
+    Inside a relevance-ranked window the position is `ranked` instead: the offset
+    into the ranking and the skills it was ranked against.
+    """
+    payload = {
+        "f": {name: value for name, value in filters.items() if value is not None},
+        "a": [after[0].isoformat(), *after[1:]] if after else None,
+        "t": total,
+        "e": total_is_estimate,
+    }
+    if ranked is not None:
+        payload["r"], payload["s"] = ranked
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(
+    cursor: str,
+) -> tuple[dict, Optional[Position], Optional[int], bool, Optional[tuple[int, list[str]]]]:
+    """Inverse of encode_cursor. Raises ValueError for anything it didn't produce."""
     try:
-        async with pool.acquire() as conn:
-            rows = await conn.fetch(final_query, *params)
-        
-        jobs = [{"job_id": row['id'], "title": row['title']} for row in rows]
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        filters = {name: payload["f"][name] for name in FILTER_NAMES if name in payload["f"]}
+        if "r" in payload:
+            return filters, None, payload["t"], bool(payload["e"]), (int(payload["r"]), [str(skill) for skill in payload["s"]])
+        created_at, job_id, *match_rank = payload["a"]
+        after = (datetime.fromisoformat(created_at), str(job_id), *(float(rank) for rank in match_rank[:1]))
+        return filters, after, payload["t"], bool(payload["e"]), None
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
 
-        result = {
-            "jobs": jobs,
-            "total_found": len(jobs),
-            "filters_applied": {
-                "title": title,
-                "min_salary": min_salary,
-                "max_salary": max_salary,
-                "city": city,
-                "country": country,
-                "job_type": job_type,
-                "job_category": job_category,
-                "currency": currency,
-                "limit": limit
-            }
-        }
-        return json.dumps(result, default=str)
+async def search_jobs(
+    pool: Pool,
+    title: Optional[str] = None,
+    keywords: Optional[str] = None,
+    min_salary: Optional[int] = None,
+    max_salary: Optional[int] = None,
+    city: Optional[str] = None,
+    country: Optional[str] = None,
+    job_type: Optional[str] = None,
+    job_category: Optional[str] = None,
+    currency: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    cursor: Optional[str] = None,
+    sort: Optional[Literal["relevance", "newest"]] = None,
+    skills: Optional[list[str]] = None,
+) -> JobSearchResult:
+    """
+    The get_jobs search without the agent context, for callers that bypass the model.
+
+    Returns one page of results. `next_cursor` is set when more jobs match, and
+    passing it back as `cursor` returns the next page with the same filters; the
+    filter arguments are ignored then. `total_found` counts every matching job,
+    exactly up to JOB_SEARCH_EXACT_COUNT_LIMIT and estimated beyond that
+    (`total_is_estimate`).
+
+    `keywords` is a full-text search of title and description. In "relevance"
+    order its matches come best first by match rank, and each job carries its
+    `match_rank`; it is always served by Postgres.
+
+    `sort` defaults to JOB_RANKING_DEFAULT_SORT. Without keywords, "relevance" takes the newest
+    JOB_RANKING_CANDIDATES matches, orders them by similarity to `title` and
+    `skills` blended with recency, and pages through that ranking before going
+    on newest-first with the older matches. It needs the ranking model loaded
+    and is "newest" otherwise; `filters_applied` says which order was used.
+    """
+    filters = {
+        "title": title,
+        "keywords": keywords,
+        "min_salary": min_salary,
+        "max_salary": max_salary,
+        "city": city,
+        "country": country,
+        "job_type": job_type,
+        "job_category": job_category,
+        "currency": currency,
+    }
+    after = None
+    total, total_is_estimate = None, False
+    ranked = None
+    by_match = False
+    if cursor:
+        # Raises ValueError, which the caller reports as a bad request
+        cursor_filters, after, total, total_is_estimate, ranked = decode_cursor(cursor)
+        filters = {name: cursor_filters.get(name) for name in FILTER_NAMES}
+        by_match = after is not None and len(after) == 3
+    elif (sort or settings.job_ranking_default_sort) == "relevance":
+        if filters["keywords"]:
+            by_match = True
+        elif job_ranker.ready:
+            ranked = (0, skills or [])
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    started = time.perf_counter()
+    key = variant_key(tuple(name for name in FILTER_NAMES if filters.get(name) is not None))
+    # The in-memory index has no full-text search
+    source = "index" if job_index.ready and not filters["keywords"] else "sql"
+
+    try:
+        await dimension_cache.ensure_fresh(pool)
+
+        async def find(limit: int, after: Optional[Position], count_limit: Optional[int]) -> JobPage:
+            if source == "index":
+                # Served from the in-process index, no database round trip
+                index_filters = {name: value for name, value in filters.items() if name != "keywords"}
+                return job_index.search(**index_filters, limit=limit, after=after, count_limit=count_limit)
+            return await search_jobs_sql(
+                pool, **filters, limit=limit, after=after, count_limit=count_limit, by_match=by_match
+            )
+
+        # The total is counted once, on the first page, and carried forward in the cursor
+        count_limit = settings.job_search_exact_count_limit if total is None else None
+        # A ranked page re-reads the whole candidate window; the ranking is the same for the same window
+        page = await find(settings.job_ranking_candidates if ranked else limit, after, count_limit)
+        if page.total is not None:
+            total, total_is_estimate = page.total, page.total_is_estimate
+        elif total is None:
+            total = len(page.jobs)
+
+        jobs, next_after, next_cursor = page.jobs, page.next_after, None
+        if ranked:
+            offset, skills = ranked
+            order = job_ranker.rank(
+                [job["job_id"] for job in page.jobs],
+                terms(filters["title"]) + terms(" ".join(skills)),
+                settings.job_ranking_recency_weight,
+                settings.job_ranking_half_life_days,
+            )
+            jobs = [page.jobs[i] for i in order[offset:offset + limit]]
+            if offset + limit < len(order):
+                next_after = None
+                next_cursor = encode_cursor(filters, None, total, total_is_estimate, (offset + limit, skills))
+            elif next_after and len(jobs) < limit:
+                # Past the window the remaining matches are all older: fill the page newest-first
+                rest = await find(limit - len(jobs), next_after, None)
+                jobs, next_after = jobs + rest.jobs, rest.next_after
+        if next_after:
+            next_cursor = encode_cursor(filters, next_after, total, total_is_estimate)
+
+        result = JobSearchResult(
+            jobs=jobs,
+            total_found=total,
+            total_is_estimate=total_is_estimate,
+            next_cursor=next_cursor,
+            filters_applied={**filters, "limit": limit, "sort": "relevance" if ranked or by_match else "newest"},
+        )
+        get_jobs_seconds.observe(time.perf_counter() - started, key, source)
+        return result
 
     except Exception as e:
+        errors.inc("get_jobs", type(e).__name__)
         # Return error information for debugging
-        error_result = {
-            "error": str(e),
-            "jobs": [],
-            "total_found": 0,
-            "filters_applied": {
-                "title": title,
-                "min_salary": min_salary,
-                "max_salary": max_salary,
-                "city": city,
-                "country": country,
-                "job_type": job_type,
-                "job_category": job_category,
-                "currency": currency,
-                "limit": limit
-            }
-        }
-        return json.dumps(error_result, default=str)
+        return JobSearchResult(
+            jobs=[],
+            total_found=0,
+            total_is_estimate=False,
+            next_cursor=None,
+            filters_applied={**filters, "limit": limit, "sort": "relevance" if ranked or by_match else "newest"},
+            error=str(e),
+        )
+
+async def search_jobs_batch(pool: Pool, searches: list[dict], limit: int = BATCH_PAGE_SIZE) -> JobSearchResult:
+    """
+    Several searches at once, for get_jobs_batch: the first `limit` jobs of each
+    of the first MAX_BATCH_SEARCHES `searches`, newest first. Each search is a
+    dict of search_jobs filters. Searches without keywords are served from the
+    in-memory index when it is ready; the others go to Postgres together, as one
+    statement for the pages and one for the totals (see build_batch_queries).
+
+    A job found by several searches is in `jobs` once, where its first search
+    lists it, and its "searches" holds the positions of every search that found
+    it. `searches` has each search's total_found, total_is_estimate and a
+    next_cursor for search_jobs. `total_found` is the sum of the totals less the
+    duplicates on the pages shown; it is an estimate if any total is, or if
+    searches that overlap have more pages, where the overlap is unknown.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    filter_sets = [{name: search.get(name) for name in FILTER_NAMES} for search in searches[:MAX_BATCH_SEARCHES]]
+    filters_applied = {
+        "searches": [{name: value for name, value in filters.items() if value is not None} for filters in filter_sets],
+        "limit": limit,
+        "sort": "newest",
+    }
+    started = time.perf_counter()
+    count_limit = settings.job_search_exact_count_limit
+
+    try:
+        await dimension_cache.ensure_fresh(pool)
+        pages: list[Optional[JobPage]] = [None] * len(filter_sets)
+        sql = []
+        for i, filters in enumerate(filter_sets):
+            # The in-memory index has no full-text search
+            if job_index.ready and not filters["keywords"]:
+                index_filters = {name: value for name, value in filters.items() if name != "keywords"}
+                pages[i] = job_index.search(**index_filters, limit=limit, count_limit=count_limit)
+            else:
+                sql.append(i)
+        if sql:
+            found = await search_jobs_sql_batch(pool, [filter_sets[i] for i in sql], limit, count_limit)
+            for i, page in zip(sql, found):
+                pages[i] = page
+
+        jobs: list[dict] = []
+        seen: dict[str, dict] = {}
+        per_search = []
+        for i, (filters, page) in enumerate(zip(filter_sets, pages)):
+            for job in page.jobs:
+                if job["job_id"] in seen:
+                    seen[job["job_id"]]["searches"].append(i)
+                else:
+                    seen[job["job_id"]] = {**job, "searches": [i]}
+                    jobs.append(seen[job["job_id"]])
+            next_cursor = encode_cursor(filters, page.next_after, page.total, page.total_is_estimate) if page.next_after else None
+            per_search.append({
+                "total_found": page.total,
+                "total_is_estimate": page.total_is_estimate,
+                "next_cursor": next_cursor,
+            })
+
+        shared = [job for job in jobs if len(job["searches"]) > 1]
+        overlap_unknown = bool(shared) and any(search["next_cursor"] for search in per_search)
+        result = JobSearchResult(
+            jobs=jobs,
+            total_found=sum(search["total_found"] for search in per_search) - sum(len(job["searches"]) - 1 for job in shared),
+            total_is_estimate=overlap_unknown or any(search["total_is_estimate"] for search in per_search),
+            next_cursor=None,
+            filters_applied=filters_applied,
+            searches=per_search,
+        )
+        source = "sql" if len(sql) == len(filter_sets) else "index" if not sql else "mixed"
+        get_jobs_seconds.observe(time.perf_counter() - started, "batch", source)
+        return result
+
+    except Exception as e:
+        errors.inc("get_jobs_batch", type(e).__name__)
+        return JobSearchResult(
+            jobs=[],
+            total_found=0,
+            total_is_estimate=False,
+            next_cursor=None,
+            filters_applied=filters_applied,
+            error=str(e),
+            searches=[],
+        )
+
+async def recommend_jobs(pool: Pool, user_id: Optional[str], limit: int = PAGE_SIZE) -> JobSearchResult:
+    """
+    The user's precomputed recommendations in the search result envelope, for
+    get_recommended_jobs and /users/{user_id}/recommendations. Each job also has
+    "reasons": the parts of the profile it matched ("role", "city" or "country", "skills").
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    filters = {"recommended_for": "profile", "limit": limit}
+    try:
+        if not user_id:
+            raise ValueError("No user to recommend jobs for")
+        jobs = await recommendations.get(pool, user_id, limit)
+        return JobSearchResult(
+            jobs=jobs, total_found=len(jobs), total_is_estimate=False, next_cursor=None, filters_applied=filters
+        )
+    except Exception as e:
+        errors.inc("get_recommended_jobs", type(e).__name__)
+        return JobSearchResult(
+            jobs=[], total_found=0, total_is_estimate=False, next_cursor=None, filters_applied=filters, error=str(e)
+        )
+
+async def search_jobs_sql(
+    pool: Pool,
+    title: Optional[str] = None,
+    keywords: Optional[str] = None,
+    min_salary: Optional[int] = None,
+    max_salary: Optional[int] = None,
+    city: Optional[str] = None,
+    country: Optional[str] = None,
+    job_type: Optional[str] = None,
+    job_category: Optional[str] = None,
+    currency: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    after: Optional[Position] = None,
+    count_limit: Optional[int] = None,
+    by_match: bool = False,
+) -> JobPage:
+    """
+    Runs the job search directly against Postgres. Dimension filters are resolved
+    to IDs through the dimension cache, so the query only touches job_posts.
+    `after` is the position of the previous page's last job; with `count_limit`
+    the total is counted alongside the page. `by_match` orders a keyword search
+    by match rank, and its positions carry the rank.
+    """
+
+    filters = sql_filters(title, keywords, min_salary, max_salary, city, country, job_type, job_category, currency)
+    if filters is None:
+        return JobPage(jobs=[], total=0 if count_limit is not None else None)
+
+    # Always the same canonical statement (or a configured specialised one), see src/db/job_search.py
+    by_match = by_match and filters["keywords"] is not None
+    if count_limit is None:
+        return await fetch_page(pool, filters, limit, after, by_match)
+    # The count runs on its own connection, so it adds no latency to the page
+    page, (total, total_is_estimate) = await asyncio.gather(
+        fetch_page(pool, filters, limit, after, by_match),
+        count_jobs(pool, filters, count_limit),
+    )
+    page.total, page.total_is_estimate = total, total_is_estimate
+    return page
+
+async def search_jobs_sql_batch(
+    pool: Pool,
+    searches: list[dict],
+    limit: int,
+    count_limit: int,
+) -> list[JobPage]:
+    """
+    search_jobs_sql for several searches, each a dict of its filter arguments:
+    first pages newest first, with totals. All pages come from one statement
+    and all totals from another, run side by side.
+    """
+    filter_sets = [sql_filters(**search) for search in searches]
+    runnable = [filters for filters in filter_sets if filters is not None]
+    pages, totals = [], []
+    if runnable:
+        pages, totals = await asyncio.gather(
+            fetch_pages(pool, runnable, limit),
+            count_jobs_batch(pool, runnable, count_limit),
+        )
+    found = iter(zip(pages, totals))
+    results = []
+    for filters in filter_sets:
+        if filters is None:
+            results.append(JobPage(jobs=[], total=0))
+            continue
+        page, (total, total_is_estimate) = next(found)
+        page.total, page.total_is_estimate = total, total_is_estimate
+        results.append(page)
+    return results
+
+def sql_filters(
+    title: Optional[str] = None,
+    keywords: Optional[str] = None,
+    min_salary: Optional[int] = None,
+    max_salary: Optional[int] = None,
+    city: Optional[str] = None,
+    country: Optional[str] = None,
+    job_type: Optional[str] = None,
+    job_category: Optional[str] = None,
+    currency: Optional[str] = None,
+) -> Optional[dict]:
+    """
+    Filter arguments as the job search statements take them, or None when a
+    dimension filter matches no live row in its lookup table, and so no job.
+    """
+    filters = {
+        "title": f"%{title}%" if title else None,
+        "keywords": keyword_query(keywords) if keywords else None,
+        "min_salary": min_salary,
+        "max_salary": max_salary,
+    }
+    for name, table, term in (
+        ("city", "city", city),
+        ("country", "country", country),
+        ("job_type", "job_type", job_type),
+        ("job_category", "job_role", job_category),
+        ("currency", "currency", currency),
+    ):
+        if not term:
+            continue
+        ids = dimension_cache.resolve(table, term)
+        if not ids:
+            return None
+        filters[name] = list(ids)
+    return filters
@@ -1,26 +1,83 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
 import logfire
 
 from src.core.config import settings
+from src.core.metrics import registry
+from src.core.observability import configure_observability
+from src.db.migrations import migrate_on_startup
 from src.db.session import db_manager
+from src.services.admission import AdmissionRejected
+from src.services.dimension_cache import dimension_cache
+from src.services.health_monitor import health_monitor
+from src.services.job_index import job_index
+from src.services.job_ranker import job_ranker
+from src.services.profile_cache import profile_cache
+from src.services.recommendations import recommendations
+from src.services.saved_searches import saved_searches
+from src.services.response_cache import response_cache
+from src.services.chat_service import get_agent
 from src.api.v1 import endpoints
 
 logger = logging.getLogger("uvicorn.error")
-logfire.configure(token=settings.logfire_write_token)
+configure_observability()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Built here rather than at import, so a bad model config fails startup instead of the first chat
+    get_agent()
     try:
+        # Before the pool: its connections prepare statements against the migrated schema
+        await migrate_on_startup(settings.db_url, settings.migrations_mode)
         await db_manager.init_pool()
+        # Already loaded in a worker forked by src.serve
+        await dimension_cache.ensure_fresh(db_manager.get_pool())
+        await health_monitor.start(
+            db_manager.get_pool(), settings.health_check_interval, settings.db_pool_saturation_warning
+        )
         logger.info("App started with database connection.")
     except Exception as e:
         logger.error(f"Failed to initialize database pool: {e}")
         raise
+    if settings.response_cache_enabled:
+        response_cache.start_freshness_watch(db_manager.get_pool(), settings.response_cache_freshness_interval)
+    if settings.profile_cache_channel:
+        profile_cache.start_listening(settings.db_url, settings.profile_cache_channel)
+    if settings.job_index_enabled:
+        # Optional: get_jobs falls back to SQL if the index can't be built
+        try:
+            # A worker forked by src.serve already maps the master's snapshot
+            if not job_index.ready:
+                await job_index.load(db_manager.get_pool())
+            job_index.start_sync(db_manager.get_pool(), settings.job_index_poll_interval)
+        except Exception as e:
+            logger.error(f"Failed to load job search index, using SQL search: {e}")
+    if settings.job_ranking_enabled:
+        # Optional: searches stay newest-first until the ranking model is loaded
+        try:
+            if not job_ranker.ready:
+                await job_ranker.load(db_manager.get_pool())
+            job_ranker.start_sync(db_manager.get_pool(), settings.job_ranking_poll_interval)
+        except Exception as e:
+            logger.error(f"Failed to load job ranking model, results stay newest-first: {e}")
+    if settings.recommendations_enabled:
+        # Every worker runs the loop; an advisory lock lets one of them do each round
+        recommendations.start_refresh(db_manager.get_pool(), settings.recommendations_refresh_interval)
+    if settings.saved_searches_enabled:
+        # Same as above: one worker matches changed posts each round
+        saved_searches.start_refresh(db_manager.get_pool(), settings.saved_searches_refresh_interval)
     yield
     try:
+        await health_monitor.stop()
+        await job_index.stop_sync()
+        await job_ranker.stop_sync()
+        await recommendations.stop_refresh()
+        await saved_searches.stop_refresh()
+        await response_cache.stop_freshness_watch()
+        await profile_cache.stop_listening()
         await db_manager.close_pool()
         logger.info("App shutdown.")
     except Exception as e:
@@ -37,6 +94,20 @@ app.add_middleware(
 
 logfire.instrument_fastapi(app=app)
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    # 429 for a user over their own rate, 503 when the service is at capacity
+    return JSONResponse(
+        {"detail": str(exc), "reason": exc.reason},
+        status_code=exc.status_code,
+        headers={"Retry-After": exc.retry_after_header()},
+    )
+
 
 # Include the router from the api directory
-app.include_router(endpoints.router, prefix="/api/v1")
\ No newline at end of file
+app.include_router(endpoints.router, prefix="/api/v1")
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus scrape target, independent of Logfire; numbers are per worker process
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
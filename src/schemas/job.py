@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
+
+class JobFilters(BaseModel):
+    # Same filters as the get_jobs tool; get_jobs_batch takes a list of them
+    title: Optional[str] = None
+    # Full-text search of title and description; best matches first in relevance order
+    keywords: Optional[str] = None
+    min_salary: Optional[int] = None
+    max_salary: Optional[int] = None
+    city: Optional[str] = None
+    country: Optional[str] = None
+    job_type: Optional[str] = None
+    job_category: Optional[str] = None
+    currency: Optional[str] = None
+
+class JobSearchRequest(JobFilters):
+    # `next_cursor` from a previous page; its filters replace the ones above
+    cursor: Optional[str] = None
+    limit: int = Field(10, ge=1, le=50)
+    # "relevance" ranks by similarity to the title and these skills; defaults to JOB_RANKING_DEFAULT_SORT
+    sort: Optional[Literal["relevance", "newest"]] = None
+    skills: list[str] = Field(default_factory=list)
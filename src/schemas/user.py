@@ -12,4 +12,8 @@ class UserProfile(BaseModel):
 
 class ChatRequest(BaseModel): # <-- ChatRequest also goes here!
     user_id: str
-    message: str
\ No newline at end of file
+    message: str
+    session_id: str = "default"
+
+class ChatBatchRequest(BaseModel):
+    requests: list[ChatRequest] = Field(..., min_length=1)
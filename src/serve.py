@@ -0,0 +1,212 @@
+# Multi-process server: preloads once, forks WORKERS uvicorn processes that share it.
+#
+#   WORKERS=4 DB_CONNECTION_BUDGET=60 python -m src.serve --host 0.0.0.0 --port 8000
+#
+# The master applies migrations (per MIGRATIONS_MODE), builds the agent (and with it
+# the compiled prompt), loads the dimension tables and the ranking model, and
+# publishes a job search snapshot to JOB_INDEX_SNAPSHOT_DIR, all before forking.
+# Workers inherit that memory copy-on-write and map the snapshot, so their startup
+# skips the loads, and pages are only copied once a worker writes to them.
+# gc.freeze() keeps the collector from writing to every preloaded object in each worker.
+#
+# Snapshots are built in a short-lived child, so the build's garbage never sits in
+# the master or in the workers forked from it. The master then supervises: it
+# restarts workers that die and publishes a new snapshot every
+# JOB_INDEX_SNAPSHOT_INTERVAL seconds. Each worker switches to it on its next index
+# poll. SIGTERM or SIGINT stop the workers gracefully, then the master.
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from pathlib import Path
+
+import asyncpg
+import uvicorn
+
+from src.core.config import settings
+from src.db.migrations import migrate_on_startup
+from src.db.session import pool_sizes
+from src.main import app
+from src.services.chat_service import get_agent
+from src.services.dimension_cache import dimension_cache
+from src.services.job_index import job_index
+from src.services.job_ranker import job_ranker
+
+logger = logging.getLogger("uvicorn.error")
+
+# Seconds between checks on the workers, and the least time before a slot is restarted again
+SUPERVISE_INTERVAL = 0.5
+RESTART_DELAY = 1.0
+# Seconds a stopping worker gets to finish its requests before it is killed
+SHUTDOWN_TIMEOUT = 30.0
+
+
+async def _with_connection(work) -> None:
+    # The master's one connection of the budget, held only while it loads or publishes
+    pool = await asyncpg.create_pool(dsn=settings.db_url, min_size=1, max_size=1)
+    try:
+        await work(pool)
+    finally:
+        await pool.close()
+
+
+def _snapshot_dir() -> Path:
+    directory = Path(settings.job_index_snapshot_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def start_publish() -> int:
+    """Forks a child that builds and publishes a job search snapshot. Returns its pid."""
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 1
+        try:
+            asyncio.run(_with_connection(lambda pool: job_index.publish(pool, _snapshot_dir())))
+            code = 0
+        except Exception as e:
+            logger.error(f"Failed to publish job search snapshot: {e}")
+        finally:
+            os._exit(code)
+    return pid
+
+
+def finish_publish(status: int) -> None:
+    # The master follows too, so a restarted worker starts from the newest snapshot
+    # and the previous one is unmapped once no worker uses it
+    if os.waitstatus_to_exitcode(status) != 0:
+        return
+    try:
+        job_index.follow(_snapshot_dir())
+    except Exception as e:
+        logger.error(f"Failed to map published job search snapshot: {e}")
+
+
+async def preload(pool) -> None:
+    await dimension_cache.load(pool)
+    if settings.job_ranking_enabled:
+        try:
+            await job_ranker.load(pool)
+        except Exception as e:
+            logger.error(f"Failed to preload job ranking model, workers will load their own: {e}")
+
+
+def run_worker(config: uvicorn.Config, sock: socket.socket) -> None:
+    # uvicorn installs its own SIGINT/SIGTERM handlers for a graceful shutdown
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    code = 1
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+        code = 0
+    finally:
+        # Never return into the master's supervise loop
+        os._exit(code)
+
+
+def serve(host: str, port: int, log_level: str) -> None:
+    workers = settings.workers
+    # Fails here rather than in every worker if the budget can't cover them
+    min_size, max_size = pool_sizes()
+    config = uvicorn.Config(app, host=host, port=port, log_level=log_level)
+
+    started = time.perf_counter()
+    get_agent()
+    # Publishing and preloading read the migrated schema; the workers then find nothing pending
+    asyncio.run(migrate_on_startup(settings.db_url, settings.migrations_mode))
+    if settings.job_index_enabled:
+        # Optional, as in a single process: workers build their own index without it
+        _, status = os.waitpid(start_publish(), 0)
+        finish_publish(status)
+        if not job_index.ready:
+            logger.error("No job search snapshot published, workers will build their own.")
+    asyncio.run(_with_connection(preload))
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Preloaded in {time.perf_counter() - started:.1f}s; starting {workers} workers (pool {min_size}-{max_size} each).")
+
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(config.backlog)
+
+    stopping = False
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # pid -> slot, and when each slot was last started
+    running: dict[int, int] = {}
+    spawned_at = [0.0] * workers
+
+    def spawn(slot: int) -> None:
+        spawned_at[slot] = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            run_worker(config, sock)
+        running[pid] = slot
+
+    for slot in range(workers):
+        spawn(slot)
+
+    next_publish = time.monotonic() + settings.job_index_snapshot_interval
+    publisher = 0
+    idle: list[int] = []
+    while not stopping:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if not pid:
+                break
+            if pid == publisher:
+                publisher = 0
+                finish_publish(status)
+                continue
+            slot = running.pop(pid)
+            logger.warning(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}.")
+            idle.append(slot)
+        for slot in list(idle):
+            if not stopping and time.monotonic() - spawned_at[slot] >= RESTART_DELAY:
+                idle.remove(slot)
+                spawn(slot)
+        if job_index.ready and not publisher and time.monotonic() >= next_publish:
+            publisher = start_publish()
+            next_publish = time.monotonic() + settings.job_index_snapshot_interval
+        time.sleep(SUPERVISE_INTERVAL)
+
+    logger.info(f"Stopping {len(running)} workers.")
+    if publisher:
+        running[publisher] = -1
+    for pid in running:
+        os.kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    while running and time.monotonic() < deadline:
+        pid, _ = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            running.pop(pid, None)
+        else:
+            time.sleep(0.1)
+    for pid in running:
+        os.kill(pid, signal.SIGKILL)
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preload once and serve src.main:app from WORKERS forked processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.log_level)
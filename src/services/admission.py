@@ -0,0 +1,313 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from src.core.config import settings
+from src.core.metrics import registry
+
+logger = logging.getLogger("uvicorn.error")
+
+admission_wait = registry.histogram("admission_wait_seconds", "Time admitted model-bound requests spent queued for a slot")
+shed = registry.counter(
+    "admission_shed_total",
+    "Model-bound requests turned away: user_requests/user_tokens (429), queue_full/overloaded/deadline (503)",
+    ("reason",),
+)
+
+# Key for work no user asked for, e.g. response cache refreshes: it takes a slot but has no budget
+BACKGROUND = ""
+
+
+class AdmissionRejected(Exception):
+    """A model-bound request that can't be served in time. The API answers it with status_code and Retry-After."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """
+    Holds up to `capacity` tokens, refilled at `rate` per second. take() may
+    drive the balance negative (a run used more LLM tokens than reserved); the
+    debt is paid off by the refill before the next request gets through.
+    """
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available; 0 if they are now."""
+        self._refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= amount
+
+    def give(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+@dataclass(slots=True)
+class UserBudget:
+    requests: TokenBucket
+    tokens: TokenBucket
+
+
+class Admission:
+    """One admitted request. Set tokens_used once the run reports its usage, to settle the reservation."""
+
+    __slots__ = ("user_id", "reserved_tokens", "tokens_used", "started")
+
+    def __init__(self, user_id: str, reserved_tokens: float):
+        self.user_id = user_id
+        self.reserved_tokens = reserved_tokens
+        self.tokens_used: Optional[int] = None
+        self.started = time.monotonic()
+
+
+class AdmissionController:
+    """
+    Sits in front of every agent run, so a traffic spike queues here instead of
+    piling onto the model providers' rate limits.
+
+    - At most `max_in_flight` runs hold a slot at once. Others wait in a queue
+      of at most `max_queue`, served round-robin across users so one user's
+      burst can't starve everyone else's requests.
+    - A request waits at most `queue_timeout` seconds. If the queue ahead of it
+      already looks longer than that, it's turned away at once (503) rather than
+      after the wait.
+    - Each user has two token buckets: requests per minute, and LLM tokens per
+      minute. A run reserves the recent average token cost when admitted and
+      settles the difference with its actual usage. An empty bucket is a 429.
+
+    Fast-path answers and cache hits don't call the model and never come here.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queue: int,
+        queue_timeout: float,
+        requests_per_minute: float,
+        request_burst: int,
+        tokens_per_minute: float,
+        token_burst: int,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.requests_per_minute = requests_per_minute
+        self.request_burst = request_burst
+        self.tokens_per_minute = tokens_per_minute
+        self.token_burst = token_burst
+        self.in_flight = 0
+        self.queued = 0
+        # Waiters per user, in the order users get their next turn
+        self._waiting: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+        self._users: dict[str, UserBudget] = {}
+        self._prune_at = 10000
+        # Moving averages that price a slot and a run. Until a run has finished
+        # there's no estimate and only the deadline sheds; tokens start from a typical agent run.
+        self.avg_run_seconds: Optional[float] = None
+        self.avg_run_tokens = 2000.0
+
+    @asynccontextmanager
+    async def admit(self, user_id: Optional[str]) -> AsyncIterator[Admission]:
+        user_id = user_id or BACKGROUND
+        admission = self._reserve(user_id)
+        try:
+            await self._acquire_slot(admission)
+        except BaseException:
+            self._refund(admission)
+            raise
+        admission.started = time.monotonic()
+        try:
+            yield admission
+        finally:
+            self._release_slot()
+            self._settle(admission)
+
+    # --- Per-user budgets ---
+
+    def _budget(self, user_id: str) -> UserBudget:
+        budget = self._users.get(user_id)
+        if budget is None:
+            if len(self._users) >= self._prune_at:
+                self._prune()
+            budget = self._users[user_id] = UserBudget(
+                requests=TokenBucket(self.request_burst, self.requests_per_minute / 60),
+                tokens=TokenBucket(self.token_burst, self.tokens_per_minute / 60),
+            )
+        return budget
+
+    def _prune(self) -> None:
+        # A full bucket is the same as a new one, so idle users can be forgotten
+        now = time.monotonic()
+        for user_id in [u for u, b in self._users.items() if b.requests.is_full(now) and b.tokens.is_full(now)]:
+            del self._users[user_id]
+        self._prune_at = max(10000, 2 * len(self._users))
+
+    def _reserve(self, user_id: str) -> Admission:
+        if user_id == BACKGROUND:
+            return Admission(user_id, 0)
+        budget = self._budget(user_id)
+        now = time.monotonic()
+        reserve = min(self.avg_run_tokens, self.token_burst)
+        wait = budget.requests.wait_time(1, now)
+        if wait > 0:
+            self._reject(429, "user_requests", wait, "Too many chat requests")
+        wait = budget.tokens.wait_time(reserve, now)
+        if wait > 0:
+            self._reject(429, "user_tokens", wait, "Chat token budget used up")
+        budget.requests.take(1)
+        budget.tokens.take(reserve)
+        return Admission(user_id, reserve)
+
+    def _refund(self, admission: Admission) -> None:
+        # Turned away by load, not by the user's own rate: they keep their budget
+        budget = self._users.get(admission.user_id)
+        if budget is not None:
+            budget.requests.give(1)
+            budget.tokens.give(admission.reserved_tokens)
+
+    def _settle(self, admission: Admission) -> None:
+        elapsed = time.monotonic() - admission.started
+        if self.avg_run_seconds is None:
+            self.avg_run_seconds = elapsed
+        else:
+            self.avg_run_seconds += 0.1 * (elapsed - self.avg_run_seconds)
+        if admission.tokens_used is None:
+            return
+        self.avg_run_tokens += 0.1 * (admission.tokens_used - self.avg_run_tokens)
+        budget = self._users.get(admission.user_id)
+        if budget is not None:
+            budget.tokens.take(admission.tokens_used - admission.reserved_tokens)
+
+    # --- Global slots ---
+
+    def _expected_wait(self) -> float:
+        # Slots free up at about max_in_flight per average run; this request is behind everyone queued
+        return (self.avg_run_seconds or 0.0) * (self.queued + 1) / self.max_in_flight
+
+    async def _acquire_slot(self, admission: Admission) -> None:
+        if self.in_flight < self.max_in_flight and not self.queued:
+            self.in_flight += 1
+            admission_wait.observe(0.0)
+            return
+        if self.queued >= self.max_queue:
+            self._reject(503, "queue_full", self._expected_wait(), "Chat is at capacity")
+        if self._expected_wait() > self.queue_timeout:
+            self._reject(503, "overloaded", self._expected_wait(), "Chat is at capacity")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(admission.user_id, deque()).append(waiter)
+        self.queued += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait((waiter,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # The caller went away; a slot handed over at the same moment goes to the next waiter
+            if not self._withdraw(admission.user_id, waiter):
+                self._release_slot()
+            raise
+        if not waiter.done() and self._withdraw(admission.user_id, waiter):
+            self._reject(503, "deadline", self._expected_wait(), "Timed out waiting for chat capacity")
+        admission_wait.observe(time.monotonic() - started)
+
+    def _withdraw(self, user_id: str, waiter: asyncio.Future) -> bool:
+        """Takes a waiter out of the queue. False if it was already given a slot."""
+        if waiter.done():
+            return False
+        waiter.cancel()
+        queue = self._waiting.get(user_id)
+        queue.remove(waiter)
+        if not queue:
+            del self._waiting[user_id]
+        self.queued -= 1
+        return True
+
+    def _release_slot(self) -> None:
+        if self._waiting:
+            # The slot passes straight to the user whose turn is next, so in_flight doesn't change
+            user_id, queue = self._waiting.popitem(last=False)
+            waiter = queue.popleft()
+            if queue:
+                self._waiting[user_id] = queue
+            self.queued -= 1
+            waiter.set_result(None)
+        else:
+            self.in_flight -= 1
+
+    def _reject(self, status_code: int, reason: str, retry_after: float, message: str) -> None:
+        shed.inc(reason)
+        raise AdmissionRejected(status_code, reason, retry_after, f"{message}, retry after {max(1, math.ceil(retry_after))}s")
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "queued_users": len(self._waiting),
+            "tracked_users": len(self._users),
+            "avg_run_seconds": None if self.avg_run_seconds is None else round(self.avg_run_seconds, 3),
+            "avg_run_tokens": round(self.avg_run_tokens, 1),
+            "shed": {values[0]: count for values, count in sorted(shed.values.items())},
+        }
+
+
+class _NoAdmission:
+    """Stands in for the controller when ADMISSION_ENABLED is false."""
+
+    @asynccontextmanager
+    async def admit(self, user_id: Optional[str]) -> AsyncIterator[Admission]:
+        yield Admission(user_id or BACKGROUND, 0)
+
+    def stats(self) -> dict:
+        return {"enabled": False}
+
+
+admission = (
+    AdmissionController(
+        max_in_flight=settings.admission_max_in_flight,
+        max_queue=settings.admission_max_queue,
+        queue_timeout=settings.admission_queue_timeout,
+        requests_per_minute=settings.user_requests_per_minute,
+        request_burst=settings.user_request_burst,
+        tokens_per_minute=settings.user_tokens_per_minute,
+        token_burst=settings.user_token_burst,
+    )
+    if settings.admission_enabled
+    else _NoAdmission()
+)
+
+registry.gauge(
+    "admission_requests", "Model-bound requests holding a slot (running) and waiting for one (queued)", ("state",),
+    lambda: {("running",): getattr(admission, "in_flight", 0), ("queued",): getattr(admission, "queued", 0)},
+)
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+from typing import AsyncIterator
+
+from asyncpg.pool import Pool
+
+from src.schemas.user import ChatRequest
+from src.services.chat_service import run_chat
+from src.services.user_service import get_user_profiles
+
+logger = logging.getLogger("uvicorn.error")
+
+
+async def run_chat_batch(requests: list[ChatRequest], pool: Pool, concurrency: int) -> AsyncIterator[dict]:
+    """
+    Runs many chat requests, e.g. for nightly recommendation campaigns, and
+    yields one result per request in completion order.
+
+    All profiles are fetched in a single query and at most `concurrency` agent
+    runs are in flight at once. A failing item yields an "error" result instead
+    of stopping the batch. Batch runs don't read or write conversation history.
+    """
+    profiles = await get_user_profiles([request.user_id for request in requests], pool)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index: int, request: ChatRequest) -> dict:
+        result = {"index": index, "user_id": request.user_id}
+        profile = profiles.get(request.user_id)
+        if profile is None:
+            return {**result, "error": "User profile not found"}
+        try:
+            async with semaphore:
+                response = await run_chat(
+                    user_message=request.message, user_profile=profile, pool=pool, user_id=request.user_id
+                )
+            return {**result, "response": response}
+        except Exception as e:
+            logger.error(f"Batch chat item {index} for user_id {request.user_id} failed: {e}")
+            return {**result, "error": str(e)}
+
+    tasks = [asyncio.create_task(run_one(index, request)) for index, request in enumerate(requests)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The consumer went away (e.g. the HTTP client disconnected): stop the remaining runs
+        for task in tasks:
+            task.cancel()
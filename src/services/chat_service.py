@@ -1,104 +1,462 @@
 from pydantic_ai import Agent, RunContext, Tool
-from pydantic_ai.messages import ModelMessage, ToolReturnPart, TextPart
-from pydantic_ai.providers.groq import GroqProvider
-from pydantic_ai.models.groq import GroqModel, GroqModelName, GroqModelSettings
-from pydantic_ai.providers.openai import OpenAIProvider
-from pydantic_ai.models.openai import OpenAIModel, OpenAIModelName, OpenAIModelSettings
-from pydantic import BaseModel, ConfigDict
-from src.dependencies.tools import get_jobs
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    UserPromptPart,
+    ToolCallPart,
+    ToolReturnPart,
+    TextPart,
+    TextPartDelta,
+    PartStartEvent,
+    PartDeltaEvent,
+    FunctionToolResultEvent,
+)
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+from src.dependencies.tools import (
+    PAGE_SIZE, AgentDeps, JobSearchResult, get_jobs, get_jobs_batch, get_recommended_jobs, recommend_jobs, search_jobs,
+)
 from src.schemas.user import UserProfile
 from src.core.config import settings
+from src.core.metrics import errors, registry
+from src.core.observability import configure_observability
+from src.services import intent_router
+from src.services.admission import AdmissionRejected, admission
+from src.services.dimension_cache import dimension_cache
+from src.services.history_service import Conversation, save_turn_safely
+from src.services.intent_router import router_stats
+from src.services.model_router import CircuitBreaker, HedgedModel, ModelRoute
+from src.services.prompt_compiler import get_prompt, user_suffix
+from src.services.response_cache import response_cache
+from src.services.saved_searches import saved_searches
 from asyncpg.pool import Pool
-import json
+from contextlib import asynccontextmanager
+from functools import cache
+from typing import AsyncIterator, Iterable, Optional
+import asyncio
 import logging
 import logfire
-
-# MODEL_NAME : GroqModelName = "deepseek-r1-distill-llama-70b"
-# model_settings : GroqModelSettings = GroqModelSettings(temperature=0.1, top_p=0.95, groq_reasoning_format="hidden")
-# model : GroqModel = GroqModel(model_name=MODEL_NAME, provider=GroqProvider(api_key=settings.groq_api_key))
-
-MODEL_NAME : OpenAIModelName = "gpt-4o-mini"
-model_settings : OpenAIModelSettings = OpenAIModelSettings(temperature=0.1, top_p=0.95)
-model : OpenAIModel = OpenAIModel(model_name=MODEL_NAME, provider=OpenAIProvider(api_key=settings.openai_api_key))
+import time
 
 logger = logging.getLogger(__name__)
-logfire.configure(token=settings.logfire_write_token)
-logfire.instrument_pydantic_ai()
-
-class AgentDeps(BaseModel):
-    model_config = ConfigDict(arbitrary_types_allowed=True)
-    user_profile: UserProfile
-    pool: Pool
-
-with open("./src/dependencies/prompt.md", "r", encoding="utf-8") as file:
-    prompt = file.read()
-
-agent = Agent(
-    model=model,
-    instructions=prompt,
-    deps_type=AgentDeps,
-    tools=[Tool(get_jobs, takes_ctx=True, max_retries=0)],
-    instrument=True
+
+model_request_seconds = registry.histogram(
+    "model_request_seconds", "Each model request in an agent run; streams are timed to their end", ("model", "stream")
 )
+model_tokens = registry.counter("model_tokens_total", "Tokens sent to and received from the model", ("model", "direction"))
+response_build_seconds = registry.histogram(
+    "response_build_seconds", "Turning an agent run's messages into the /chat response"
+).labels()
+
+class MetricsModel(WrapperModel):
+    """Records the time and token usage of every request to the wrapped model."""
+
+    def _record(self, started: float, stream: str, usage) -> None:
+        model_request_seconds.observe(time.perf_counter() - started, self.model_name, stream)
+        model_tokens.inc(self.model_name, "in", amount=usage.request_tokens or 0)
+        model_tokens.inc(self.model_name, "out", amount=usage.response_tokens or 0)
+
+    async def request(self, *args, **kwargs) -> ModelResponse:
+        started = time.perf_counter()
+        try:
+            response = await self.wrapped.request(*args, **kwargs)
+        except Exception as e:
+            errors.inc("model_request", type(e).__name__)
+            raise
+        self._record(started, "false", response.usage)
+        return response
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        started = time.perf_counter()
+        try:
+            async with self.wrapped.request_stream(messages, model_settings, model_request_parameters) as response_stream:
+                yield response_stream
+        except Exception as e:
+            errors.inc("model_request", type(e).__name__)
+            raise
+        self._record(started, "true", response_stream.usage())
 
-@agent.instructions
 async def get_user_details(ctx : RunContext[AgentDeps]):
-    return f"""
-            User Details:
-                first_name= {ctx.deps.user_profile.first_name},
-                last_name= {ctx.deps.user_profile.last_name},
-                availability= {ctx.deps.user_profile.availability},
-                bio= {ctx.deps.user_profile.bio},
-                role= {ctx.deps.user_profile.role},
-                city= {ctx.deps.user_profile.city},
-                country= {ctx.deps.user_profile.country}
-                skills= {", ".join(ctx.deps.user_profile.skills)}
-            """
-
-message_history : list[ModelMessage] = []
-
-async def run_chat(user_message: str, user_profile: UserProfile, pool: Pool):
-    deps = AgentDeps(user_profile=user_profile.model_dump(), pool=pool)
+    # Appended after the compiled prompt, so the prefix before it is the same for every user
+    return user_suffix(ctx.deps.user_profile)
+
+def build_model(spec: str, max_retries: Optional[int] = None) -> Model:
+    """
+    A provider model from a "provider:model" spec such as "openai:gpt-4o-mini",
+    wrapped in MetricsModel. max_retries overrides the provider SDK's own retries.
+    """
+    provider, _, name = spec.partition(":")
+    retries = {} if max_retries is None else {"max_retries": max_retries}
+    # The provider client libraries take a few hundred ms to import, so they're only loaded here
+    if provider == "openai":
+        from openai import AsyncOpenAI
+        from pydantic_ai.providers.openai import OpenAIProvider
+        from pydantic_ai.models.openai import OpenAIModel
+
+        client = AsyncOpenAI(api_key=settings.openai_api_key, base_url=settings.openai_base_url, **retries)
+        return MetricsModel(OpenAIModel(model_name=name, provider=OpenAIProvider(openai_client=client)))
+    if provider == "groq":
+        from groq import AsyncGroq
+        from pydantic_ai.providers.groq import GroqProvider
+        from pydantic_ai.models.groq import GroqModel
+
+        client = AsyncGroq(api_key=settings.groq_api_key, base_url=settings.groq_base_url, **retries)
+        return MetricsModel(GroqModel(model_name=name, provider=GroqProvider(groq_client=client)))
+    raise ValueError(f"Unknown model provider {provider!r} in {spec!r}, expected openai or groq")
+
+def build_router_model() -> Model:
+    if not settings.model_secondary:
+        return build_model(settings.model_primary)
+    routes = []
+    for spec in (settings.model_primary, settings.model_secondary):
+        breaker = CircuitBreaker(
+            spec,
+            failure_threshold=settings.model_breaker_failures,
+            latency_budget=settings.model_breaker_latency_budget,
+            cooldown=settings.model_breaker_cooldown,
+        )
+        # Failing over to the other provider replaces the SDK's retries with backoff
+        routes.append(ModelRoute(spec, build_model(spec, max_retries=0), breaker))
+    return HedgedModel(routes, hedge_delay=settings.model_hedge_delay)
+
+@cache
+def get_agent() -> Agent[AgentDeps, str]:
+    """
+    Builds the model and agent on first use rather than at import. The app's
+    lifespan calls this during startup; scripts get it on their first run.
+    """
+    configure_observability()
+    agent = Agent(
+        model=build_router_model(),
+        instructions=get_prompt().prefix,
+        deps_type=AgentDeps,
+        tools=[
+            Tool(get_jobs, takes_ctx=True, max_retries=0),
+            Tool(get_jobs_batch, takes_ctx=True, max_retries=0),
+            Tool(get_recommended_jobs, takes_ctx=True, max_retries=0),
+        ],
+        # Lets the model ask for several searches in one step; the tools then run concurrently
+        model_settings=ModelSettings(parallel_tool_calls=True),
+        instrument=True
+    )
+    agent.instructions(get_user_details)
+    return agent
+
+# Keeps fire-and-forget history writes referenced until they finish
+_background_tasks: set[asyncio.Task] = set()
+
+def _in_background(coroutine) -> None:
+    task = asyncio.create_task(coroutine)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+def remember_turn(pool: Pool, conversation: Optional[Conversation], new_messages: list[ModelMessage]) -> None:
+    if conversation is None:
+        return
+    _in_background(save_turn_safely(pool, conversation, new_messages))
+
+def remember_searches(pool: Pool, user_id: Optional[str], results: Iterable[JobSearchResult]) -> None:
+    # Successful get_jobs and get_jobs_batch searches become the user's saved searches
+    if not settings.saved_searches_enabled or not user_id:
+        return
+    searches = []
+    for result in results:
+        if result.error is None and "recommended_for" not in result.filters_applied:
+            searches += result.filters_applied.get("searches", [result.filters_applied])
+    if searches:
+        _in_background(saved_searches.save_safely(pool, user_id, searches))
+
+def history_for(conversation: Optional[Conversation]) -> Optional[list[ModelMessage]]:
+    if conversation is None:
+        return None
+    return conversation.messages(settings.history_token_budget) or None
+
+def build_response(tool_result: Optional[JobSearchResult], final_text_reply: str) -> dict:
+    """
+    The response envelope shared by /chat and the streaming endpoint.
+    """
+    if tool_result is not None:
+        # If we found any tool data, we know a tool was used.
+        final_response = {
+            "type": "job_search_results",
+            "message": final_text_reply or "Here are the job opportunities I found:",
+            "data": tool_result.jobs,
+            "search_params": {
+                "filters_used": tool_result.filters_applied,
+                "results_count": tool_result.total_found,
+                "results_count_is_estimate": tool_result.total_is_estimate,
+                # Pass to /api/v1/jobs/search for the next page, no model call needed
+                "next_cursor": tool_result.next_cursor,
+            }
+        }
+        if tool_result.searches is not None:
+            # get_jobs_batch: totals and a next_cursor per search
+            final_response["search_params"]["searches"] = tool_result.searches
+        return {"response_type": "structured", "message": final_response}
+
+    # No tool was called, so it's a standard chat reply.
+    return {"response_type": "chat", "message": final_text_reply}
+
+def response_from_run(deps: AgentDeps, final_text_reply: str, new_messages: list[ModelMessage]) -> dict:
+    # The last search the model asked for is the one the reply describes; results
+    # of concurrent calls arrive in any order, so go by the calls in the messages
+    for message in reversed(new_messages):
+        if isinstance(message, ModelResponse):
+            for part in reversed(message.parts):
+                if isinstance(part, ToolCallPart) and part.tool_call_id in deps.tool_results:
+                    return build_response(deps.tool_results[part.tool_call_id], final_text_reply)
+    return build_response(None, final_text_reply)
+
+async def _run_agent(
+    user_message: str,
+    deps: AgentDeps,
+    message_history: Optional[list[ModelMessage]] = None,
+    user_id: Optional[str] = None,
+) -> tuple[dict, list[ModelMessage]]:
+    # Own results list, so a background cache refresh with the same deps can't mix into this run
+    deps = deps.model_copy(update={"tool_results": {}})
+    # Without a user_id (cache refreshes) the run takes a slot but isn't charged to anyone
+    async with admission.admit(user_id) as admitted:
+        result = await get_agent().run(user_prompt=user_message, deps=deps, message_history=message_history)
+        admitted.tokens_used = result.usage().total_tokens
+    started = time.perf_counter()
+    # deps only holds this run's searches, so one from an earlier turn isn't reported again
+    new_messages = result.new_messages()
+    response = response_from_run(deps, result.output, new_messages)
+    response_build_seconds.observe(time.perf_counter() - started)
+    remember_searches(deps.pool, user_id, deps.tool_results.values())
+    return response, new_messages
+
+def _reply_for_search(filters: dict, total_found: int, is_estimate: bool = False) -> str:
+    described = ", ".join(f'{name.replace("_", " ")} "{value}"' for name, value in filters.items())
+    if total_found == 0:
+        return f"I couldn't find any open jobs matching {described}. Try removing a filter or searching a nearby location."
+    noun = "job" if total_found == 1 else "jobs"
+    count = f"about {total_found}" if is_estimate else total_found
+    return f"I found {count} {noun} matching {described}. Would you like to narrow the search further?"
+
+def _reply_for_recommendations(user_profile: UserProfile, jobs: list[dict]) -> str:
+    # Name only the parts of the profile the listed jobs actually matched
+    matched = {reason for job in jobs for reason in job["reasons"]}
+    used = []
+    if "role" in matched and user_profile.role:
+        used.append(f'your role as "{user_profile.role}"')
+    if "city" in matched:
+        used.append(f'your city "{user_profile.city}"')
+    elif "country" in matched:
+        used.append(f'your country "{user_profile.country}"')
+    if "skills" in matched:
+        used.append("your skills")
+    described = ", ".join(used[:-1]) + f" and {used[-1]}" if len(used) > 1 else (used[0] if used else "your profile")
+    noun = "job" if len(jobs) == 1 else "jobs"
+    return f"Based on {described}, here are {len(jobs)} {noun} picked for you. Would you like to narrow them down?"
+
+async def try_fast_path(
+    user_message: str,
+    user_profile: UserProfile,
+    pool: Pool,
+    user_id: Optional[str] = None,
+) -> Optional[tuple[str, dict, list[ModelMessage]]]:
+    """
+    Answers greetings, unambiguous searches and plain "jobs for me" requests
+    without calling the model. Returns the route kind, the response envelope
+    and equivalent messages for the conversation history, or None when the
+    message needs the agent.
+    """
+    if not settings.intent_router_enabled:
+        return None
+    await dimension_cache.ensure_fresh(pool)
+    route = intent_router.route(user_message)
+    if route is None:
+        return None
+
+    request = ModelRequest(parts=[UserPromptPart(content=user_message)])
+    if route.kind == "greeting":
+        name = f" {user_profile.first_name}" if user_profile.first_name else ""
+        reply = f"Hi{name}! I'm here to help you find acting and entertainment opportunities on CastLink. How can I assist you today?"
+        return route.kind, build_response(None, reply), [request, ModelResponse(parts=[TextPart(content=reply)])]
+
+    if route.kind == "recommendations":
+        if not settings.recommendations_enabled or not user_id:
+            return None
+        tool_name, args = "get_recommended_jobs", {"limit": PAGE_SIZE}
+        tool_result = await recommend_jobs(pool, user_id, PAGE_SIZE)
+    else:
+        tool_name, args = "get_jobs", route.filters
+        tool_result = await search_jobs(pool, **route.filters, skills=user_profile.skills)
+    if tool_result.error is not None:
+        # Let the model deal with failures the way it always has
+        return None
+    remember_searches(pool, user_id, [tool_result])
+    if tool_name == "get_recommended_jobs":
+        if not tool_result.jobs:
+            # Nothing shares their role or location; the model can suggest a broader search
+            return None
+        reply = _reply_for_recommendations(user_profile, tool_result.jobs)
+    else:
+        reply = _reply_for_search(route.filters, tool_result.total_found, tool_result.total_is_estimate)
+    call = ToolCallPart(tool_name=tool_name, args=args)
+    messages = [
+        request,
+        ModelResponse(parts=[call]),
+        ModelRequest(parts=[ToolReturnPart(
+            tool_name=tool_name,
+            content=tool_result.for_model(),
+            tool_call_id=call.tool_call_id,
+        )]),
+        ModelResponse(parts=[TextPart(content=reply)]),
+    ]
+    return route.kind, build_response(tool_result, reply), messages
+
+def cache_key_for(user_message: str, user_profile: UserProfile, history: Optional[list[ModelMessage]]) -> Optional[str]:
+    # A reply that builds on earlier turns is specific to that conversation, so it isn't shared
+    if not settings.response_cache_enabled or history:
+        return None
+    return response_cache.key_for(user_message, user_profile)
+
+async def run_chat(
+    user_message: str,
+    user_profile: UserProfile,
+    pool: Pool,
+    conversation: Optional[Conversation] = None,
+    user_id: Optional[str] = None,
+):
+    """
+    Raises AdmissionRejected when the message needs the model and user_id is
+    over its rate, or there's no capacity within the queue timeout.
+    """
+    deps = AgentDeps(user_profile=user_profile.model_dump(), pool=pool, user_id=user_id)
+    history = history_for(conversation)
+    cache_key = cache_key_for(user_message, user_profile, history)
     
     try:
-        result = await agent.run(user_prompt=user_message, deps=deps)
-
-        # Get the full message history from the run
-        messages = result.all_messages()
-        
-        # Initialize variables to hold our findings
-        tool_data = None
-        final_text_reply = ""
-
-        # Iterate through all messages to find the last tool result and final text reply
-        for msg in messages:
-            for part in msg.parts:
-                if isinstance(part, ToolReturnPart):
-                    # Found a tool result. Parse its content.
-                    # This will overwrite previous tool results if multiple tools were called,
-                    # ensuring we get the last one before the final answer.
-                    tool_data = json.loads(part.content)
-                elif isinstance(part, TextPart):
-                    # This is a conversational text part. We'll capture the last one.
-                    final_text_reply = part.content
-
-        if tool_data:
-            # If we found any tool data, we know a tool was used.
-            final_response = {
-                "type": "job_search_results",
-                "message": final_text_reply or "Here are the job opportunities I found:",
-                "data": tool_data.get("jobs", []),
-                "search_params": {
-                    "filters_used": tool_data.get("filters_applied"),
-                    "results_count": tool_data.get("total_found"),
-                }
-            }
-            return {"response_type": "structured", "message": final_response}
-        
-        else:
-            # No ToolReturnPart was found, so it's a standard chat reply.
-            return {"response_type": "chat", "message": final_text_reply}
+        started = time.perf_counter()
+        fast = await try_fast_path(user_message, user_profile, pool, user_id)
+        if fast:
+            kind, response, new_messages = fast
+            router_stats.record_fast_path(kind, (time.perf_counter() - started) * 1000)
+            remember_turn(pool, conversation, new_messages)
+            return {**response, "cached": False}
+
+        if cache_key:
+            cached = await response_cache.get(cache_key, refresh=lambda: _run_agent(user_message, deps))
+            if cached:
+                remember_turn(pool, conversation, cached.messages)
+                return {**cached.response, "cached": True}
+
+        started = time.perf_counter()
+        response, new_messages = await _run_agent(user_message, deps, history, user_id)
+        router_stats.record_agent((time.perf_counter() - started) * 1000)
+        remember_turn(pool, conversation, new_messages)
+        if cache_key and response["response_type"] != "error":
+            await response_cache.set(cache_key, response, new_messages)
+        return {**response, "cached": False}
+
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        errors.inc("chat", type(e).__name__)
+        logger.exception("Agent error")
+        return {"response_type": "error", "message": f"Internal error: {str(e)}"}
+
+async def stream_chat(
+    user_message: str,
+    user_profile: UserProfile,
+    pool: Pool,
+    conversation: Optional[Conversation] = None,
+    user_id: Optional[str] = None,
+) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Streaming variant of run_chat. Yields (event, data) pairs:
+
+    - "text": {"delta": ...} for each chunk of model text as it arrives
+    - "job_search_results": the structured envelope, as soon as get_jobs returns
+    - "done": the same envelope run_chat would have returned; a cache hit sends only this
+    - "error": the run_chat error envelope
+    - "admitted": {} once the run holds a model slot, before the model is called.
+      It isn't meant for clients; AdmissionRejected is raised instead, and
+      always before the first event.
+
+    Closing the generator (e.g. when the client disconnects) cancels the model call.
+    """
+    deps = AgentDeps(user_profile=user_profile.model_dump(), pool=pool, user_id=user_id)
+    history = history_for(conversation)
+    cache_key = cache_key_for(user_message, user_profile, history)
+    started = time.perf_counter()
+    first_token_ms = None
+
+    try:
+        fast = await try_fast_path(user_message, user_profile, pool, user_id)
+        if fast:
+            kind, response, new_messages = fast
+            router_stats.record_fast_path(kind, (time.perf_counter() - started) * 1000)
+            remember_turn(pool, conversation, new_messages)
+            yield "done", {**response, "cached": False}
+            return
+
+        if cache_key:
+            cached = await response_cache.get(cache_key, refresh=lambda: _run_agent(user_message, deps))
+            if cached:
+                remember_turn(pool, conversation, cached.messages)
+                yield "done", {**cached.response, "cached": True}
+                return
+
+        async with admission.admit(user_id) as admitted:
+            yield "admitted", {}
+            async with get_agent().iter(
+                user_prompt=user_message,
+                deps=deps,
+                message_history=history,
+            ) as run:
+                async for node in run:
+                    if Agent.is_model_request_node(node):
+                        async with node.stream(run.ctx) as request_stream:
+                            async for event in request_stream:
+                                delta = None
+                                if isinstance(event, PartStartEvent) and isinstance(event.part, TextPart):
+                                    delta = event.part.content
+                                elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+                                    delta = event.delta.content_delta
+                                if delta:
+                                    if first_token_ms is None:
+                                        first_token_ms = (time.perf_counter() - started) * 1000
+                                    yield "text", {"delta": delta}
+
+                    elif Agent.is_call_tools_node(node):
+                        async with node.stream(run.ctx) as tool_stream:
+                            async for event in tool_stream:
+                                if isinstance(event, FunctionToolResultEvent) and isinstance(event.result, ToolReturnPart):
+                                    # Results go out as each call finishes, before the model writes its closing summary
+                                    tool_result = deps.tool_results.get(event.tool_call_id)
+                                    if tool_result is not None:
+                                        yield "job_search_results", build_response(tool_result, "")
+            admitted.tokens_used = run.usage().total_tokens
+
+        router_stats.record_agent((time.perf_counter() - started) * 1000)
+        new_messages = run.result.new_messages()
+        response = response_from_run(deps, run.result.output, new_messages)
+        remember_turn(pool, conversation, new_messages)
+        remember_searches(pool, user_id, deps.tool_results.values())
+        if cache_key and response["response_type"] != "error":
+            await response_cache.set(cache_key, response, new_messages)
+        yield "done", {**response, "cached": False}
+        logfire.info(
+            "chat stream finished",
+            first_token_ms=first_token_ms,
+            total_ms=(time.perf_counter() - started) * 1000,
+        )
 
+    except AdmissionRejected:
+        raise
     except Exception as e:
+        errors.inc("chat", type(e).__name__)
         logger.exception("Agent error")
-        return {"response_type": "error", "message": f"Internal error: {str(e)}"}
\ No newline at end of file
+        yield "error", {"response_type": "error", "message": f"Internal error: {str(e)}"}
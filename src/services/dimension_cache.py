@@ -0,0 +1,125 @@
+import asyncio
+import difflib
+import logging
+import time
+from typing import Optional
+
+from asyncpg.pool import Pool
+
+from src.core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+# Small lookup tables referenced by job_posts and user_profile. Names are unique per table.
+DIMENSION_TABLES = ("city", "country", "job_role", "job_type", "currency")
+
+# Minimum difflib similarity for a typo to count as a match, e.g. "mumbia" -> "mumbai"
+FUZZY_CUTOFF = 0.8
+# Resolved terms come from model output, so the memo is bounded
+MAX_RESOLVED_TERMS = 4096
+
+
+class DimensionCache:
+    """
+    Preloaded copy of the dimension tables, so filter text can be resolved to
+    IDs in memory and queries can use `fk = ANY($n)` instead of joining on names.
+
+    Resolution is case-insensitive substring matching (the old `LIKE '%term%'`
+    behaviour); when nothing matches, close spellings are tried instead.
+    Soft-deleted rows are never loaded. The whole cache is reloaded once it is
+    older than `ttl` seconds, or when `invalidate()` is called.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Bumped on every reload, so derived structures know when to rebuild
+        self.version = 0
+        self._names: dict[str, dict[str, str]] = {table: {} for table in DIMENSION_TABLES}
+        self._by_lower_name: dict[str, dict[str, str]] = {table: {} for table in DIMENSION_TABLES}
+        self._resolved: dict[tuple[str, str], frozenset[str]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    async def load(self, pool: Pool) -> None:
+        names: dict[str, dict[str, str]] = {}
+        async with pool.acquire() as conn:
+            for table in DIMENSION_TABLES:
+                rows = await conn.fetch(
+                    f'SELECT id, name FROM {table} WHERE "isDeleted" = false OR "isDeleted" IS NULL'
+                )
+                names[table] = {row["id"]: row["name"] for row in rows}
+
+        # Swap everything at once so readers never see a half-loaded cache
+        self._names = names
+        self._by_lower_name = {
+            table: {name.lower(): dim_id for dim_id, name in rows.items()} for table, rows in names.items()
+        }
+        self._resolved = {}
+        self._loaded_at = time.monotonic()
+        self.version += 1
+        logger.info(f"Dimension cache loaded: { {table: len(rows) for table, rows in names.items()} }")
+
+    async def ensure_fresh(self, pool: Pool) -> None:
+        if self.loaded and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        async with self._lock:
+            # Another request may have reloaded while we waited for the lock
+            if self.loaded and time.monotonic() - self._loaded_at < self.ttl:
+                return
+            await self.load(pool)
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def name(self, table: str, dim_id: Optional[str]) -> Optional[str]:
+        if dim_id is None:
+            return None
+        return self._names[table].get(dim_id)
+
+    def ids(self, table: str) -> list[str]:
+        return list(self._names[table])
+
+    def names(self, table: str) -> list[str]:
+        return list(self._names[table].values())
+
+    def resolve(self, table: str, term: str) -> frozenset[str]:
+        """Return the IDs in `table` whose name matches `term`; empty if nothing does, or the term is blank."""
+        term = term.strip().lower()
+        if not term:
+            # Every name contains "", so a blank term would otherwise match the whole table
+            return frozenset()
+        cache_key = (table, term)
+        ids = self._resolved.get(cache_key)
+        if ids is not None:
+            self.hits += 1
+            return ids
+
+        self.misses += 1
+        by_name = self._by_lower_name[table]
+        ids = frozenset(dim_id for name, dim_id in by_name.items() if term in name)
+        if not ids:
+            close = difflib.get_close_matches(term, by_name.keys(), n=3, cutoff=FUZZY_CUTOFF)
+            ids = frozenset(by_name[name] for name in close)
+        if len(self._resolved) >= MAX_RESOLVED_TERMS:
+            self._resolved.clear()
+        self._resolved[cache_key] = ids
+        return ids
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "sizes": {table: len(rows) for table, rows in self._names.items()},
+            "age_seconds": time.monotonic() - self._loaded_at if self.loaded else None,
+        }
+
+
+dimension_cache = DimensionCache(ttl=settings.dimension_cache_ttl)
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from src.db.session import InstrumentedPool
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class HealthMonitor:
+    """
+    Checks the database from a background task and keeps the result, so
+    readiness probes read a snapshot instead of each taking a connection away
+    from chat traffic. The same check reports pool saturation (callers waiting
+    for a connection, or most of max_size in use) before it turns into acquire
+    timeouts.
+    """
+
+    def __init__(self):
+        self.snapshot: dict = {"status": "starting", "database": "unknown", "checked_at": None}
+        self.interval = 5.0
+        self.saturation_warning = 0.8
+        self._checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def check(self, pool: InstrumentedPool) -> dict:
+        pool_stats = pool.stats()
+        peak_waiting = pool.take_peak_waiting()
+        saturated = peak_waiting > 0 or pool_stats["in_use"] >= self.saturation_warning * pool_stats["max_size"]
+        snapshot = {
+            "pool": {
+                "size": pool_stats["size"],
+                "max_size": pool_stats["max_size"],
+                "in_use": pool_stats["in_use"],
+                "idle": pool_stats["idle"],
+                "peak_waiting": peak_waiting,
+                "saturated": saturated,
+            },
+        }
+        started = time.perf_counter()
+        try:
+            # The pool's acquire timeout applies, so an exhausted pool fails the check rather than hanging it
+            async with pool.acquire() as conn:
+                await conn.fetchval("SELECT 1")
+            snapshot.update(status="ok", database="connected")
+        except Exception as e:
+            snapshot.update(status="error", database="disconnected", error=str(e) or type(e).__name__)
+            logger.error(f"Health check failed: {snapshot['error']}")
+        snapshot["check_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        if saturated:
+            logger.warning(
+                f"Database pool saturated: {pool_stats['in_use']}/{pool_stats['max_size']} in use, "
+                f"{peak_waiting} waiting at peak, {pool_stats['acquire_timeouts']} acquire timeouts so far"
+            )
+
+        self._checked_at = time.monotonic()
+        snapshot["checked_at"] = time.time()
+        self.snapshot = snapshot
+        return snapshot
+
+    async def start(self, pool: InstrumentedPool, interval: float, saturation_warning: float) -> None:
+        self.interval = interval
+        self.saturation_warning = saturation_warning
+        # First result before the app takes traffic
+        await self.check(pool)
+        self._task = asyncio.create_task(self._run(pool))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, pool: InstrumentedPool) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check(pool)
+            except Exception as e:
+                logger.error(f"Health monitor failed: {e}")
+
+    def is_ready(self) -> bool:
+        # A snapshot several intervals old means the checker itself has stopped
+        if self._checked_at is None or time.monotonic() - self._checked_at > 3 * self.interval:
+            return False
+        return self.snapshot["status"] == "ok"
+
+    def current(self) -> dict:
+        age = None if self._checked_at is None else round(time.monotonic() - self._checked_at, 3)
+        return {**self.snapshot, "age_s": age}
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,197 @@
+import json
+import logging
+from dataclasses import dataclass, field, replace
+from typing import Optional
+
+from asyncpg.pool import Pool
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+from src.core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+# Most turns kept past the latest summary; compaction keeps the real number far lower
+MAX_LOADED_TURNS = 100
+# Longest excerpt of a single message kept in a summary line
+SUMMARY_EXCERPT_CHARS = 200
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text, which is all the budgeting needs
+    return len(text) // 4 + 1
+
+
+@dataclass
+class Turn:
+    id: int
+    token_count: int
+    messages: list[ModelMessage]
+
+
+@dataclass
+class Conversation:
+    """
+    History of one user/session as loaded for a chat turn: the latest summary
+    plus every turn recorded after it, oldest first.
+    """
+    user_id: str
+    session_id: str
+    summary: str = ""
+    turns: list[Turn] = field(default_factory=list)
+
+    def messages(self, token_budget: int) -> list[ModelMessage]:
+        """The summary followed by the newest turns that fit in `token_budget`."""
+        budget = token_budget - (estimate_tokens(self.summary) if self.summary else 0)
+        kept: list[Turn] = []
+        for turn in reversed(self.turns):
+            if turn.token_count > budget:
+                break
+            budget -= turn.token_count
+            kept.append(turn)
+
+        messages: list[ModelMessage] = []
+        if self.summary:
+            messages.append(ModelRequest(parts=[SystemPromptPart(content=self.summary)]))
+        for turn in reversed(kept):
+            messages.extend(turn.messages)
+        return messages
+
+
+async def load_conversation(pool: Pool, user_id: str, session_id: str) -> Conversation:
+    query = """
+        WITH summary AS (
+            SELECT id, messages, token_count, is_summary, covers_until
+            FROM chat_history
+            WHERE user_id = $1 AND session_id = $2 AND is_summary
+            ORDER BY id DESC
+            LIMIT 1
+        )
+        SELECT id, messages, token_count, is_summary FROM summary
+        UNION ALL
+        (
+            SELECT id, messages, token_count, is_summary
+            FROM chat_history
+            WHERE user_id = $1 AND session_id = $2 AND NOT is_summary
+              AND id > COALESCE((SELECT covers_until FROM summary), 0)
+            ORDER BY id DESC
+            LIMIT $3
+        )
+    """
+    conversation = Conversation(user_id=user_id, session_id=session_id)
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(query, user_id, session_id, MAX_LOADED_TURNS)
+
+    for row in rows:
+        if row["is_summary"]:
+            conversation.summary = json.loads(row["messages"])["summary"]
+        else:
+            conversation.turns.append(Turn(
+                id=row["id"],
+                token_count=row["token_count"],
+                messages=ModelMessagesTypeAdapter.validate_json(row["messages"]),
+            ))
+    conversation.turns.sort(key=lambda turn: turn.id)
+    return conversation
+
+
+def summarize(messages: list[ModelMessage]) -> list[str]:
+    """One line per user prompt, job search and reply; no model call needed."""
+    lines = []
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                lines.append(f"User: {part.content[:SUMMARY_EXCERPT_CHARS]}")
+            elif isinstance(part, ToolCallPart):
+                lines.append(f"Searched {part.tool_name} with {part.args_as_json_str()}")
+            elif isinstance(part, ToolReturnPart):
+                content = part.model_response_str()
+                try:
+                    # Turns saved before get_jobs returned compact text hold the JSON result
+                    lines.append(f"Search returned {json.loads(content)['total_found']} jobs")
+                except (TypeError, ValueError, KeyError):
+                    if content:
+                        lines.append(f"Search: {content.splitlines()[0].rstrip(':')}")
+            elif isinstance(part, TextPart):
+                lines.append(f"Assistant: {part.content[:SUMMARY_EXCERPT_CHARS]}")
+    return lines
+
+
+async def save_turn(pool: Pool, conversation: Conversation, new_messages: list[ModelMessage]) -> None:
+    """
+    Appends the messages of one turn, then folds the oldest turns into a new
+    summary row once the unsummarized history is twice the token budget.
+    Rows are never updated, so concurrent turns can't lose each other's writes.
+    """
+    # Instructions are rebuilt on every run, so storing them would only cost space and budget
+    new_messages = [
+        replace(message, instructions=None) if isinstance(message, ModelRequest) else message
+        for message in new_messages
+    ]
+    payload = ModelMessagesTypeAdapter.dump_json(new_messages).decode()
+    token_count = estimate_tokens(payload)
+    async with pool.acquire() as conn:
+        turn_id = await conn.fetchval(
+            """
+            INSERT INTO chat_history (user_id, session_id, messages, token_count)
+            VALUES ($1, $2, $3::jsonb, $4)
+            RETURNING id
+            """,
+            conversation.user_id, conversation.session_id, payload, token_count,
+        )
+        conversation.turns.append(Turn(id=turn_id, token_count=token_count, messages=new_messages))
+
+        budget = settings.history_token_budget
+        if sum(turn.token_count for turn in conversation.turns) <= 2 * budget:
+            return
+
+        # Keep the newest turns that fit the budget verbatim and summarize the rest
+        kept_tokens = 0
+        split = len(conversation.turns)
+        while split > 0 and kept_tokens + conversation.turns[split - 1].token_count <= budget:
+            split -= 1
+            kept_tokens += conversation.turns[split].token_count
+        folded = conversation.turns[:split]
+
+        lines = conversation.summary.splitlines()[1:] if conversation.summary else []
+        for turn in folded:
+            lines.extend(summarize(turn.messages))
+        # The summary itself is capped, dropping its oldest lines first
+        while lines and estimate_tokens("\n".join(lines)) > settings.history_summary_tokens:
+            lines.pop(0)
+        summary = "Summary of the earlier conversation:\n" + "\n".join(lines)
+
+        await conn.execute(
+            """
+            INSERT INTO chat_history (user_id, session_id, messages, token_count, is_summary, covers_until)
+            VALUES ($1, $2, $3::jsonb, $4, true, $5)
+            """,
+            conversation.user_id, conversation.session_id, json.dumps({"summary": summary}),
+            estimate_tokens(summary), folded[-1].id,
+        )
+        conversation.summary = summary
+        conversation.turns = conversation.turns[split:]
+
+
+async def save_turn_safely(pool: Pool, conversation: Conversation, new_messages: list[ModelMessage]) -> None:
+    # Runs after the response is sent; a failed write must never fail the chat
+    try:
+        await save_turn(pool, conversation, new_messages)
+    except Exception as e:
+        logger.error(f"Error saving chat history for user_id {conversation.user_id}: {e}")
+
+
+async def load_conversation_safely(pool: Pool, user_id: str, session_id: str) -> Optional[Conversation]:
+    try:
+        return await load_conversation(pool, user_id, session_id)
+    except Exception as e:
+        logger.error(f"Error loading chat history for user_id {user_id}: {e}")
+        return None
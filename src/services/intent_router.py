@@ -0,0 +1,202 @@
+import re
+from dataclasses import dataclass, field
+from typing import Literal, Optional
+
+from src.services.dimension_cache import dimension_cache
+
+# Phrase tables from the "Query Interpretation Guidelines" in src/dependencies/prompt.md.
+# Each phrase maps to the get_jobs parameter and value the model is told to use for it.
+PROMPT_PHRASES: list[tuple[str, str, str]] = [
+    ("voice over", "title", "voice over"),
+    ("voice acting", "job_category", "voice"),
+    ("acting", "title", "acting"),
+    ("actor", "title", "actor"),
+    ("actress", "title", "actress"),
+    ("director", "title", "director"),
+    ("producer", "title", "producer"),
+    ("casting", "title", "casting"),
+    ("cinematographer", "title", "cinematographer"),
+    ("motion capture", "title", "motion capture"),
+    ("stand-in", "title", "stand-in"),
+    ("full-time", "job_type", "full-time"),
+    ("full time", "job_type", "full-time"),
+    ("part-time", "job_type", "part-time"),
+    ("part time", "job_type", "part-time"),
+    ("contract", "job_type", "contract"),
+    ("freelance", "job_type", "freelance"),
+    ("temporary", "job_type", "temporary"),
+    ("remote", "job_type", "remote"),
+    ("on-location", "job_type", "on-location"),
+    ("film", "job_category", "film"),
+    ("theater", "job_category", "theater"),
+    ("theatre", "job_category", "theater"),
+    ("commercial", "job_category", "commercial"),
+    ("los angeles", "city", "Los Angeles"),
+    ("la", "city", "Los Angeles"),
+    ("new york", "city", "New York"),
+    ("nyc", "city", "New York"),
+]
+
+# Fixed thresholds from the prompt's "Salary/Budget Searches" section
+SALARY_PHRASES = {
+    "high paying": ("min_salary", 100000),
+    "entry level": ("max_salary", 50000),
+}
+SALARY_PATTERNS = [
+    (re.compile(r"\b(?:under|below|less than|up to|at most)\s*\$?\s*(\d[\d,]*)(k?)\b"), "max_salary"),
+    (re.compile(r"\b(?:over|above|more than|at least)\s*\$?\s*(\d[\d,]*)(k?)\b"), "min_salary"),
+]
+
+GREETING = re.compile(
+    r"(hi|hello|hey|hiya|howdy|greetings|good (morning|afternoon|evening))( there)?( castlink)?"
+)
+
+# "Jobs for me" with nothing else: answered from the user's precomputed recommendations.
+# Recommendations plus a filter ("jobs for me in Mumbai") still go to the model.
+RECOMMENDATIONS = re.compile(
+    r"(?:(?:please )?(?:show|give|find|get|list)(?: me)? |(?:any|what|what are) )?(?:(?:some|any) )?"
+    r"(?:(?:my )?(?:recommended|suggested|personali[sz]ed|matching) (?:jobs?|roles|gigs|opportunities)(?: for me)?"
+    r"|(?:jobs?|roles|gigs|opportunities) (?:for me|(?:that )?(?:match|suit|fit) (?:me|my profile)|matching my profile)"
+    r"|recommend(?: me)? (?:some |any )?(?:jobs?|roles|gigs|opportunities)(?: for me)?)"
+    r"(?: please)?"
+)
+
+# Words a direct search needs at least one of
+SEARCH_NOUNS = {
+    "job", "jobs", "position", "positions", "role", "roles", "opportunity", "opportunities",
+    "opening", "openings", "gig", "gigs", "work", "calls",
+}
+
+# Words that carry no filter. Anything else left over (e.g. "my", "or", "similar")
+# means the message needs the model.
+FILLER = SEARCH_NOUNS | {
+    "show", "me", "find", "search", "get", "list", "give", "any", "some", "all", "the", "a", "an",
+    "please", "i", "want", "need", "looking", "am", "can", "you", "with", "of", "available", "open",
+    "in", "at", "near", "based", "are", "there", "what", "latest", "new", "recent", "current",
+    "currently", "hiring", "paying", "pay", "that", "pays", "salary",
+}
+
+
+@dataclass
+class Route:
+    kind: Literal["greeting", "search", "recommendations"]
+    filters: dict = field(default_factory=dict)
+
+
+def _normalize(message: str) -> str:
+    text = message.lower().replace("’", "'")
+    text = re.sub(r"[^\w\s$,-]", " ", text)
+    text = re.sub(r"(?<!\d),|,(?!\d)", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+_dimension_phrases: tuple[int, list[tuple[re.Pattern, str, str]]] = (-1, [])
+
+
+def _phrases() -> list[tuple[re.Pattern, str, str]]:
+    """Prompt phrases first, then every live city, country, job type and role name."""
+    global _dimension_phrases
+    if _dimension_phrases[0] != dimension_cache.version:
+        dynamic = [
+            (name.lower(), parameter, name)
+            for table, parameter in (
+                ("city", "city"),
+                ("country", "country"),
+                ("job_type", "job_type"),
+                ("job_role", "job_category"),
+            )
+            for name in dimension_cache.names(table)
+        ]
+        phrases = sorted(PROMPT_PHRASES, key=lambda p: -len(p[0])) + sorted(dynamic, key=lambda p: -len(p[0]))
+        compiled = [(re.compile(rf"\b{re.escape(phrase)}s?\b"), parameter, value) for phrase, parameter, value in phrases]
+        _dimension_phrases = (dimension_cache.version, compiled)
+    return _dimension_phrases[1]
+
+
+def route(message: str) -> Optional[Route]:
+    """
+    Returns a route only when every word of the message is accounted for by a
+    greeting, a known filter phrase or filler. Anything else returns None and
+    goes to the model.
+    """
+    text = _normalize(message)
+    if GREETING.fullmatch(text):
+        return Route("greeting")
+    if RECOMMENDATIONS.fullmatch(text):
+        return Route("recommendations")
+
+    words = set(text.split())
+    if not words & SEARCH_NOUNS:
+        return None
+
+    filters: dict = {}
+    remaining = f" {text} "
+
+    def set_filter(parameter: str, value) -> bool:
+        # Two different values for one filter ("Mumbai or Delhi") is the model's job
+        if filters.get(parameter, value) != value:
+            return False
+        filters[parameter] = value
+        return True
+
+    for phrase, (parameter, amount) in SALARY_PHRASES.items():
+        if phrase in remaining:
+            if not set_filter(parameter, amount):
+                return None
+            remaining = remaining.replace(phrase, " ")
+
+    for pattern, parameter in SALARY_PATTERNS:
+        match = pattern.search(remaining)
+        if match:
+            amount = int(match.group(1).replace(",", "")) * (1000 if match.group(2) else 1)
+            if not set_filter(parameter, amount):
+                return None
+            remaining = remaining.replace(match.group(0), " ")
+
+    for pattern, parameter, value in _phrases():
+        if pattern.search(remaining):
+            if not set_filter(parameter, value):
+                return None
+            remaining = pattern.sub(" ", remaining)
+
+    if not filters or any(word not in FILLER for word in remaining.split()):
+        return None
+    return Route("search", filters)
+
+
+class RouterStats:
+    """Bypass rate of the fast path and an estimate of the model latency it saved."""
+
+    def __init__(self):
+        self.routed = {"greeting": 0, "search": 0, "recommendations": 0}
+        self.fell_through = 0
+        self.fast_path_ms = 0.0
+        # Moving average of full agent runs, the cost each bypass avoided
+        self.agent_ms_avg: Optional[float] = None
+
+    def record_fast_path(self, kind: str, elapsed_ms: float) -> None:
+        self.routed[kind] += 1
+        self.fast_path_ms += elapsed_ms
+
+    def record_agent(self, elapsed_ms: float) -> None:
+        self.fell_through += 1
+        if self.agent_ms_avg is None:
+            self.agent_ms_avg = elapsed_ms
+        else:
+            self.agent_ms_avg += 0.05 * (elapsed_ms - self.agent_ms_avg)
+
+    def as_dict(self) -> dict:
+        routed = sum(self.routed.values())
+        total = routed + self.fell_through
+        saved = routed * self.agent_ms_avg - self.fast_path_ms if self.agent_ms_avg is not None else None
+        return {
+            "routed": self.routed,
+            "fell_through": self.fell_through,
+            "bypass_rate": routed / total if total else 0.0,
+            "fast_path_ms_avg": self.fast_path_ms / routed if routed else None,
+            "agent_ms_avg": self.agent_ms_avg,
+            "estimated_ms_saved": saved,
+        }
+
+
+router_stats = RouterStats()
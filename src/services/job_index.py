@@ -0,0 +1,703 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import shutil
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+from asyncpg.pool import Pool
+
+from src.db.job_search import JobPage
+from src.services.dimension_cache import dimension_cache
+
+logger = logging.getLogger("uvicorn.error")
+
+# Dimension columns on job_posts and the lookup table each one points at.
+# The keys match the get_jobs parameter names.
+DIMENSIONS = {
+    "city": ("city_id", "city"),
+    "country": ("country_id", "country"),
+    "job_type": ("job_type_id", "job_type"),
+    "job_category": ("category_id", "job_role"),
+    "currency": ("currency_id", "currency"),
+}
+
+JOB_COLUMNS = """
+    id, title, "MinSalary", "MaxSalary", "IsAccepting",
+    city_id, country_id, job_type_id, category_id, currency_id,
+    created_at, updated_at
+"""
+
+# Posts deleted outright at or after $1, from migration 0008's tombstones. A post
+# inserted again under the same ID is left out: the updated_at feed brings it back.
+DELETED_POSTS = """
+    SELECT d.job_id, d.deleted_at
+    FROM job_post_deletions d
+    WHERE d.deleted_at >= $1 AND NOT EXISTS (SELECT 1 FROM job_posts p WHERE p.id = d.job_id)
+    ORDER BY d.deleted_at
+"""
+
+# Posting lists are sorted by this key, so iterating one yields the newest posts first.
+# Whole microseconds, so snapshot rows and changed posts compare exactly.
+SortKey = tuple[int, str]
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+NO_POSITIONS = np.empty(0, dtype=np.int32)
+
+# First batch of candidates checked per search; later batches grow 4x up to the list's end
+FIRST_BATCH = 64
+# Standalone, the snapshot is rebuilt once this share of it (and at least MIN_COMPACT_ROWS) changed
+COMPACT_RATIO = 0.1
+MIN_COMPACT_ROWS = 1000
+# Published snapshots kept on disk, so a worker still opening the previous one finds it
+KEEP_GENERATIONS = 2
+# Name of the file in the snapshot directory holding the current generation
+CURRENT = "current"
+
+
+@dataclass(slots=True)
+class IndexedJob:
+    id: str
+    title: str
+    title_lower: str
+    min_salary: int
+    max_salary: int
+    dims: dict[str, Optional[str]]
+    created_at: datetime
+    key: SortKey
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def sort_key(created_at: datetime, job_id: str) -> SortKey:
+    return (-((created_at - EPOCH) // MICROSECOND), job_id)
+
+
+def _after(postings: list[SortKey], key: Optional[SortKey]) -> Iterable[SortKey]:
+    # Resumes a posting list right after `key` without walking the entries before it
+    if key is None:
+        return postings
+    return (postings[i] for i in range(bisect_right(postings, key), len(postings)))
+
+
+def _remove(postings: list[SortKey], key: SortKey) -> None:
+    i = bisect_left(postings, key)
+    if i < len(postings) and postings[i] == key:
+        del postings[i]
+
+
+def _csr(groups: np.ndarray, positions: np.ndarray, count: int) -> tuple[np.ndarray, np.ndarray]:
+    # Posting lists for `count` groups as offsets plus one array of positions; a stable
+    # sort keeps each group's positions ascending, i.e. newest first
+    order = np.argsort(groups, kind="stable")
+    indptr = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(groups, minlength=count), out=indptr[1:])
+    return indptr, positions[order].astype(np.int32)
+
+
+async def deleted_posts(conn, since: Optional[datetime]) -> list:
+    """(job_id, deleted_at) of posts deleted since `since`; every tombstone when it is None."""
+    return await conn.fetch(DELETED_POSTS, since or datetime.min)
+
+
+def published_generation(directory: Path) -> Optional[str]:
+    try:
+        return (directory / CURRENT).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class _Found(NamedTuple):
+    # Matching snapshot rows, in result order
+    positions: np.ndarray
+    # Candidates checked, and the size of the list they were taken from, to extrapolate a count
+    scanned: int
+    source_size: int
+    # The list was checked to its end, so `positions` are all the matches
+    complete: bool
+
+
+class JobSnapshot:
+    """
+    Immutable, array-backed copy of the accepting job posts at one point in time.
+
+    Rows are sorted newest-first, so a row's position is its place in the result
+    order and every posting list (title trigrams, dimension IDs) is an ascending
+    array of positions. Text is stored as fixed-width UTF-8. With no Python object
+    per post, a snapshot saved to a directory and opened with mmap is shared by
+    every process that maps it, and reading it never copies a page.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray], watermark: Optional[datetime]):
+        self.arrays = arrays
+        self.watermark = watermark
+        self.size = len(arrays["ids"])
+        self.ids = arrays["ids"]
+        self.id_order = arrays["id_order"]
+        self.titles = arrays["titles"]
+        self.titles_lower = arrays["titles_lower"]
+        # Negated microseconds since the epoch, ascending like the positions
+        self.created_key = arrays["created_key"]
+        self.min_salary = arrays["min_salary"]
+        self.max_salary = arrays["max_salary"]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.arrays.values())
+
+    # --- Building, saving and mapping ---
+
+    @classmethod
+    def build(cls, rows: list, watermark: Optional[datetime]) -> "JobSnapshot":
+        rows = sorted(rows, key=lambda row: sort_key(row["created_at"], row["id"]))
+        lowered = [row["title"].lower() for row in rows]
+        arrays = {
+            "ids": np.array([row["id"].encode() for row in rows], dtype=np.bytes_),
+            "titles": np.array([row["title"].encode() for row in rows], dtype=np.bytes_),
+            "titles_lower": np.array([title.encode() for title in lowered], dtype=np.bytes_),
+            "created_key": np.array([sort_key(row["created_at"], row["id"])[0] for row in rows], dtype=np.int64),
+            "min_salary": np.array([row["MinSalary"] for row in rows], dtype=np.int64),
+            "max_salary": np.array([row["MaxSalary"] for row in rows], dtype=np.int64),
+        }
+        arrays["id_order"] = np.argsort(arrays["ids"], kind="stable").astype(np.int32)
+
+        gram_ids: dict[str, int] = {}
+        groups, positions = [], []
+        for position, title in enumerate(lowered):
+            for gram in trigrams(title):
+                groups.append(gram_ids.setdefault(gram, len(gram_ids)))
+                positions.append(position)
+        # Keys sorted as UTF-8 bytes, so a gram is found by binary search
+        keys = sorted(gram_ids, key=str.encode)
+        rank = np.empty(len(keys), dtype=np.int64)
+        rank[[gram_ids[gram] for gram in keys]] = np.arange(len(keys))
+        arrays["gram_keys"] = np.array([gram.encode() for gram in keys], dtype=np.bytes_)
+        arrays["gram_indptr"], arrays["gram_positions"] = _csr(
+            rank[np.array(groups, dtype=np.int64)], np.array(positions, dtype=np.int64), len(keys)
+        )
+
+        for name, (column, _) in DIMENSIONS.items():
+            values = [row[column] for row in rows]
+            vocabulary = sorted({value for value in values if value is not None}, key=str.encode)
+            code_of = {value: code for code, value in enumerate(vocabulary)}
+            codes = np.array([code_of.get(value, -1) for value in values], dtype=np.int32)
+            present = np.flatnonzero(codes >= 0)
+            arrays[f"{name}_codes"] = codes
+            arrays[f"{name}_ids"] = np.array([value.encode() for value in vocabulary], dtype=np.bytes_)
+            arrays[f"{name}_indptr"], arrays[f"{name}_positions"] = _csr(codes[present], present, len(vocabulary))
+        return cls(arrays, watermark)
+
+    def save(self, directory: Path) -> None:
+        directory.mkdir(parents=True)
+        for name, array in self.arrays.items():
+            np.save(directory / f"{name}.npy", array)
+        meta = {"rows": self.size, "watermark": self.watermark.isoformat() if self.watermark else None}
+        (directory / "meta.json").write_text(json.dumps(meta))
+
+    @classmethod
+    def open(cls, directory: Path) -> "JobSnapshot":
+        meta = json.loads((directory / "meta.json").read_text())
+        # Read-only maps of the files: the pages live in the page cache, once for every process
+        arrays = {path.stem: np.load(path, mmap_mode="r") for path in directory.glob("*.npy")}
+        watermark = datetime.fromisoformat(meta["watermark"]) if meta["watermark"] else None
+        return cls(arrays, watermark)
+
+    # --- Lookups ---
+
+    def position_of(self, job_id: str) -> Optional[int]:
+        key = job_id.encode()
+        i = int(np.searchsorted(self.ids, key, sorter=self.id_order))
+        if i < self.size and self.ids[self.id_order[i]] == key:
+            return int(self.id_order[i])
+        return None
+
+    def start(self, after: Optional[tuple[datetime, str]]) -> int:
+        """Position of the first row that comes after `after` in result order."""
+        if after is None:
+            return 0
+        created, job_id = sort_key(*after)
+        lo = int(np.searchsorted(self.created_key, created, "left"))
+        hi = int(np.searchsorted(self.created_key, created, "right"))
+        return lo + int(np.searchsorted(self.ids[lo:hi], job_id.encode(), "right"))
+
+    def entries(self, positions: np.ndarray) -> list[tuple[SortKey, str, str, datetime]]:
+        """(sort key, id, title, created_at) of the rows at `positions`."""
+        ids = [job_id.decode() for job_id in self.ids[positions].tolist()]
+        titles = [title.decode() for title in self.titles[positions].tolist()]
+        return [
+            ((created, job_id), job_id, title, EPOCH - created * MICROSECOND)
+            for created, job_id, title in zip(self.created_key[positions].tolist(), ids, titles)
+        ]
+
+    def _postings(self, prefix: str, i: Optional[int]) -> np.ndarray:
+        if i is None:
+            return NO_POSITIONS
+        indptr = self.arrays[f"{prefix}_indptr"]
+        return self.arrays[f"{prefix}_positions"][indptr[i]:indptr[i + 1]]
+
+    def _rarest_gram(self, term: str) -> Optional[int]:
+        # The term's trigram with the shortest posting list, or None if one of them is in no title
+        keys = self.arrays["gram_keys"]
+        if not len(keys):
+            return None
+        wanted = np.array([gram.encode() for gram in trigrams(term)], dtype=keys.dtype)
+        found = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        if not (keys[found] == wanted).all():
+            return None
+        indptr = self.arrays["gram_indptr"]
+        return int(found[np.argmin(indptr[found + 1] - indptr[found])])
+
+    def _codes(self, name: str, dim_ids: frozenset[str]) -> list[int]:
+        vocabulary = self.arrays[f"{name}_ids"]
+        codes = []
+        for dim_id in dim_ids:
+            key = dim_id.encode()
+            i = int(np.searchsorted(vocabulary, key))
+            if i < len(vocabulary) and vocabulary[i] == key:
+                codes.append(i)
+        return codes
+
+    # --- Querying ---
+
+    def matches(
+        self,
+        title_term: Optional[str],
+        min_salary: Optional[int],
+        max_salary: Optional[int],
+        dim_filters: dict[str, frozenset[str]],
+        after: Optional[tuple[datetime, str]],
+        dead: np.ndarray,
+        stop_at: int,
+    ) -> _Found:
+        """
+        The first `stop_at` matching rows after `after` that `dead` doesn't mark as
+        superseded. Candidates come from the most selective posting list and are
+        checked against the other filters a batch at a time, in vectorised form.
+        """
+        # Candidate sources, as (size, function returning the positions)
+        sources = []
+        if title_term and len(title_term) >= 3:
+            shortest = self._postings("gram", self._rarest_gram(title_term))
+            sources.append((len(shortest), lambda: shortest))
+        # Per dimension filter, a lookup of the wanted codes; code -1 (no value) reads the last, False entry
+        wanted = {}
+        for name, dim_ids in dim_filters.items():
+            codes = self._codes(name, dim_ids)
+            wanted[name] = np.zeros(len(self.arrays[f"{name}_ids"]) + 1, dtype=bool)
+            wanted[name][codes] = True
+            lists = [self._postings(name, code) for code in codes]
+            size = sum(len(postings) for postings in lists)
+            sources.append((size, lambda lists=lists: lists[0] if len(lists) == 1 else np.sort(np.concatenate(lists))))
+
+        if sources:
+            source_size, positions = min(sources, key=itemgetter(0))
+            if not source_size:
+                return _Found(NO_POSITIONS, 0, 0, True)
+            candidates = positions()
+            first = int(np.searchsorted(candidates, self.start(after)))
+            end = len(candidates)
+        else:
+            candidates, source_size = None, self.size
+            first, end = self.start(after), self.size
+
+        term = title_term.encode() if title_term else None
+        found, needed = [], stop_at
+        lo, batch = first, max(FIRST_BATCH, stop_at)
+        while lo < end and needed:
+            hi = min(end, lo + batch)
+            batch_positions = candidates[lo:hi] if candidates is not None else np.arange(lo, hi, dtype=np.int32)
+            keep = ~dead[batch_positions]
+            if min_salary is not None:
+                keep &= self.max_salary[batch_positions] >= min_salary
+            if max_salary is not None:
+                keep &= self.min_salary[batch_positions] <= max_salary
+            for name, lookup in wanted.items():
+                keep &= lookup[self.arrays[f"{name}_codes"][batch_positions]]
+            if term is not None:
+                keep[keep] = np.strings.find(self.titles_lower[batch_positions[keep]], term) >= 0
+            hits = np.flatnonzero(keep)
+            if len(hits) >= needed:
+                hits = hits[:needed]
+                hi = lo + int(hits[-1]) + 1
+            found.append(batch_positions[hits])
+            needed -= len(hits)
+            lo, batch = hi, batch * 4
+
+        positions = np.concatenate(found) if found else NO_POSITIONS
+        return _Found(positions, lo - first, source_size, lo >= end)
+
+
+class _Overlay:
+    """
+    Posts changed since the snapshot was built, in Python posting lists kept
+    sorted newest-first. A search walks the most selective list in order and
+    checks the remaining filters on each post.
+    """
+
+    def __init__(self):
+        self.docs: dict[str, IndexedJob] = {}
+        self._all: list[SortKey] = []
+        self._trigrams: dict[str, list[SortKey]] = {}
+        self._by_dim: dict[str, dict[str, list[SortKey]]] = {name: {} for name in DIMENSIONS}
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def _postings_for(self, doc: IndexedJob) -> Iterator[list[SortKey]]:
+        yield self._all
+        for gram in trigrams(doc.title_lower):
+            yield self._trigrams.setdefault(gram, [])
+        for name, dim_id in doc.dims.items():
+            if dim_id is not None:
+                yield self._by_dim[name].setdefault(dim_id, [])
+
+    def add(self, doc: IndexedJob) -> None:
+        self.docs[doc.id] = doc
+        for postings in self._postings_for(doc):
+            insort(postings, doc.key)
+
+    def discard(self, doc: IndexedJob) -> None:
+        del self.docs[doc.id]
+        for postings in self._postings_for(doc):
+            _remove(postings, doc.key)
+
+    def matches(
+        self,
+        title_term: Optional[str],
+        min_salary: Optional[int],
+        max_salary: Optional[int],
+        dim_filters: dict[str, frozenset[str]],
+        after_key: Optional[SortKey],
+    ) -> Iterator[IndexedJob]:
+        # Candidate sources: (estimated size, iterable of sort keys in newest-first order)
+        sources: list[tuple[int, Iterable[SortKey]]] = []
+        if title_term and len(title_term) >= 3:
+            shortest = min((self._trigrams.get(gram, []) for gram in trigrams(title_term)), key=len)
+            if not shortest:
+                return
+            sources.append((len(shortest), _after(shortest, after_key)))
+        for name, dim_ids in dim_filters.items():
+            lists = [self._by_dim[name][dim_id] for dim_id in dim_ids if dim_id in self._by_dim[name]]
+            resumed = [_after(postings, after_key) for postings in lists]
+            size = sum(len(postings) for postings in lists)
+            sources.append((size, resumed[0] if len(resumed) == 1 else heapq.merge(*resumed)))
+        candidates = min(sources, key=itemgetter(0))[1] if sources else _after(self._all, after_key)
+
+        for key in candidates:
+            doc = self.docs[key[1]]
+            if title_term and title_term not in doc.title_lower:
+                continue
+            if min_salary is not None and doc.max_salary < min_salary:
+                continue
+            if max_salary is not None and doc.min_salary > max_salary:
+                continue
+            if any(doc.dims[name] not in dim_ids for name, dim_ids in dim_filters.items()):
+                continue
+            yield doc
+
+
+@dataclass(slots=True)
+class _State:
+    snapshot: JobSnapshot
+    # Private to this process: snapshot rows the overlay supersedes or that closed
+    dead: np.ndarray
+    dead_count: int
+    overlay: _Overlay
+    watermark: Optional[datetime]
+    # The deletion feed's own position, since deletions don't move updated_at
+    deleted_watermark: Optional[datetime]
+    # Published generation the snapshot was mapped from; None when built in this process
+    generation: Optional[str]
+
+
+class JobSearchIndex:
+    """
+    In-memory index over accepting job posts.
+
+    Most posts live in an array-backed `JobSnapshot`; posts changed since it was
+    built are kept in a small overlay and mask their old snapshot rows. A search
+    takes the matches from both in the same newest-first order, so results are
+    the same as the SQL path in `get_jobs`, without touching the database.
+
+    Standalone, the process builds its own snapshot and rebuilds it once the
+    overlay has grown. Under `python -m src.serve`, the master publishes
+    snapshots to a directory and workers `follow` it: each maps the current
+    snapshot and switches to a new one in a single assignment, so a search sees
+    either the old snapshot and its changes or the new one, never a mix.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.swaps = 0
+        self._state = self._fresh_state(JobSnapshot.build([], None), None)
+        self._directory: Optional[Path] = None
+        self._sync_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        state = self._state
+        return state.snapshot.size - state.dead_count + len(state.overlay)
+
+    # --- Loading and change feed ---
+
+    async def load(self, pool: Pool) -> None:
+        """Builds a snapshot from the database and serves it from this process alone."""
+        self._swap(await self._build(pool), [], None)
+        self._directory = None
+        self.ready = True
+        logger.info(f"Job search index loaded with {len(self)} accepting posts.")
+
+    async def publish(self, pool: Pool, directory: Path) -> str:
+        """
+        Builds a snapshot from the database and saves it as the next generation
+        in `directory`, for the processes following it. Returns the generation.
+        """
+        snapshot = await self._build(pool)
+        generation = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        await asyncio.to_thread(snapshot.save, directory / generation)
+        # Renaming over the pointer is atomic, so followers read the old generation or the new one
+        pending = directory / f"{CURRENT}.tmp"
+        pending.write_text(generation)
+        os.replace(pending, directory / CURRENT)
+        generations = sorted(path for path in directory.iterdir() if path.is_dir())
+        for old in generations[:-KEEP_GENERATIONS]:
+            # Processes that still map an old snapshot keep their pages after the files are removed
+            shutil.rmtree(old, ignore_errors=True)
+        logger.info(f"Published job search snapshot {generation} with {snapshot.size} posts ({snapshot.nbytes / 2**20:.1f} MB).")
+        return generation
+
+    def follow(self, directory: Path) -> None:
+        """Serves the snapshot published in `directory`, memory-mapped; `sync` switches to newer ones."""
+        generation = published_generation(directory)
+        if generation is None:
+            raise RuntimeError(f"No job search snapshot published in {directory}")
+        self._swap(JobSnapshot.open(directory / generation), [], generation)
+        self._directory = directory
+        self.ready = True
+        logger.info(f"Job search index mapped snapshot {generation} with {len(self)} accepting posts.")
+
+    async def sync(self, pool: Pool) -> int:
+        """
+        Apply every job post changed or deleted since the last load or sync.
+        Returns the number of rows and deletions applied.
+        """
+        if self._directory is not None:
+            generation = published_generation(self._directory)
+            if generation is not None and generation != self._state.generation:
+                snapshot = JobSnapshot.open(self._directory / generation)
+                rows, deletions = await self._changes(pool, snapshot.watermark, snapshot.watermark)
+                self._swap(snapshot, rows, generation, deletions)
+                return len(rows) + len(deletions)
+
+        state = self._state
+        rows, deletions = await self._changes(pool, state.watermark, state.deleted_watermark)
+        for row in rows:
+            self.apply(row)
+        for deletion in deletions:
+            self._apply_deletion(state, deletion)
+        if self._directory is None and len(state.overlay) > max(MIN_COMPACT_ROWS, COMPACT_RATIO * state.snapshot.size):
+            self._swap(await self._build(pool), [], None)
+        return len(rows) + len(deletions)
+
+    def apply(self, row) -> None:
+        """Upsert a single job_posts row; posts that stopped accepting are dropped."""
+        self._apply(self._state, row)
+
+    def remove(self, job_id: str) -> None:
+        """Drop a post, as when its job_posts row is deleted."""
+        self._drop(self._state, job_id)
+
+    def start_sync(self, pool: Pool, interval: float) -> None:
+        self._sync_task = asyncio.create_task(self._sync_loop(pool, interval))
+
+    async def stop_sync(self) -> None:
+        if self._sync_task:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+
+    async def _sync_loop(self, pool: Pool, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync(pool)
+            except Exception as e:
+                logger.error(f"Job search index sync failed: {e}")
+
+    async def _build(self, pool: Pool) -> JobSnapshot:
+        await dimension_cache.ensure_fresh(pool)
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(f'SELECT {JOB_COLUMNS} FROM job_posts WHERE "IsAccepting" = true')
+        watermark = max((row["updated_at"] for row in rows), default=None)
+        # Seconds of CPU for a large table; in a thread so a rebuild while serving doesn't stall the loop
+        return await asyncio.to_thread(JobSnapshot.build, rows, watermark)
+
+    async def _changes(
+        self, pool: Pool, watermark: Optional[datetime], deleted_watermark: Optional[datetime]
+    ) -> tuple[list, list]:
+        """Rows changed since `watermark` and deletions since `deleted_watermark`."""
+        async with pool.acquire() as conn:
+            if watermark is None:
+                rows = await conn.fetch(f"SELECT {JOB_COLUMNS} FROM job_posts")
+            else:
+                # >= rather than > so rows committed late with the same timestamp are not missed;
+                # re-applying an unchanged row is harmless.
+                rows = await conn.fetch(
+                    f"SELECT {JOB_COLUMNS} FROM job_posts WHERE updated_at >= $1 ORDER BY updated_at", watermark
+                )
+            # Likewise, and dropping a post that is already gone is harmless
+            return rows, await deleted_posts(conn, deleted_watermark)
+
+    # --- Index maintenance ---
+
+    @staticmethod
+    def _fresh_state(snapshot: JobSnapshot, generation: Optional[str]) -> _State:
+        return _State(
+            snapshot, np.zeros(snapshot.size, dtype=bool), 0, _Overlay(), snapshot.watermark, snapshot.watermark, generation
+        )
+
+    def _swap(self, snapshot: JobSnapshot, rows: list, generation: Optional[str], deletions: list = ()) -> None:
+        # The new state is complete before it replaces the old one in a single assignment
+        state = self._fresh_state(snapshot, generation)
+        for row in rows:
+            self._apply(state, row)
+        for deletion in deletions:
+            self._apply_deletion(state, deletion)
+        self._state = state
+        self.swaps += 1
+
+    @staticmethod
+    def _drop(state: _State, job_id: str) -> None:
+        existing = state.overlay.docs.get(job_id)
+        if existing:
+            state.overlay.discard(existing)
+        else:
+            position = state.snapshot.position_of(job_id)
+            if position is not None and not state.dead[position]:
+                state.dead[position] = True
+                state.dead_count += 1
+
+    @classmethod
+    def _apply_deletion(cls, state: _State, deletion) -> None:
+        cls._drop(state, deletion["job_id"])
+        if state.deleted_watermark is None or deletion["deleted_at"] > state.deleted_watermark:
+            state.deleted_watermark = deletion["deleted_at"]
+
+    @classmethod
+    def _apply(cls, state: _State, row) -> None:
+        cls._drop(state, row["id"])
+        if row["IsAccepting"]:
+            state.overlay.add(IndexedJob(
+                id=row["id"],
+                title=row["title"],
+                title_lower=row["title"].lower(),
+                min_salary=row["MinSalary"],
+                max_salary=row["MaxSalary"],
+                dims={name: row[column] for name, (column, _) in DIMENSIONS.items()},
+                created_at=row["created_at"],
+                key=sort_key(row["created_at"], row["id"]),
+            ))
+        if state.watermark is None or row["updated_at"] > state.watermark:
+            state.watermark = row["updated_at"]
+
+    # --- Querying ---
+
+    def search(
+        self,
+        title: Optional[str] = None,
+        min_salary: Optional[int] = None,
+        max_salary: Optional[int] = None,
+        city: Optional[str] = None,
+        country: Optional[str] = None,
+        job_type: Optional[str] = None,
+        job_category: Optional[str] = None,
+        currency: Optional[str] = None,
+        limit: int = 10,
+        after: Optional[tuple[datetime, str]] = None,
+        count_limit: Optional[int] = None,
+    ) -> JobPage:
+        """
+        Same filter semantics, ordering and paging as `search_jobs_sql`. Dimension
+        names are resolved through the dimension cache, which the caller keeps fresh.
+        With `count_limit`, matching carries on past the page to count the total,
+        exactly up to `count_limit` and extrapolated beyond it.
+        """
+        state = self._state
+        title_term = title.lower() if title else None
+        dim_filters: dict[str, frozenset[str]] = {}
+        for name, term in (
+            ("city", city),
+            ("country", country),
+            ("job_type", job_type),
+            ("job_category", job_category),
+            ("currency", currency),
+        ):
+            if not term:
+                continue
+            ids = dimension_cache.resolve(DIMENSIONS[name][1], term)
+            if not ids:
+                return JobPage(jobs=[], total=0 if count_limit is not None else None)
+            dim_filters[name] = ids
+
+        stop_at = max(limit + 1, (count_limit or 0) + 1)
+        snapshot = state.snapshot
+        found = snapshot.matches(title_term, min_salary, max_salary, dim_filters, after, state.dead, stop_at)
+        after_key = sort_key(*after) if after else None
+        changed = list(islice(state.overlay.matches(title_term, min_salary, max_salary, dim_filters, after_key), stop_at))
+
+        # Both sources are in result order; a post is never in both
+        merged = heapq.merge(
+            snapshot.entries(found.positions[:limit + 1]),
+            [(doc.key, doc.id, doc.title, doc.created_at) for doc in changed[:limit + 1]],
+            key=itemgetter(0),
+        )
+        page = JobPage(jobs=[])
+        for _, job_id, title, created_at in islice(merged, limit + 1):
+            if len(page.jobs) == limit:
+                page.next_after = last
+                break
+            page.jobs.append({"job_id": job_id, "title": title})
+            last = (created_at, job_id)
+
+        if count_limit is not None:
+            matched = len(found.positions) + len(changed)
+            if found.complete and len(changed) < stop_at:
+                page.total = matched
+            else:
+                # Assume the rest of the driving list matches at the rate seen so far
+                estimate = len(found.positions) / found.scanned * found.source_size if found.scanned else 0
+                page.total = max(round(estimate) + len(changed), count_limit + 1)
+                page.total_is_estimate = True
+        return page
+
+    def stats(self) -> dict:
+        state = self._state
+        return {
+            "ready": self.ready,
+            "posts": len(self),
+            "snapshot_rows": state.snapshot.size,
+            "dead_rows": state.dead_count,
+            "overlay_rows": len(state.overlay),
+            "generation": state.generation,
+            "mapped": self._directory is not None,
+            "snapshot_mb": round(state.snapshot.nbytes / 2**20, 1),
+            "swaps": self.swaps,
+            "watermark": state.watermark.isoformat() if state.watermark else None,
+            "deleted_watermark": state.deleted_watermark.isoformat() if state.deleted_watermark else None,
+        }
+
+
+job_index = JobSearchIndex()
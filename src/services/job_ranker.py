@@ -0,0 +1,361 @@
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime
+from itertools import repeat
+from typing import Iterable, Optional
+
+import numpy as np
+from asyncpg.pool import Pool
+
+from src.core.metrics import registry
+from src.services.job_index import deleted_posts
+
+logger = logging.getLogger("uvicorn.error")
+
+rank_seconds = registry.histogram("job_rank_seconds", "Relevance ranking of one job search candidate set")
+
+RANK_COLUMNS = 'id, title, description, "IsAccepting", created_at, updated_at'
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+    a an and are as at be by for from has have in is it its of on or our the this to
+    we who will with you your
+""".split())
+# A title term counts this many times, so a post is about what its title says
+TITLE_REPEAT = 2
+# Rows replaced or removed since the last compaction, as a share of live rows, before compacting
+COMPACT_RATIO = 0.25
+
+
+def terms(text: Optional[str]) -> list[str]:
+    """Lowercased word tokens without stopwords, with a plural "s" stripped ("actors" -> "actor")."""
+    if not text:
+        return []
+    found = []
+    for token in TOKEN.findall(text.lower()):
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        found.append(token)
+    return found
+
+
+class _Growable:
+    """A numpy array with amortised appends, for the CSR arrays below."""
+
+    def __init__(self, dtype, capacity: int = 1024):
+        self.array = np.zeros(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values) -> None:
+        values = np.asarray(values, dtype=self.array.dtype)
+        end = self.size + values.size
+        if end > self.array.size:
+            grown = np.zeros(max(end, self.array.size * 2), dtype=self.array.dtype)
+            grown[:self.size] = self.array[:self.size]
+            self.array = grown
+        self.array[self.size:end] = values
+        self.size = end
+
+    def view(self) -> np.ndarray:
+        return self.array[:self.size]
+
+
+class JobRanker:
+    """
+    TF-IDF model over the title and description of accepting job posts, for
+    re-ordering a search's candidate set by relevance.
+
+    Posts are rows of a sparse matrix kept as CSR arrays: `indptr` gives each
+    row's slice of `indices` (term ids) and `weights` (sublinear tf times idf,
+    L2-normalised per row). Changed posts are appended as new rows and their old
+    row is left dead, so the change feed never rewrites the arrays. Posts deleted
+    from job_posts, read from the search index's deletion feed, leave their row
+    dead the same way and take their terms out of the document frequencies. Once
+    enough rows are dead they are compacted away and every weight is recomputed
+    with the current document frequencies. Ranking a candidate set gathers the
+    candidates' rows and scores them against the query in one vectorized pass.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._vocab: dict[str, int] = {}
+        self._df: list[int] = []
+        self._live = 0
+        self._row_of: dict[str, int] = {}
+        self._reset()
+        self._watermark: Optional[datetime] = None
+        self._deleted_watermark: Optional[datetime] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self.compactions = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _reset(self) -> None:
+        self._indptr = _Growable(np.int64)
+        self._indptr.extend([0])
+        self._indices = _Growable(np.int32)
+        self._counts = _Growable(np.float32)
+        self._weights = _Growable(np.float32)
+        self._created = _Growable(np.float64)
+        self._row_of.clear()
+        self._live = 0
+
+    # --- Loading and change feed ---
+
+    async def load(self, pool: Pool) -> None:
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(f'SELECT {RANK_COLUMNS} FROM job_posts WHERE "IsAccepting" = true')
+        self._vocab.clear()
+        self._df.clear()
+        self._reset()
+        # One extend per array rather than per post
+        indices, counts, lengths, created = [], [], [], []
+        for row in rows:
+            term_counts = self._count_terms(row)
+            self._row_of[row["id"]] = len(lengths)
+            indices.extend(term_counts)
+            counts.extend(term_counts.values())
+            lengths.append(len(term_counts))
+            created.append(row["created_at"].timestamp())
+        self._indices.extend(indices)
+        self._counts.extend(counts)
+        self._indptr.extend(np.cumsum(lengths))
+        self._created.extend(created)
+        self._live = len(lengths)
+        self._reweight()
+        self._watermark = max((row["updated_at"] for row in rows), default=None)
+        self._deleted_watermark = self._watermark
+        self.ready = True
+        logger.info(f"Job ranker loaded {self._live} posts with {len(self._vocab)} terms.")
+
+    async def sync(self, pool: Pool) -> int:
+        """
+        Apply every job post changed or deleted since the last load or sync.
+        Returns the number of rows and deletions applied.
+        """
+        async with pool.acquire() as conn:
+            if self._watermark is None:
+                rows = await conn.fetch(f"SELECT {RANK_COLUMNS} FROM job_posts")
+            else:
+                # >= like the search index: rows committed late with the same timestamp are not missed
+                rows = await conn.fetch(
+                    f"SELECT {RANK_COLUMNS} FROM job_posts WHERE updated_at >= $1 ORDER BY updated_at",
+                    self._watermark,
+                )
+            deletions = await deleted_posts(conn, self._deleted_watermark)
+        for row in rows:
+            self.apply(row)
+            if self._watermark is None or row["updated_at"] > self._watermark:
+                self._watermark = row["updated_at"]
+        for deletion in deletions:
+            self._drop(deletion["job_id"])
+            if self._deleted_watermark is None or deletion["deleted_at"] > self._deleted_watermark:
+                self._deleted_watermark = deletion["deleted_at"]
+        if self._dead_rows() > max(1000, self._live * COMPACT_RATIO):
+            self._compact()
+        return len(rows) + len(deletions)
+
+    def apply(self, row) -> None:
+        """Upsert a single job_posts row; posts that stopped accepting are dropped."""
+        self._drop(row["id"])
+        if row["IsAccepting"]:
+            start = self._indices.size
+            self._append(row)
+            self._reweight(start)
+
+    def start_sync(self, pool: Pool, interval: float) -> None:
+        self._sync_task = asyncio.create_task(self._sync_loop(pool, interval))
+
+    async def stop_sync(self) -> None:
+        if self._sync_task:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+
+    async def _sync_loop(self, pool: Pool, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync(pool)
+            except Exception as e:
+                logger.error(f"Job ranker sync failed: {e}")
+
+    # --- Matrix maintenance ---
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._vocab.get(term)
+        if term_id is None:
+            term_id = self._vocab[term] = len(self._df)
+            self._df.append(0)
+        return term_id
+
+    def _count_terms(self, row) -> dict[int, int]:
+        # Term frequencies of one post; counts the post towards each term's document frequency
+        counts: dict[int, int] = {}
+        for term in terms(row["title"]) * TITLE_REPEAT + terms(row["description"]):
+            term_id = self._term_id(term)
+            counts[term_id] = counts.get(term_id, 0) + 1
+        for term_id in counts:
+            self._df[term_id] += 1
+        return counts
+
+    def _append(self, row) -> None:
+        counts = self._count_terms(row)
+        self._row_of[row["id"]] = self._indptr.size - 1
+        self._indices.extend(list(counts))
+        self._counts.extend(list(counts.values()))
+        self._indptr.extend([self._indices.size])
+        self._created.extend([row["created_at"].timestamp()])
+        self._live += 1
+
+    def _drop(self, job_id: str) -> None:
+        row = self._row_of.pop(job_id, None)
+        if row is None:
+            return
+        indptr = self._indptr.view()
+        for term_id in self._indices.view()[indptr[row]:indptr[row + 1]]:
+            self._df[term_id] -= 1
+        self._live -= 1
+
+    def _dead_rows(self) -> int:
+        return self._indptr.size - 1 - self._live
+
+    def _idf(self, term_ids: np.ndarray) -> np.ndarray:
+        if term_ids.size > len(self._df):
+            df = np.asarray(self._df, dtype=np.float32)[term_ids]
+        else:
+            df = np.fromiter((self._df[term_id] for term_id in term_ids), dtype=np.float32, count=term_ids.size)
+        return np.log((1 + self._live) / (1 + np.maximum(df, 0))).astype(np.float32) + 1
+
+    def _reweight(self, start: int = 0) -> None:
+        # Weights for every entry from `start` on, which must be a row boundary
+        indptr = self._indptr.view()
+        first_row = int(np.searchsorted(indptr, start))
+        lengths = np.diff(indptr[first_row:])
+        indices = self._indices.view()[start:]
+        weights = (1 + np.log(self._counts.view()[start:])) * self._idf(indices)
+        owner = np.repeat(np.arange(lengths.size), lengths)
+        norms = np.sqrt(np.bincount(owner, weights=weights * weights, minlength=lengths.size))
+        weights /= np.maximum(norms, 1e-12)[owner]
+        self._weights.size = start
+        self._weights.extend(weights)
+
+    def _compact(self) -> None:
+        # Rebuild the arrays from the live rows only, with weights from the current df
+        indptr = self._indptr.view()
+        indices, counts, created = self._indices.view(), self._counts.view(), self._created.view()
+        live = sorted(self._row_of.items(), key=lambda item: item[1])
+        rows = np.fromiter((row for _, row in live), dtype=np.int64, count=len(live))
+        lengths = indptr[rows + 1] - indptr[rows]
+        positions = _gather(indptr[rows], lengths)
+        kept_indices, kept_counts, kept_created = indices[positions], counts[positions], created[rows]
+        self._reset()
+        self._indptr.extend(np.cumsum(lengths))
+        self._indices.extend(kept_indices)
+        self._counts.extend(kept_counts)
+        self._created.extend(kept_created)
+        self._row_of.update((job_id, new_row) for new_row, (job_id, _) in enumerate(live))
+        self._live = len(live)
+        self._reweight()
+        self.compactions += 1
+
+    # --- Ranking ---
+
+    def query_vector(self, query_terms: Iterable[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Sorted term ids and their normalised weights; terms no post contains are left out."""
+        counts: dict[int, int] = {}
+        for term in query_terms:
+            term_id = self._vocab.get(term)
+            if term_id is not None and self._df[term_id] > 0:
+                counts[term_id] = counts.get(term_id, 0) + 1
+        term_ids = np.array(sorted(counts), dtype=np.int32)
+        if not term_ids.size:
+            return term_ids, np.zeros(0, dtype=np.float32)
+        weights = (1 + np.log(np.array([counts[t] for t in term_ids], dtype=np.float32))) * self._idf(term_ids)
+        return term_ids, weights / np.linalg.norm(weights)
+
+    def rows(self, job_ids: list[str]) -> np.ndarray:
+        """Matrix row of each post, -1 for posts not in the model."""
+        return np.fromiter(map(self._row_of.get, job_ids, repeat(-1)), dtype=np.int64, count=len(job_ids))
+
+    def relevance(self, rows: np.ndarray, term_ids: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Cosine similarity of each row to the query vector; 0 for posts not in the model (-1)."""
+        scores = np.zeros(rows.size, dtype=np.float64)
+        known = np.flatnonzero(rows >= 0)
+        if not term_ids.size or not known.size:
+            return scores
+        indptr = self._indptr.view()
+        starts = indptr[rows[known]]
+        lengths = indptr[rows[known] + 1] - starts
+        positions = _gather(starts, lengths)
+        entries = self._indices.view()[positions]
+        slots = np.minimum(np.searchsorted(term_ids, entries), term_ids.size - 1)
+        hits = term_ids[slots] == entries
+        owner = np.repeat(known, lengths)[hits]
+        contributions = self._weights.view()[positions[hits]] * weights[slots[hits]]
+        scores += np.bincount(owner, weights=contributions, minlength=rows.size)
+        return scores
+
+    def rank(
+        self,
+        job_ids: list[str],
+        query_terms: Iterable[str],
+        recency_weight: float,
+        half_life_days: float,
+        now: Optional[float] = None,
+    ) -> list[int]:
+        """
+        Positions of `job_ids` best first. The score blends relevance, relative to
+        the best candidate, with recency, which halves every `half_life_days`.
+        Ties keep the incoming order, so candidates should arrive newest first;
+        posts the model hasn't synced yet score as brand new with no relevance.
+        """
+        started = time.perf_counter()
+        rows = self.rows(job_ids)
+        term_ids, weights = self.query_vector(query_terms)
+        relevance = self.relevance(rows, term_ids, weights)
+        best = relevance.max(initial=0.0)
+        if best > 0:
+            relevance /= best
+
+        now = time.time() if now is None else now
+        created = np.where(rows >= 0, self._created.view()[np.maximum(rows, 0)], now)
+        age_days = np.maximum(now - created, 0) / 86400
+        recency = np.exp2(-age_days / half_life_days)
+
+        scores = (1 - recency_weight) * relevance + recency_weight * recency
+        order = np.argsort(-scores, kind="stable")
+        rank_seconds.observe(time.perf_counter() - started)
+        return order.tolist()
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "posts": self._live,
+            "terms": len(self._vocab),
+            "dead_rows": self._dead_rows(),
+            "entries": self._indices.size,
+            "compactions": self.compactions,
+            "mb": round(sum(
+                part.array.nbytes for part in (self._indptr, self._indices, self._counts, self._weights, self._created)
+            ) / 2**20, 1),
+        }
+
+
+def _gather(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    # Concatenated ranges [start, start + length) for every row, without a Python loop
+    if not lengths.size:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(int(lengths.sum()))
+
+
+job_ranker = JobRanker()
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.settings import ModelSettings
+
+from src.core.metrics import registry
+
+logger = logging.getLogger("uvicorn.error")
+
+T = TypeVar("T")
+
+routed_requests = registry.counter("model_routed_requests_total", "Model requests sent through the hedged router", ("stream",))
+hedges = registry.counter("model_hedges_total", "Requests where the secondary provider was also asked after the hedge delay", ("stream",))
+wins = registry.counter("model_wins_total", "Requests answered first by each provider, and whether a hedge was in flight", ("provider", "hedged"))
+failovers = registry.counter("model_failovers_total", "Requests moved to the next provider after an error", ("provider",))
+breaker_opens = registry.counter("model_breaker_opens_total", "Times a provider's circuit breaker opened", ("provider",))
+
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+# Every breaker created, for the state gauge
+_breakers: dict[str, "CircuitBreaker"] = {}
+
+registry.gauge(
+    "model_breaker_state", "Circuit breaker state per provider: 0 closed, 1 half-open, 2 open", ("provider",),
+    lambda: {(name,): BREAKER_STATES[breaker.state] for name, breaker in _breakers.items()},
+)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` failures in a row, where an error and a
+    request slower than `latency_budget` both count. While open the provider
+    is skipped. After `cooldown` seconds one trial request is let through
+    (half-open): success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, latency_budget: float, cooldown: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.latency_budget = latency_budget
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        _breakers[name] = self
+
+    def available(self) -> bool:
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+        return self.state == "closed" or (self.state == "half_open" and not self._trial_in_flight)
+
+    def begin(self) -> None:
+        # In half-open, this request is the one trial
+        if self.state == "half_open":
+            self._trial_in_flight = True
+
+    def record(self, elapsed: float, error: Optional[BaseException] = None) -> None:
+        self._trial_in_flight = False
+        if error is None and elapsed <= self.latency_budget:
+            self.failures = 0
+            if self.state != "closed":
+                logger.info(f"Model provider {self.name} recovered, closing its circuit breaker")
+            self.state = "closed"
+            return
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                breaker_opens.inc(self.name)
+                reason = type(error).__name__ if error else f"{elapsed:.1f}s over the {self.latency_budget}s budget"
+                logger.warning(f"Opening circuit breaker for model provider {self.name} ({reason})")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def abandon(self, elapsed: float) -> None:
+        """A request cancelled because the other provider won. Only counts if it was already over budget."""
+        if elapsed > self.latency_budget:
+            self.record(elapsed, None)
+        else:
+            self._trial_in_flight = False
+
+
+@dataclass
+class ModelRoute:
+    name: str
+    model: Model
+    breaker: CircuitBreaker
+
+
+class HedgedModel(Model):
+    """
+    Sends each request to the first provider whose breaker allows it. If no
+    answer has arrived after `hedge_delay` seconds, the same request also goes
+    to the next provider and whichever answers first is used; the other is
+    cancelled. A provider that errors hands over to the next one straight away.
+
+    "Answered" means the first chunk arrived, since the provider models only
+    return the stream once they have it. Plain requests are streamed too, so a
+    long completion that started promptly is never hedged. When every breaker
+    is open the first provider is tried anyway.
+    """
+
+    def __init__(self, routes: list[ModelRoute], hedge_delay: float):
+        self.routes = routes
+        self.hedge_delay = hedge_delay
+        # Losing requests are cancelled and cleaned up here, off the winner's path
+        self._cleanup: set[asyncio.Task] = set()
+
+    @property
+    def model_name(self) -> str:
+        return f"hedged:{','.join(route.model.model_name for route in self.routes)}"
+
+    @property
+    def system(self) -> str:
+        return self.routes[0].model.system
+
+    @property
+    def base_url(self) -> Optional[str]:
+        return self.routes[0].model.base_url
+
+    def customize_request_parameters(self, model_request_parameters: ModelRequestParameters) -> ModelRequestParameters:
+        # Each provider customizes the parameters for itself in _race
+        return model_request_parameters
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        async with self._hedged_stream(messages, model_settings, model_request_parameters, "false") as stream:
+            async for _ in stream:
+                pass
+        return stream.get()
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        async with self._hedged_stream(messages, model_settings, model_request_parameters, "true") as stream:
+            yield stream
+
+    @asynccontextmanager
+    async def _hedged_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+        stream: str,
+    ) -> AsyncIterator[StreamedResponse]:
+        async def attempt(route: ModelRoute) -> tuple[AsyncExitStack, StreamedResponse]:
+            parameters = route.model.customize_request_parameters(model_request_parameters)
+            stack = AsyncExitStack()
+            try:
+                opened = await stack.enter_async_context(route.model.request_stream(messages, model_settings, parameters))
+            except BaseException:
+                await stack.aclose()
+                raise
+            return stack, opened
+
+        async def discard(opened: tuple[AsyncExitStack, StreamedResponse]) -> None:
+            await opened[0].aclose()
+
+        _, (stack, opened) = await self._race(attempt, discard, stream)
+        async with stack:
+            yield opened
+
+    def _candidates(self) -> list[ModelRoute]:
+        allowed = [route for route in self.routes if route.breaker.available()]
+        return allowed or self.routes[:1]
+
+    async def _race(
+        self,
+        attempt: Callable[[ModelRoute], Awaitable[T]],
+        discard: Callable[[T], Awaitable[None]],
+        stream: str,
+    ) -> tuple[ModelRoute, T]:
+        routed_requests.inc(stream)
+        waiting = self._candidates()
+        running: dict[asyncio.Task, tuple[ModelRoute, float]] = {}
+        hedged = False
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            route = waiting.pop(0)
+            route.breaker.begin()
+            running[asyncio.create_task(attempt(route))] = (route, time.perf_counter())
+
+        launch()
+        try:
+            while running:
+                done, _ = await asyncio.wait(
+                    running, timeout=self.hedge_delay if waiting else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Slow to answer: ask the next provider as well
+                    hedged = True
+                    hedges.inc(stream)
+                    launch()
+                    continue
+                winner = None
+                for task in done:
+                    route, started = running.pop(task)
+                    error = task.exception()
+                    route.breaker.record(time.perf_counter() - started, error)
+                    if error is not None:
+                        last_error = error
+                        logger.warning(f"Model provider {route.name} failed: {type(error).__name__}: {error}")
+                    elif winner is None:
+                        winner = (route, task.result())
+                    else:
+                        # Both answered at once; keep the first, close the other
+                        self._spawn_cleanup(discard(task.result()))
+                if winner is not None:
+                    wins.inc(winner[0].name, "true" if hedged else "false")
+                    return winner
+                if not running and waiting:
+                    failovers.inc(waiting[0].name)
+                    launch()
+            raise last_error
+        finally:
+            # The winner returned, or the caller gave up: nothing still running is needed
+            for task, (route, started) in running.items():
+                task.cancel()
+                self._spawn_cleanup(self._abandon(task, route, started, discard))
+
+    async def _abandon(self, task: asyncio.Task, route: ModelRoute, started: float, discard) -> None:
+        try:
+            result = await task
+        except BaseException:
+            route.breaker.abandon(time.perf_counter() - started)
+            return
+        # It finished before the cancellation landed
+        route.breaker.record(time.perf_counter() - started)
+        await discard(result)
+
+    def _spawn_cleanup(self, coroutine: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(coroutine)
+        self._cleanup.add(task)
+        task.add_done_callback(self._cleanup.discard)
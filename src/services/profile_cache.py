@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import asyncpg
+
+from src.core.config import settings
+from src.core.metrics import registry
+from src.schemas.user import UserProfile
+
+logger = logging.getLogger("uvicorn.error")
+
+listener_reconnects = registry.counter(
+    "profile_cache_listener_reconnects_total", "Times the profile cache listener reconnected after losing its connection"
+)
+
+# The channel migration 0007's triggers notify
+PROFILE_CHANNEL = "user_profile_changed"
+# Backoff between attempts to (re)connect the listener, doubling up to the maximum
+LISTEN_RETRY_DELAY = 1.0
+LISTEN_RETRY_MAX_DELAY = 30.0
+
+
+class ProfileCache:
+    """
+    Bounded LRU + TTL cache of user profiles keyed by user_id.
+
+    Concurrent misses for the same user share one in-flight load instead of
+    each running the profile query. Entries can be dropped explicitly with
+    `invalidate()`, or by a `NOTIFY <channel>, '<user_id>'` from the database
+    once `start_listening()` has been called. Migration 0007's triggers on
+    user_profile and skills send one on PROFILE_CHANNEL for every change.
+
+    The listener has a connection of its own, outside the app pool. When it is
+    lost the listener reconnects with backoff, and the cache is cleared when
+    the connection drops and again once it is back, since notifications sent
+    in between were missed.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: OrderedDict[str, tuple[float, UserProfile]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.listening = False
+        self.reconnects = 0
+        self._channel: Optional[str] = None
+        self._listen_task: Optional[asyncio.Task] = None
+
+    async def get(
+        self,
+        user_id: str,
+        loader: Callable[[], Awaitable[Optional[UserProfile]]],
+    ) -> Optional[UserProfile]:
+        entry = self._entries.get(user_id)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+        task = self._inflight.get(user_id)
+        if task:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(loader())
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda done: self._store(user_id, done))
+
+        # Shielded so one caller disconnecting doesn't cancel the load for everyone else
+        return await asyncio.shield(task)
+
+    def _store(self, user_id: str, task: asyncio.Task) -> None:
+        # A load that was invalidated while in flight is not cached
+        if self._inflight.get(user_id) is not task:
+            return
+        del self._inflight[user_id]
+        if task.cancelled() or task.exception() or task.result() is None:
+            return
+        self._entries[user_id] = (time.monotonic(), task.result())
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+        self._inflight.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
+
+    def start_listening(self, dsn: str, channel: str) -> None:
+        """Invalidate entries from NOTIFY payloads containing a user_id, on a connection to `dsn`."""
+        if channel != PROFILE_CHANNEL:
+            logger.warning(
+                f"Profile cache listens on {channel!r}, which no migration notifies; "
+                f"profile writers must send NOTIFY {channel}, '<user_id>' themselves"
+            )
+        self._channel = channel
+        self._listen_task = asyncio.create_task(self._listen(dsn))
+
+    async def stop_listening(self) -> None:
+        if self._listen_task:
+            self._listen_task.cancel()
+            try:
+                await self._listen_task
+            except asyncio.CancelledError:
+                pass
+            self._listen_task = None
+
+    async def _listen(self, dsn: str) -> None:
+        delay = LISTEN_RETRY_DELAY
+        connected_before = False
+        while True:
+            try:
+                conn = await asyncpg.connect(dsn)
+            except Exception as e:
+                logger.error(f"Profile cache listener failed to connect, retrying in {delay:.0f}s: {e}")
+            else:
+                lost = asyncio.Event()
+                try:
+                    conn.add_termination_listener(lambda _: lost.set())
+                    await conn.add_listener(self._channel, self._on_notify)
+                    # Changes made while nothing was listening were missed
+                    self.clear()
+                    self.listening = True
+                    if connected_before:
+                        self.reconnects += 1
+                        listener_reconnects.inc()
+                        logger.info("Profile cache listener reconnected; cache cleared")
+                    connected_before = True
+                    delay = LISTEN_RETRY_DELAY
+                    await lost.wait()
+                    logger.error(f"Profile cache listener lost its connection, reconnecting in {delay:.0f}s")
+                except Exception as e:
+                    logger.error(f"Profile cache listener failed, reconnecting in {delay:.0f}s: {e}")
+                finally:
+                    if self.listening:
+                        self.listening = False
+                        self.clear()
+                    conn.terminate()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LISTEN_RETRY_MAX_DELAY)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self.invalidate(payload)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "inflight": len(self._inflight),
+            "listening": self.listening,
+            "listener_reconnects": self.reconnects,
+        }
+
+
+profile_cache = ProfileCache(max_size=settings.profile_cache_size, ttl=settings.profile_cache_ttl)
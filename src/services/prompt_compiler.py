@@ -0,0 +1,123 @@
+"""
+Compiles src/dependencies/prompt.md into the static instructions every agent
+run starts with, and renders the per-user block that follows them.
+
+Providers cache a request's longest previously seen prefix (OpenAI from 1024
+tokens on), so everything that is the same for every user - tool definitions,
+then the compiled prompt - comes first and stays byte-identical, and the
+profile goes in a compact suffix after it. Conversation history and the user's
+message follow in the message list.
+
+    python -m src.services.prompt_compiler   # tokens per section, before and after
+"""
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+import hashlib
+import re
+
+from src.schemas.user import UserProfile
+from src.services.history_service import estimate_tokens
+
+# Relative to the package, so the app can be started from any directory
+PROMPT_PATH = Path(__file__).resolve().parent.parent / "dependencies" / "prompt.md"
+
+# Profile values that mean "not set"; user_service fills unknown places with "Not specified"
+UNSET = {"", "Not specified"}
+
+_EMPHASIS = re.compile(r"\*\*(.+?)\*\*")
+_SPACES = re.compile(r"(?<=\S) {2,}")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass(frozen=True)
+class PromptSection:
+    title: str
+    source_tokens: int
+    tokens: int
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    prefix: str
+    source_tokens: int
+    sections: tuple[PromptSection, ...]
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.prefix)
+
+    @property
+    def digest(self) -> str:
+        # Changes exactly when the cached prefix does, e.g. after editing prompt.md
+        return hashlib.sha256(self.prefix.encode()).hexdigest()[:16]
+
+    def report(self) -> str:
+        lines = [f"{'section':<40} {'source':>8} {'compiled':>9}"]
+        for section in self.sections:
+            lines.append(f"{section.title[:40]:<40} {section.source_tokens:>8} {section.tokens:>9}")
+        lines.append(f"{'total':<40} {self.source_tokens:>8} {self.tokens:>9}")
+        lines.append(f"digest {self.digest}")
+        return "\n".join(lines)
+
+
+def minify(markdown: str) -> str:
+    """
+    Drops what the model doesn't read: blank lines, trailing and repeated
+    spaces, and bold markers. Headings, list markers and backticks stay, and
+    so does every word, in order.
+    """
+    lines = []
+    for line in markdown.splitlines():
+        line = _SPACES.sub(" ", _EMPHASIS.sub(r"\1", line.rstrip()))
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def _sections(markdown: str) -> list[tuple[str, str]]:
+    # Split at the "## " headings; what comes before the first one is the preamble
+    sections = [("(preamble)", [])]
+    for line in markdown.splitlines():
+        if line.startswith("## "):
+            sections.append((line[3:].strip(), []))
+        sections[-1][1].append(line)
+    return [(title, "\n".join(lines)) for title, lines in sections]
+
+
+def compile_prompt(markdown: str) -> CompiledPrompt:
+    sections = tuple(
+        PromptSection(title, estimate_tokens(text), estimate_tokens(minify(text)))
+        for title, text in _sections(markdown)
+    )
+    return CompiledPrompt(prefix=minify(markdown), source_tokens=estimate_tokens(markdown), sections=sections)
+
+
+@cache
+def get_prompt() -> CompiledPrompt:
+    """prompt.md compiled once per process; src.serve does it in the master before forking."""
+    return compile_prompt(PROMPT_PATH.read_text(encoding="utf-8"))
+
+
+def user_suffix(profile: UserProfile) -> str:
+    """
+    The per-user block after the prefix: one `name=value` line per profile
+    field that is set, with line breaks in free text folded into spaces. The
+    bio, the longest and least used field, goes last.
+    """
+    fields = (
+        ("first_name", profile.first_name),
+        ("last_name", profile.last_name),
+        ("role", profile.role),
+        ("city", profile.city),
+        ("country", profile.country),
+        ("availability", profile.availability),
+        ("skills", ", ".join(profile.skills)),
+        ("bio", profile.bio),
+    )
+    lines = [f"{name}={_WHITESPACE.sub(' ', value).strip()}" for name, value in fields if value.strip() not in UNSET]
+    return "\n".join(["User Details:", *lines]) if lines else "User Details: none given"
+
+
+if __name__ == "__main__":
+    print(get_prompt().report())
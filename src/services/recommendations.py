@@ -0,0 +1,524 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from asyncpg.pool import Pool
+
+from src.core.config import settings
+from src.core.metrics import errors, registry
+
+logger = logging.getLogger("uvicorn.error")
+
+refresh_seconds = registry.histogram(
+    "recommendation_refresh_seconds", "Recommendation maintenance: full rebuilds, post merges and profile refreshes", ("kind",)
+)
+read_seconds = registry.histogram("recommendation_read_seconds", "Reading one user's precomputed recommendations").labels()
+
+# Arbitrary key for pg_try_advisory_lock, so one worker maintains the tables at a time
+REFRESH_LOCK_ID = 7_341_206
+
+# Score weights. A post has to share the role, city or country with the profile
+# to be recommended at all; country only counts when the city doesn't match.
+ROLE_WEIGHT = 3
+CITY_WEIGHT = 2
+COUNTRY_WEIGHT = 1
+# Scaled by the share of the user's skills that appear in the title or description
+SKILLS_WEIGHT = 2
+# Recency is linear in created_at: a post scores one point more than one RECENCY_DAYS
+# older. Scores then don't change as time passes, so a stored list stays correctly
+# ordered and a new post can be merged into it without rescoring the rest.
+RECENCY_DAYS = 90
+RECENCY_EPOCH = "2020-01-01"
+
+# Score terms over a post `j` (with a lowercased `text`), a recommendation profile `u`
+# and `s.matched`, the number of the user's skills found in the post
+_ROLE = "(j.category_id = u.job_role_id) IS TRUE"
+_CITY = "(j.city_id = u.city_id) IS TRUE"
+_COUNTRY = "(j.city_id = u.city_id) IS NOT TRUE AND (j.country_id = u.country_id) IS TRUE"
+
+# Everything but skills, which depends only on the role, city and country
+BASE_SCORE_SQL = f"""
+    {ROLE_WEIGHT} * ({_ROLE})::int
+    + {CITY_WEIGHT} * ({_CITY})::int
+    + {COUNTRY_WEIGHT} * ({_COUNTRY})::int
+    + EXTRACT(EPOCH FROM j.created_at - TIMESTAMP '{RECENCY_EPOCH}')::float8 / {RECENCY_DAYS * 86400}
+"""
+SKILLS_SCORE_SQL = f"{SKILLS_WEIGHT} * s.matched::float8 / GREATEST(cardinality(u.skills), 1)"
+SCORE_SQL = f"{BASE_SCORE_SQL} + {SKILLS_SCORE_SQL}"
+
+# Which parts of the profile a post matched, from the same terms as the score
+REASONS_SQL = """
+    ARRAY_REMOVE(ARRAY[
+        CASE WHEN {role} THEN 'role' END,
+        CASE WHEN {city} THEN 'city' WHEN {country} THEN 'country' END,
+        CASE WHEN matched > 0 THEN 'skills' END
+    ], NULL)
+"""
+
+SKILLS_MATCHED_SQL = "SELECT count(*) AS matched FROM unnest(u.skills) AS skill WHERE strpos(j.text, skill) > 0"
+
+POST_TEXT_SQL = "lower(p.title || ' ' || COALESCE(p.description, '')) AS text"
+
+SYNC_PROFILES = """
+    INSERT INTO recommendation_profiles (user_id, job_role_id, city_id, country_id, skills, refreshed_at)
+    SELECT
+        up.user_id, up.job_role_id, up.city_id, up.country_id,
+        COALESCE(ARRAY_AGG(DISTINCT lower(trim(s.name))) FILTER (WHERE trim(s.name) <> ''), '{}'),
+        now()
+    FROM user_profile up
+    LEFT JOIN skills s ON s.user_profile_id = up.id
+    WHERE up.user_id = ANY($1::text[])
+    GROUP BY up.id
+    ON CONFLICT (user_id) DO UPDATE SET
+        job_role_id = EXCLUDED.job_role_id,
+        city_id = EXCLUDED.city_id,
+        country_id = EXCLUDED.country_id,
+        skills = EXCLUDED.skills,
+        refreshed_at = EXCLUDED.refreshed_at
+"""
+
+DROP_MISSING_PROFILES = """
+    DELETE FROM recommendation_profiles rp
+    WHERE rp.user_id = ANY($1::text[])
+      AND NOT EXISTS (SELECT 1 FROM user_profile up WHERE up.user_id = rp.user_id)
+"""
+
+# Candidates for a group of users with the same role, city and country: the newest
+# posts sharing the role and city, the role and country, and each of the three alone.
+# Each list comes straight off a job_posts_accepting_*_idx index, newest first.
+RANK_USERS = f"""
+    WITH users AS (
+        SELECT * FROM recommendation_profiles WHERE user_id = ANY($1::text[])
+    ),
+    groups AS (
+        SELECT DISTINCT job_role_id, city_id, country_id FROM users
+    ),
+    candidates AS (
+        SELECT DISTINCT g.job_role_id, g.city_id, g.country_id, c.id
+        FROM groups g
+        CROSS JOIN LATERAL (
+            (SELECT id FROM job_posts WHERE "IsAccepting" AND category_id = g.job_role_id AND city_id = g.city_id
+             ORDER BY created_at DESC, id LIMIT $2)
+            UNION ALL
+            (SELECT id FROM job_posts WHERE "IsAccepting" AND category_id = g.job_role_id AND country_id = g.country_id
+             ORDER BY created_at DESC, id LIMIT $2)
+            UNION ALL
+            (SELECT id FROM job_posts WHERE "IsAccepting" AND category_id = g.job_role_id
+             ORDER BY created_at DESC, id LIMIT $2)
+            UNION ALL
+            (SELECT id FROM job_posts WHERE "IsAccepting" AND city_id = g.city_id
+             ORDER BY created_at DESC, id LIMIT $2)
+            UNION ALL
+            (SELECT id FROM job_posts WHERE "IsAccepting" AND country_id = g.country_id
+             ORDER BY created_at DESC, id LIMIT $2)
+        ) c
+    ),
+    -- Each candidate is read and lowercased once per batch, not once per user
+    texts AS MATERIALIZED (
+        SELECT p.id, p.category_id, p.city_id, p.country_id, p.created_at, {POST_TEXT_SQL}
+        FROM job_posts p
+        WHERE p.id = ANY(ARRAY(SELECT id FROM candidates))
+    ),
+    -- Scored for the group without skills. Skills add at most SKILLS_WEIGHT, so a post more
+    -- than that below the group's Nth best can't make any of its users' lists.
+    group_scored AS (
+        SELECT u.job_role_id, u.city_id, u.country_id, j.id, j.text, {BASE_SCORE_SQL} AS base,
+               {_ROLE} AS role, {_CITY} AS city, {_COUNTRY} AS country
+        FROM candidates u
+        JOIN texts j ON j.id = u.id
+    ),
+    pruned AS (
+        SELECT * FROM (
+            SELECT *, nth_value(base, $3) OVER (
+                PARTITION BY job_role_id, city_id, country_id ORDER BY base DESC
+                ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+            ) AS nth_base
+            FROM group_scored
+        ) g
+        WHERE nth_base IS NULL OR base >= nth_base - {SKILLS_WEIGHT}
+    ),
+    scored AS (
+        SELECT u.user_id, j.id AS job_id, j.base + {SKILLS_SCORE_SQL} AS score, j.role, j.city, j.country, s.matched
+        FROM users u
+        JOIN pruned j
+          ON COALESCE(j.job_role_id, '') = COALESCE(u.job_role_id, '')
+         AND COALESCE(j.city_id, '') = COALESCE(u.city_id, '')
+         AND COALESCE(j.country_id, '') = COALESCE(u.country_id, '')
+        CROSS JOIN LATERAL ({SKILLS_MATCHED_SQL}) s
+    ),
+    ranked AS (
+        SELECT *, row_number() OVER (PARTITION BY user_id ORDER BY score DESC, job_id) AS rank FROM scored
+    )
+    INSERT INTO job_recommendations (user_id, job_id, score, reasons)
+    SELECT user_id, job_id, score, {REASONS_SQL.format(role="role", city="city", country="country")}
+    FROM ranked
+    WHERE rank <= $3
+"""
+
+# A batch scores ~100 candidates per user; this keeps its per-user sort in memory
+RANK_WORK_MEM = "SET LOCAL work_mem = '32MB'"
+
+# Scores changed accepting posts against every profile sharing their role, city or
+# country, and keeps each one only where it beats the user's current lowest entry.
+# A stored list is always the exact top of the user's ranking, so anything below
+# its floor may rank behind posts the list doesn't hold and is left out.
+MERGE_POSTS = f"""
+    WITH posts AS (
+        SELECT p.id, p.category_id, p.city_id, p.country_id, p.created_at, {POST_TEXT_SQL}
+        FROM job_posts p
+        WHERE p.id = ANY($1::text[]) AND p."IsAccepting"
+    ),
+    matches AS (
+        SELECT j.id AS job_id, u.user_id FROM posts j JOIN recommendation_profiles u ON u.job_role_id = j.category_id
+        UNION
+        SELECT j.id, u.user_id FROM posts j JOIN recommendation_profiles u ON u.city_id = j.city_id
+        UNION
+        SELECT j.id, u.user_id FROM posts j JOIN recommendation_profiles u ON u.country_id = j.country_id
+    ),
+    scored AS (
+        SELECT u.user_id, j.id AS job_id, {SCORE_SQL} AS score,
+               {REASONS_SQL.format(role=_ROLE, city=_CITY, country=_COUNTRY)} AS reasons
+        FROM matches m
+        JOIN posts j ON j.id = m.job_id
+        JOIN recommendation_profiles u ON u.user_id = m.user_id
+        CROSS JOIN LATERAL ({SKILLS_MATCHED_SQL}) s
+    )
+    INSERT INTO job_recommendations (user_id, job_id, score, reasons)
+    SELECT sc.user_id, sc.job_id, sc.score, sc.reasons
+    FROM scored sc
+    -- A post has to beat a full list's lowest entry; a list shorter than $2 (per_user + headroom)
+    -- has no floor, so any matching post fills it
+    CROSS JOIN LATERAL (
+        SELECT CASE WHEN count(*) >= $2 THEN min(r.score) END AS floor
+        FROM job_recommendations r WHERE r.user_id = sc.user_id
+    ) current
+    WHERE current.floor IS NULL OR sc.score > current.floor
+    ON CONFLICT (user_id, job_id) DO UPDATE SET score = EXCLUDED.score, reasons = EXCLUDED.reasons
+    RETURNING user_id
+"""
+
+TRIM_USERS = """
+    DELETE FROM job_recommendations r
+    USING (
+        SELECT user_id, job_id, row_number() OVER (PARTITION BY user_id ORDER BY score DESC, job_id) AS rank
+        FROM job_recommendations
+        WHERE user_id = ANY($1::text[])
+    ) ranked
+    WHERE r.user_id = ranked.user_id AND r.job_id = ranked.job_id AND ranked.rank > $2
+"""
+
+SHORT_LISTS = """
+    SELECT u.user_id
+    FROM unnest($1::text[]) AS u(user_id)
+    WHERE (SELECT count(*) FROM job_recommendations r WHERE r.user_id = u.user_id) < $2
+"""
+
+READ = """
+    SELECT r.job_id, j.title, r.reasons
+    FROM job_recommendations r
+    JOIN job_posts j ON j.id = r.job_id AND j."IsAccepting"
+    WHERE r.user_id = $1
+    ORDER BY r.score DESC, r.job_id
+    LIMIT $2
+"""
+
+# Change feeds: (source, query for rows changed since a watermark, query for the current high mark)
+FEEDS = {
+    "job_posts": (
+        "SELECT id AS key, updated_at FROM job_posts WHERE updated_at >= $1 ORDER BY updated_at",
+        "SELECT max(updated_at) FROM job_posts",
+    ),
+    "user_profile": (
+        "SELECT user_id AS key, updated_at FROM user_profile WHERE updated_at >= $1 ORDER BY updated_at",
+        "SELECT max(updated_at) FROM user_profile",
+    ),
+    "skills": (
+        """
+        SELECT up.user_id AS key, s.updated_at
+        FROM skills s JOIN user_profile up ON up.id = s.user_profile_id
+        WHERE s.updated_at >= $1
+        ORDER BY s.updated_at
+        """,
+        "SELECT max(updated_at) FROM skills",
+    ),
+}
+
+
+def _chunks(items: list, size: int) -> list[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class RecommendationEngine:
+    """
+    Keeps the top accepting posts for every user profile in job_recommendations,
+    so "jobs for me" is one indexed read.
+
+    A user's list is ranked from the newest `candidates` posts in each list that
+    shares their role and/or location (see RANK_USERS), scored by role, city or
+    country match, skill overlap with the post text and recency. Changes are
+    picked up from updated_at on job_posts, user_profile and skills:
+
+    - a changed post is removed from every list and merged back, if still
+      accepting, into the lists of matching profiles it now beats, and into
+      any matching list shorter than `per_user + headroom`;
+    - a user whose profile or skills changed is re-ranked from scratch.
+
+    Lists are ranked `per_user + headroom` deep and served at most `per_user`
+    deep. Closing a post shortens the lists that held it, and only a list that
+    drops below `per_user` has to be re-ranked.
+
+    Deleted profiles and skills leave no updated_at behind; the full rebuild
+    (`python -m src.services.recommendations rebuild`) clears them.
+    """
+
+    def __init__(
+        self, per_user: int, headroom: int, candidates: int, batch_size: int = 500, merge_batch_size: int = 50
+    ):
+        self.per_user = per_user
+        self.headroom = headroom
+        self.kept = per_user + headroom
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.merge_batch_size = merge_batch_size
+        self.rebuilds = 0
+        self.last_rebuild_seconds: Optional[float] = None
+        self.posts_merged = 0
+        self.users_refreshed = 0
+        self.last_refresh: Optional[float] = None
+        # Keys already applied at each feed's watermark, so `updated_at >= watermark` doesn't redo them every tick
+        self._seen_at_watermark: dict[str, tuple[Optional[datetime], set[str]]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    # --- Ranking ---
+
+    async def refresh_users(self, pool: Pool, user_ids: list[str]) -> None:
+        """Re-reads the profiles and re-ranks the lists of these users; missing profiles are dropped."""
+        started = time.perf_counter()
+        for batch in _chunks(list(user_ids), self.batch_size):
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(SYNC_PROFILES, batch)
+                    await conn.execute(DROP_MISSING_PROFILES, batch)
+                    await conn.execute("DELETE FROM job_recommendations WHERE user_id = ANY($1::text[])", batch)
+                    await conn.execute(RANK_WORK_MEM)
+                    await conn.execute(RANK_USERS, batch, self.candidates, self.kept)
+        self.users_refreshed += len(user_ids)
+        refresh_seconds.observe(time.perf_counter() - started, "users")
+
+    async def rebuild(self, pool: Pool, concurrency: int = 4) -> int:
+        """Re-ranks every user, waiting for a refresh running elsewhere to finish. Returns the number of users."""
+        async with pool.acquire() as lock_conn:
+            await lock_conn.execute("SELECT pg_advisory_lock($1)", REFRESH_LOCK_ID)
+            try:
+                return await self._rebuild(pool, concurrency)
+            finally:
+                await lock_conn.execute("SELECT pg_advisory_unlock($1)", REFRESH_LOCK_ID)
+
+    async def _rebuild(self, pool: Pool, concurrency: int = 4) -> int:
+        started = time.perf_counter()
+        async with pool.acquire() as conn:
+            # Users with the same role and city land in the same batch and share their candidate lists
+            user_ids = [row["user_id"] for row in await conn.fetch(
+                "SELECT user_id FROM user_profile ORDER BY job_role_id, city_id, user_id"
+            )]
+            marks = {source: await conn.fetchval(high_mark) for source, (_, high_mark) in FEEDS.items()}
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def rank(batch: list[str]) -> None:
+            async with semaphore:
+                async with pool.acquire() as conn:
+                    async with conn.transaction():
+                        await conn.execute(SYNC_PROFILES, batch)
+                        await conn.execute("DELETE FROM job_recommendations WHERE user_id = ANY($1::text[])", batch)
+                        await conn.execute(RANK_WORK_MEM)
+                        await conn.execute(RANK_USERS, batch, self.candidates, self.kept)
+
+        await asyncio.gather(*(rank(batch) for batch in _chunks(user_ids, self.batch_size)))
+
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    DELETE FROM recommendation_profiles rp
+                    WHERE NOT EXISTS (SELECT 1 FROM user_profile up WHERE up.user_id = rp.user_id)
+                """)
+                await conn.execute("""
+                    DELETE FROM job_recommendations r
+                    WHERE NOT EXISTS (SELECT 1 FROM recommendation_profiles rp WHERE rp.user_id = r.user_id)
+                """)
+                # Anything changed while the rebuild ran is at or after these marks and gets applied next
+                for source, mark in marks.items():
+                    if mark is not None:
+                        await self._save_watermark(conn, source, mark)
+
+        self.rebuilds += 1
+        self.users_refreshed += len(user_ids)
+        self.last_rebuild_seconds = time.perf_counter() - started
+        refresh_seconds.observe(self.last_rebuild_seconds, "rebuild")
+        logger.info(f"Recommendations rebuilt for {len(user_ids)} users in {self.last_rebuild_seconds:.1f}s.")
+        return len(user_ids)
+
+    async def apply_post_changes(self, pool: Pool, job_ids: list[str]) -> int:
+        """Takes changed posts out of every list and merges them back where they now rank. Returns the users re-ranked."""
+        started = time.perf_counter()
+        short = set()
+        for batch in _chunks(list(job_ids), self.merge_batch_size):
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    lost = await conn.fetch(
+                        "DELETE FROM job_recommendations WHERE job_id = ANY($1::text[]) RETURNING user_id", batch
+                    )
+                    gained = await conn.fetch(MERGE_POSTS, batch, self.kept)
+                    gained = list({row["user_id"] for row in gained})
+                    if gained:
+                        await conn.execute(TRIM_USERS, gained, self.kept)
+                    # Lists that lost a post are still exact, just shorter; refill those too short to serve
+                    lost = list({row["user_id"] for row in lost})
+                    if lost:
+                        short.update(row["user_id"] for row in await conn.fetch(SHORT_LISTS, lost, self.per_user))
+        if short:
+            await self.refresh_users(pool, sorted(short))
+        self.posts_merged += len(job_ids)
+        refresh_seconds.observe(time.perf_counter() - started, "posts")
+        return len(short)
+
+    # --- Change feed ---
+
+    async def _load_watermarks(self, conn) -> dict[str, datetime]:
+        rows = await conn.fetch("SELECT source, updated_at FROM recommendation_watermarks")
+        return {row["source"]: row["updated_at"] for row in rows}
+
+    async def _save_watermark(self, conn, source: str, updated_at: datetime) -> None:
+        await conn.execute(
+            """
+            INSERT INTO recommendation_watermarks (source, updated_at) VALUES ($1, $2)
+            ON CONFLICT (source) DO UPDATE SET updated_at = GREATEST(recommendation_watermarks.updated_at, EXCLUDED.updated_at)
+            """,
+            source,
+            updated_at,
+        )
+
+    async def _changes(self, conn, source: str, watermark: datetime) -> tuple[list[str], datetime]:
+        # >= rather than > so rows committed late with the same timestamp are not missed;
+        # keys already applied at exactly the watermark are skipped.
+        rows = await conn.fetch(FEEDS[source][0], watermark)
+        seen_mark, seen = self._seen_at_watermark.get(source, (None, set()))
+        if seen_mark != watermark:
+            seen = set()
+        keys = {row["key"] for row in rows if not (row["updated_at"] == watermark and row["key"] in seen)}
+        high = max((row["updated_at"] for row in rows), default=watermark)
+        at_high = {row["key"] for row in rows if row["updated_at"] == high}
+        self._seen_at_watermark[source] = (high, at_high | seen if high == watermark else at_high)
+        return sorted(keys), high
+
+    async def refresh(self, pool: Pool) -> Optional[dict]:
+        """
+        Applies everything changed since the last refresh, or rebuilds when the tables
+        have never been filled. Returns None when another worker holds the refresh lock.
+        """
+        async with pool.acquire() as lock_conn:
+            if not await lock_conn.fetchval("SELECT pg_try_advisory_lock($1)", REFRESH_LOCK_ID):
+                return None
+            try:
+                watermarks = await self._load_watermarks(lock_conn)
+                if "job_posts" not in watermarks:
+                    return {"rebuilt_users": await self._rebuild(pool)}
+
+                changed = {}
+                for source in FEEDS:
+                    changed[source], changed[f"{source}_mark"] = await self._changes(
+                        lock_conn, source, watermarks.get(source, watermarks["job_posts"])
+                    )
+                users = sorted(set(changed["user_profile"]) | set(changed["skills"]))
+                if users:
+                    await self.refresh_users(pool, users)
+                reranked = await self.apply_post_changes(pool, changed["job_posts"]) if changed["job_posts"] else 0
+                for source in FEEDS:
+                    await self._save_watermark(lock_conn, source, changed[f"{source}_mark"])
+                self.last_refresh = time.time()
+                return {"posts": len(changed["job_posts"]), "profiles": len(users), "reranked_users": reranked}
+            finally:
+                await lock_conn.execute("SELECT pg_advisory_unlock($1)", REFRESH_LOCK_ID)
+
+    def start_refresh(self, pool: Pool, interval: float) -> None:
+        self._refresh_task = asyncio.create_task(self._refresh_loop(pool, interval))
+
+    async def stop_refresh(self) -> None:
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _refresh_loop(self, pool: Pool, interval: float) -> None:
+        while True:
+            try:
+                await self.refresh(pool)
+            except Exception as e:
+                errors.inc("recommendation_refresh", type(e).__name__)
+                logger.error(f"Recommendation refresh failed: {e}")
+            await asyncio.sleep(interval)
+
+    # --- Reading ---
+
+    async def get(self, pool: Pool, user_id: str, limit: int) -> list[dict]:
+        """
+        The user's recommendations, best first, at most `per_user`: [{"job_id", "title", "reasons"}].
+        A profile created since the last refresh is ranked on the spot.
+        """
+        limit = min(limit, self.per_user)
+        started = time.perf_counter()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(READ, user_id, limit)
+            if not rows and not await conn.fetchval("SELECT 1 FROM recommendation_profiles WHERE user_id = $1", user_id):
+                rows = None
+        if rows is None:
+            await self.refresh_users(pool, [user_id])
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(READ, user_id, limit)
+        read_seconds.observe(time.perf_counter() - started)
+        return [{"job_id": row["job_id"], "title": row["title"], "reasons": list(row["reasons"])} for row in rows]
+
+    def stats(self) -> dict:
+        return {
+            "per_user": self.per_user,
+            "headroom": self.headroom,
+            "candidates": self.candidates,
+            "rebuilds": self.rebuilds,
+            "last_rebuild_seconds": None if self.last_rebuild_seconds is None else round(self.last_rebuild_seconds, 1),
+            "posts_merged": self.posts_merged,
+            "users_refreshed": self.users_refreshed,
+            "last_refresh_age_s": None if self.last_refresh is None else round(time.time() - self.last_refresh, 1),
+        }
+
+
+recommendations = RecommendationEngine(
+    settings.recommendations_per_user, settings.recommendations_headroom, settings.recommendations_candidates
+)
+
+
+if __name__ == "__main__":
+    # python -m src.services.recommendations [rebuild|refresh], against DB_URL.
+    # Run rebuild nightly: it also clears deleted profiles, which the change feed can't see.
+    import sys
+
+    import asyncpg
+
+    async def main(mode: str) -> None:
+        pool = await asyncpg.create_pool(dsn=settings.db_url, min_size=1, max_size=6)
+        try:
+            if mode == "rebuild":
+                print(f"rebuilt {await recommendations.rebuild(pool)} users in {recommendations.last_rebuild_seconds:.1f}s")
+            else:
+                print(await recommendations.refresh(pool) or "another worker holds the refresh lock")
+        finally:
+            await pool.close()
+
+    mode = sys.argv[1] if len(sys.argv) > 1 else "refresh"
+    if mode not in ("rebuild", "refresh"):
+        sys.exit("usage: python -m src.services.recommendations [rebuild|refresh]")
+    asyncio.run(main(mode))
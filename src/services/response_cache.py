@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, Protocol
+
+from asyncpg.pool import Pool
+from pydantic_ai.messages import ModelMessage
+
+from src.core.config import settings
+from src.schemas.user import UserProfile
+
+logger = logging.getLogger("uvicorn.error")
+
+# Profile fields that change what the agent answers: the greeting and the
+# personalised search filters. Anything else (bio, last name) doesn't split the cache.
+CACHE_PROFILE_FIELDS = ("first_name", "role", "city", "country", "skills", "availability")
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    response: dict
+    messages: list[ModelMessage]
+    stored_at: float
+    generation: int
+    # Fresh hits so far, carried over when a stale entry is refreshed
+    hits: int = 0
+
+
+class ResponseCacheBackend(Protocol):
+    """Storage for cached responses. Async so a shared store can be dropped in later."""
+
+    async def get(self, key: str) -> Optional[CachedResponse]: ...
+
+    async def set(self, key: str, entry: CachedResponse) -> None: ...
+
+    async def delete(self, key: str) -> None: ...
+
+    async def clear(self) -> None: ...
+
+    def size(self) -> int: ...
+
+
+class InMemoryLRUBackend:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry:
+            self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CachedResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+def normalize_message(message: str) -> str:
+    message = re.sub(r"\s+", " ", message.strip().lower())
+    return message.rstrip(".!?")
+
+
+class ResponseCache:
+    """
+    Exact-match cache of final chat responses, keyed on the normalised message
+    and a hash of the profile fields the answer depends on.
+
+    Entries are fresh for `ttl` seconds, or until new job posts land (the job
+    freshness watcher bumps the generation), when they are dropped. An entry
+    that merely outlived its ttl, and has had at least `stale_min_hits` fresh
+    hits, may still be served for `stale_ttl` seconds while one background run
+    refreshes it; the rest are misses.
+    """
+
+    def __init__(self, backend: ResponseCacheBackend, ttl: float, stale_ttl: float, stale_min_hits: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stale_min_hits = stale_min_hits
+        self.generation = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self._jobs_version = None
+        self._watch_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def key_for(user_message: str, user_profile: UserProfile) -> str:
+        profile = {name: getattr(user_profile, name) for name in CACHE_PROFILE_FIELDS}
+        profile_hash = hashlib.sha256(json.dumps(profile, sort_keys=True).encode()).hexdigest()[:16]
+        return f"{profile_hash}:{normalize_message(user_message)}"
+
+    async def get(
+        self,
+        key: str,
+        refresh: Callable[[], Awaitable[tuple[dict, list[ModelMessage]]]],
+    ) -> Optional[CachedResponse]:
+        entry = await self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.generation != self.generation:
+            # Job posts changed since it was stored: the answer may be missing jobs
+            await self.backend.delete(key)
+            self.misses += 1
+            return None
+
+        age = time.monotonic() - entry.stored_at
+        if age < self.ttl:
+            entry.hits += 1
+            self.hits += 1
+            return entry
+        if age < self.ttl + self.stale_ttl and entry.hits >= self.stale_min_hits:
+            self.stale_hits += 1
+            self._revalidate(key, entry, refresh)
+            return entry
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, response: dict, messages: list[ModelMessage]) -> None:
+        await self.backend.set(key, CachedResponse(response, messages, time.monotonic(), self.generation))
+
+    def _revalidate(
+        self,
+        key: str,
+        entry: CachedResponse,
+        refresh: Callable[[], Awaitable[tuple[dict, list[ModelMessage]]]],
+    ) -> None:
+        if key in self._refreshing:
+            return
+
+        async def run():
+            # The generation the answer is computed under, in case posts land while it runs
+            generation = self.generation
+            try:
+                response, messages = await refresh()
+                if response["response_type"] != "error":
+                    await self.backend.set(
+                        key, CachedResponse(response, messages, time.monotonic(), generation, entry.hits)
+                    )
+            except Exception as e:
+                logger.error(f"Response cache refresh failed: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(run())
+
+    # --- Job freshness ---
+
+    def start_freshness_watch(self, pool: Pool, interval: float) -> None:
+        self._watch_task = asyncio.create_task(self._watch_jobs(pool, interval))
+
+    async def stop_freshness_watch(self) -> None:
+        if self._watch_task:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch_jobs(self, pool: Pool, interval: float) -> None:
+        while True:
+            try:
+                async with pool.acquire() as conn:
+                    version = await conn.fetchval("SELECT max(updated_at) FROM job_posts")
+                if self._jobs_version is not None and version != self._jobs_version:
+                    # New or changed posts: every cached answer may now be missing jobs
+                    self.generation += 1
+                self._jobs_version = version
+            except Exception as e:
+                logger.error(f"Response cache freshness check failed: {e}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "size": self.backend.size(),
+            "generation": self.generation,
+            "refreshing": len(self._refreshing),
+        }
+
+
+response_cache = ResponseCache(
+    InMemoryLRUBackend(settings.response_cache_size),
+    ttl=settings.response_cache_ttl,
+    stale_ttl=settings.response_cache_stale_ttl,
+    stale_min_hits=settings.response_cache_stale_min_hits,
+)
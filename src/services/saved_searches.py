@@ -0,0 +1,460 @@
+import asyncio
+import json
+import logging
+import time
+from bisect import bisect_right
+from typing import Mapping, Optional
+
+from asyncpg.pool import Pool
+
+from src.core.config import settings
+from src.core.metrics import errors, registry
+from src.db.job_search import FILTER_NAMES
+from src.dependencies.tools import sql_filters
+from src.services.dimension_cache import dimension_cache
+
+logger = logging.getLogger("uvicorn.error")
+
+match_seconds = registry.histogram("saved_search_match_seconds", "Matching one batch of changed posts against saved searches").labels()
+
+# Arbitrary key for pg_try_advisory_lock, so one worker matches each round
+MATCH_LOCK_ID = 7_341_207
+
+# Lower bounds of the salary buckets. A salary's bucket is the number of bounds at or below it.
+SALARY_BUCKETS = (0, 1_000, 2_000, 5_000, 10_000, 20_000, 50_000, 100_000, 200_000, 500_000, 1_000_000)
+
+# Dimension filters: (filter and key prefix, job_posts column, saved_searches column)
+DIMENSIONS = (
+    ("city", "city_id", "city_ids"),
+    ("country", "country_id", "country_ids"),
+    ("job_type", "job_type_id", "job_type_ids"),
+    ("job_category", "category_id", "category_ids"),
+    ("currency", "currency_id", "currency_ids"),
+)
+_POST_COLUMNS = {name: column for name, column, _ in DIMENSIONS}
+# The filters a search can be indexed under, in the order they're picked: the ones
+# matching the fewest posts first. A city or category each cover a few percent of
+# posts; a title's first three letters, then a country, job type or currency, more.
+ANCHOR_ORDER = ("city", "job_category", "title", "country", "job_type", "currency", "min_salary", "max_salary")
+# Filters a post has many keys for: every three letters of its title, and every
+# salary bucket it satisfies. Two of them are never paired, or a post would have
+# hundreds of keys more.
+MANY_KEYS = ("title", "min_salary", "max_salary")
+
+UPSERT_SEARCH = f"""
+    INSERT INTO saved_searches (
+        user_id, filters, title_pattern, keywords, min_salary, max_salary,
+        {", ".join(column for _, _, column in DIMENSIONS)}
+    )
+    VALUES ($1, $2::jsonb, $3, websearch_to_tsquery('english', $4), $5, $6, $7, $8, $9, $10, $11)
+    ON CONFLICT (user_id, filters) DO UPDATE SET
+        title_pattern = EXCLUDED.title_pattern,
+        keywords = EXCLUDED.keywords,
+        min_salary = EXCLUDED.min_salary,
+        max_salary = EXCLUDED.max_salary,
+        {", ".join(f"{column} = EXCLUDED.{column}" for _, _, column in DIMENSIONS)},
+        last_used_at = now()
+    RETURNING id
+"""
+
+# Dimension IDs can resolve differently after the dimension tables change, so the keys are rewritten
+REPLACE_KEYS = """
+    WITH dropped AS (DELETE FROM saved_search_keys WHERE search_id = $1 AND key <> ALL($2::text[]))
+    INSERT INTO saved_search_keys (key, search_id) SELECT unnest($2::text[]), $1
+    ON CONFLICT (key, search_id) DO NOTHING
+"""
+
+TRIM_USER = """
+    DELETE FROM saved_searches s
+    USING (
+        SELECT id, row_number() OVER (ORDER BY last_used_at DESC, id DESC) AS rank
+        FROM saved_searches
+        WHERE user_id = $1
+    ) ranked
+    WHERE s.id = ranked.id AND ranked.rank > $2
+"""
+
+# The get_jobs filters of a saved search `s` checked against a post `p`, as the search statements apply them
+MATCH_CONDITIONS_SQL = "\n      AND ".join([
+    "(s.title_pattern IS NULL OR p.title LIKE s.title_pattern)",
+    "(s.keywords IS NULL OR p.search_vector @@ s.keywords)",
+    '(s.min_salary IS NULL OR p."MaxSalary" >= s.min_salary)',
+    '(s.max_salary IS NULL OR p."MinSalary" <= s.max_salary)',
+    *(f"(s.{ids} IS NULL OR p.{column} = ANY(s.{ids}))" for _, column, ids in DIMENSIONS),
+])
+
+CHANGED_POSTS_SQL = """
+    SELECT p.id, lower(p.title) AS title, p.search_vector, p."MinSalary", p."MaxSalary",
+           p.city_id, p.country_id, p.job_type_id, p.category_id, p.currency_id
+    FROM job_posts p
+    WHERE p.id = ANY($1::text[]) AND p."IsAccepting"
+"""
+
+# The saved searches a batch of changed posts match: those under a key a post has
+# (given as parallel job ID and key arrays, see match_args), checked. The work grows
+# with the searches sharing a key with a post, not with the number saved.
+MATCHES_SQL = f"""
+    WITH posts AS MATERIALIZED ({CHANGED_POSTS_SQL})
+    SELECT s.id AS search_id, p.id AS job_id, s.user_id
+    FROM unnest($2::text[], $3::text[]) AS post_keys (job_id, key)
+    JOIN saved_search_keys k ON k.key = post_keys.key
+    JOIN saved_searches s ON s.id = k.search_id
+    JOIN posts p ON p.id = post_keys.job_id
+    WHERE {MATCH_CONDITIONS_SQL}
+"""
+
+# The key arrays are planned for each call: a generic plan, blind to their size,
+# can pick a full scan of saved_searches. A batch's sorts and hashes of candidates
+# spill to disk at the default work_mem.
+MATCH_SETTINGS = "SET LOCAL plan_cache_mode = force_custom_plan; SET LOCAL work_mem = '32MB'"
+
+MATCH_POSTS = f"""
+    INSERT INTO saved_search_notifications (search_id, job_id, user_id)
+    {MATCHES_SQL}
+    ON CONFLICT (search_id, job_id) DO NOTHING
+    RETURNING user_id
+"""
+
+READ_NOTIFICATIONS = """
+    SELECT n.job_id, j.title, array_agg(n.search_id ORDER BY n.search_id) AS search_ids, max(n.matched_at) AS matched_at
+    FROM saved_search_notifications n
+    JOIN job_posts j ON j.id = n.job_id AND j."IsAccepting"
+    WHERE n.user_id = $1 AND n.seen_at IS NULL
+    GROUP BY n.job_id, j.title
+    ORDER BY matched_at DESC, n.job_id
+    LIMIT $2
+"""
+
+MARK_SEEN = """
+    UPDATE saved_search_notifications SET seen_at = now()
+    WHERE user_id = $1 AND job_id = ANY($2::text[]) AND seen_at IS NULL
+"""
+
+READ_SEARCHES = """
+    SELECT s.id, s.filters, s.created_at, s.last_used_at,
+           (SELECT count(*) FROM saved_search_notifications n WHERE n.search_id = s.id AND n.seen_at IS NULL) AS unseen
+    FROM saved_searches s
+    WHERE s.user_id = $1
+    ORDER BY s.last_used_at DESC, s.id DESC
+"""
+
+
+def saved_filters(search: dict) -> dict:
+    """
+    The get_jobs filters of `search` that are set. Text filters match case-insensitively, so they're
+    lowercased. A blank one is kept as given rather than collapsed to "", which would read as unset.
+    """
+    return {
+        name: (" ".join(value.lower().split()) or value) if isinstance(value, str) else value
+        for name in FILTER_NAMES
+        if (value := search.get(name)) is not None and value != ""
+    }
+
+
+def saved_row(filters: dict) -> Optional[dict]:
+    """
+    The saved_searches columns for get_jobs `filters`, or None when a dimension
+    filter matches no live row in its lookup table, so no post can match.
+    """
+    resolved = sql_filters(**filters)
+    if resolved is None:
+        return None
+    row = {
+        "title_pattern": resolved["title"].lower() if resolved["title"] else None,
+        "keywords": resolved["keywords"],
+        "min_salary": resolved["min_salary"],
+        "max_salary": resolved["max_salary"],
+    }
+    for name, _, column in DIMENSIONS:
+        row[column] = sorted(resolved[name]) if resolved.get(name) else None
+    return row
+
+
+def _pairable(first: str, second: str) -> bool:
+    return first not in MANY_KEYS or second not in MANY_KEYS
+
+
+def index_keys(row: dict) -> list[str]:
+    """
+    The saved_search_keys a search is stored under: the keys of the first of
+    its filters in ANCHOR_ORDER paired with those of the next one it can be
+    paired with, e.g. "city:city_006&title:act", or else of the first alone.
+    A post can only match the search if it has one of those keys, and
+    post_keys gives a post every key it has, so its keys find every search it
+    can match. Searches with nothing else than keywords, or a title with LIKE
+    wildcards or under three letters, go under "any" and are checked against
+    every post.
+    """
+    columns = {name: column for name, _, column in DIMENSIONS}
+    anchors = []
+    for name in ANCHOR_ORDER:
+        if name == "title":
+            title = row["title_pattern"][1:-1] if row["title_pattern"] else ""
+            if len(title) >= 3 and "%" not in title and "_" not in title:
+                anchors.append((name, [f"title:{title[:3]}"]))
+        elif name == "min_salary" and row["min_salary"] is not None:
+            # Posts have the buckets from 1 up to their MaxSalary's
+            anchors.append((name, [f"min_salary:{max(1, bisect_right(SALARY_BUCKETS, row['min_salary']))}"]))
+        elif name == "max_salary" and row["max_salary"] is not None:
+            anchors.append((name, [f"max_salary:{bisect_right(SALARY_BUCKETS, row['max_salary'])}"]))
+        elif name in columns and row[columns[name]]:
+            anchors.append((name, [f"{name}:{dim_id}" for dim_id in row[columns[name]]]))
+    if not anchors:
+        return ["any"]
+    first_name, first = anchors[0]
+    for name, second in anchors[1:]:
+        if _pairable(first_name, name):
+            return [f"{a}&{b}" for a in first for b in second]
+    return first
+
+
+def post_keys(post: Mapping) -> list[str]:
+    """
+    Every key a search matching `post`, a CHANGED_POSTS_SQL row, can be indexed
+    under: "any", its dimension IDs, the three-letter runs of its title and the
+    salary buckets a min_salary or max_salary it satisfies falls in, alone and
+    as pairs in ANCHOR_ORDER.
+    """
+    anchors = []
+    for name in ANCHOR_ORDER:
+        if name == "title":
+            title = post["title"] or ""
+            anchors += [(name, f"title:{run}") for run in sorted({title[i:i + 3] for i in range(len(title) - 2)})]
+        elif name == "min_salary" and post["MaxSalary"] is not None:
+            anchors += [(name, f"min_salary:{b}") for b in range(1, bisect_right(SALARY_BUCKETS, post["MaxSalary"]) + 1)]
+        elif name == "max_salary" and post["MinSalary"] is not None:
+            low = bisect_right(SALARY_BUCKETS, post["MinSalary"])
+            anchors += [(name, f"max_salary:{b}") for b in range(low, len(SALARY_BUCKETS) + 1)]
+        elif name not in MANY_KEYS and post[_POST_COLUMNS[name]] is not None:
+            anchors.append((name, f"{name}:{post[_POST_COLUMNS[name]]}"))
+    keys = ["any", *(key for _, key in anchors)]
+    for i, (first_name, first) in enumerate(anchors):
+        keys += [
+            f"{first}&{second}"
+            for second_name, second in anchors[i + 1:]
+            if second_name != first_name and _pairable(first_name, second_name)
+        ]
+    return keys
+
+
+def match_args(posts: list[Mapping]) -> tuple[list[str], list[str], list[str]]:
+    """MATCHES_SQL's arguments for CHANGED_POSTS_SQL rows: their IDs, then each of their keys and its post's ID."""
+    job_ids, keys = [], []
+    for post in posts:
+        for key in post_keys(post):
+            job_ids.append(post["id"])
+            keys.append(key)
+    return [post["id"] for post in posts], job_ids, keys
+
+
+def _chunks(items: list, size: int) -> list[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class SavedSearches:
+    """
+    Saves the get_jobs searches users run, and tells them about posts matching
+    those searches that were added or changed since, so "what's new" needs
+    neither the model nor a search.
+
+    Matching follows job_posts.updated_at. Instead of running every saved search
+    against the changed posts, each search is indexed under the keys of two of
+    its filters, or one (see index_keys): a city, category, job type, country or
+    currency ID, three letters of the title, or a salary bucket. A changed post looks up
+    the searches under the keys it has, checks their remaining filters, and
+    records every match in saved_search_notifications, once per search and post.
+    """
+
+    def __init__(self, per_user: int, batch_size: int = 500):
+        self.per_user = per_user
+        self.batch_size = batch_size
+        self.searches_saved = 0
+        self.posts_matched = 0
+        self.notifications_added = 0
+        self.last_refresh: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    # --- Saving ---
+
+    async def save(self, pool: Pool, user_id: str, searches: list[dict]) -> int:
+        """
+        Saves the user's searches, given as get_jobs filters, or marks them used
+        again; beyond `per_user` the least recently used are dropped. Searches
+        without filters, or that can't match anything, are skipped. Returns the
+        number saved.
+        """
+        await dimension_cache.ensure_fresh(pool)
+        rows = []
+        for search in searches:
+            filters = saved_filters(search)
+            row = saved_row(filters) if filters else None
+            if row is not None:
+                rows.append((json.dumps(filters, sort_keys=True), row))
+        if not rows:
+            return 0
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                for filters, row in rows:
+                    search_id = await conn.fetchval(UPSERT_SEARCH, user_id, filters, *row.values())
+                    await conn.execute(REPLACE_KEYS, search_id, index_keys(row))
+                await conn.execute(TRIM_USER, user_id, self.per_user)
+        self.searches_saved += len(rows)
+        return len(rows)
+
+    async def save_safely(self, pool: Pool, user_id: str, searches: list[dict]) -> None:
+        # Runs after the response is sent; a failed write must never fail the chat
+        try:
+            await self.save(pool, user_id, searches)
+        except Exception as e:
+            errors.inc("saved_search_save", type(e).__name__)
+            logger.error(f"Error saving searches for user_id {user_id}: {e}")
+
+    # --- Matching ---
+
+    async def match_posts(self, pool: Pool, job_ids: list[str]) -> int:
+        """Records the saved searches these posts now match. Returns the number of new notifications."""
+        added = 0
+        for batch in _chunks(list(job_ids), self.batch_size):
+            started = time.perf_counter()
+            async with pool.acquire() as conn:
+                posts = await conn.fetch(CHANGED_POSTS_SQL, batch)
+                if posts:
+                    async with conn.transaction():
+                        await conn.execute(MATCH_SETTINGS)
+                        added += len(await conn.fetch(MATCH_POSTS, *match_args(posts)))
+            match_seconds.observe(time.perf_counter() - started)
+        self.posts_matched += len(job_ids)
+        self.notifications_added += added
+        return added
+
+    async def refresh(self, pool: Pool) -> Optional[dict]:
+        """
+        Matches the posts changed since the last refresh. The first refresh only
+        sets the starting point: posts from before it never notify. Returns None
+        when another worker holds the lock.
+        """
+        async with pool.acquire() as lock_conn:
+            if not await lock_conn.fetchval("SELECT pg_try_advisory_lock($1)", MATCH_LOCK_ID):
+                return None
+            try:
+                watermark = await lock_conn.fetchval(
+                    "SELECT updated_at FROM saved_search_watermarks WHERE source = 'job_posts'"
+                )
+                if watermark is None:
+                    high = await lock_conn.fetchval("SELECT max(updated_at) FROM job_posts")
+                    posts = []
+                else:
+                    # >= so rows committed late with the watermark's timestamp are not missed;
+                    # matching a post again adds nothing, so those at the watermark are simply redone
+                    rows = await lock_conn.fetch(
+                        "SELECT id, updated_at FROM job_posts WHERE updated_at >= $1 ORDER BY updated_at", watermark
+                    )
+                    high = max((row["updated_at"] for row in rows), default=watermark)
+                    posts = [row["id"] for row in rows]
+                added = await self.match_posts(pool, posts) if posts else 0
+                if high is not None:
+                    await lock_conn.execute(
+                        """
+                        INSERT INTO saved_search_watermarks (source, updated_at) VALUES ('job_posts', $1)
+                        ON CONFLICT (source) DO UPDATE SET updated_at = GREATEST(saved_search_watermarks.updated_at, EXCLUDED.updated_at)
+                        """,
+                        high,
+                    )
+                self.last_refresh = time.time()
+                return {"posts": len(posts), "notifications": added}
+            finally:
+                await lock_conn.execute("SELECT pg_advisory_unlock($1)", MATCH_LOCK_ID)
+
+    def start_refresh(self, pool: Pool, interval: float) -> None:
+        self._refresh_task = asyncio.create_task(self._refresh_loop(pool, interval))
+
+    async def stop_refresh(self) -> None:
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _refresh_loop(self, pool: Pool, interval: float) -> None:
+        while True:
+            try:
+                await self.refresh(pool)
+            except Exception as e:
+                errors.inc("saved_search_refresh", type(e).__name__)
+                logger.error(f"Saved search refresh failed: {e}")
+            await asyncio.sleep(interval)
+
+    # --- Reading ---
+
+    async def searches(self, pool: Pool, user_id: str) -> list[dict]:
+        """The user's saved searches, most recently used first, with their unseen notification counts."""
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(READ_SEARCHES, user_id)
+        return [
+            {
+                "search_id": row["id"],
+                "filters": json.loads(row["filters"]),
+                "created_at": row["created_at"].isoformat(),
+                "last_used_at": row["last_used_at"].isoformat(),
+                "unseen": row["unseen"],
+            }
+            for row in rows
+        ]
+
+    async def delete(self, pool: Pool, user_id: str, search_id: int) -> bool:
+        async with pool.acquire() as conn:
+            deleted = await conn.fetchval(
+                "DELETE FROM saved_searches WHERE id = $1 AND user_id = $2 RETURNING id", search_id, user_id
+            )
+        return deleted is not None
+
+    async def notifications(self, pool: Pool, user_id: str, limit: int, mark_seen: bool = True) -> list[dict]:
+        """
+        Open posts matching the user's saved searches that they haven't seen, newest
+        match first: [{"job_id", "title", "search_ids", "matched_at"}]. A post
+        matching several searches is listed once. With `mark_seen` they are not
+        returned again.
+        """
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await conn.fetch(READ_NOTIFICATIONS, user_id, limit)
+                if mark_seen and rows:
+                    await conn.execute(MARK_SEEN, user_id, [row["job_id"] for row in rows])
+        return [
+            {
+                "job_id": row["job_id"],
+                "title": row["title"],
+                "search_ids": list(row["search_ids"]),
+                "matched_at": row["matched_at"].isoformat(),
+            }
+            for row in rows
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "per_user": self.per_user,
+            "searches_saved": self.searches_saved,
+            "posts_matched": self.posts_matched,
+            "notifications_added": self.notifications_added,
+            "last_refresh_age_s": None if self.last_refresh is None else round(time.time() - self.last_refresh, 1),
+        }
+
+
+saved_searches = SavedSearches(settings.saved_searches_per_user)
+
+
+if __name__ == "__main__":
+    # python -m src.services.saved_searches, against DB_URL: one refresh round
+    import asyncpg
+
+    async def main() -> None:
+        pool = await asyncpg.create_pool(dsn=settings.db_url, min_size=1, max_size=2)
+        try:
+            await dimension_cache.load(pool)
+            print(await saved_searches.refresh(pool) or "another worker holds the refresh lock")
+        finally:
+            await pool.close()
+
+    asyncio.run(main())
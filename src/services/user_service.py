@@ -1,30 +1,43 @@
 import asyncpg
+import time
 from typing import Optional
 import logging
+from src.core.metrics import errors, registry
 from src.schemas.user import UserProfile
+from src.services.dimension_cache import dimension_cache
+from src.services.profile_cache import profile_cache
 
 logger = logging.getLogger("uvicorn.error")
 
+profile_fetch_seconds = registry.histogram(
+    "profile_fetch_seconds", "get_user_profile, profile cache hits included"
+).labels()
+
 async def get_user_profile(user_id: str, pool: asyncpg.pool.Pool) -> Optional[UserProfile]:
+    started = time.perf_counter()
+    try:
+        return await profile_cache.get(user_id, lambda: fetch_user_profile(user_id, pool))
+    finally:
+        profile_fetch_seconds.observe(time.perf_counter() - started)
+
+async def fetch_user_profile(user_id: str, pool: asyncpg.pool.Pool) -> Optional[UserProfile]:
+    await dimension_cache.ensure_fresh(pool)
     async with pool.acquire() as conn:
-        # This query is updated to join job_role and aggregate skills
+        # Dimension names come from the in-memory cache, so only skills need joining
         query = """
             SELECT
                 COALESCE(up."firstName", '') as first_name,
                 COALESCE(up."lastName", '') as last_name,
                 COALESCE(up."Availability", '') as availability,
                 COALESCE(up."Bio", '') as bio,
-                COALESCE(jr.name, '') as role,
-                COALESCE(c.name, 'Not specified') as city,
-                COALESCE(co.name, 'Not specified') as country,
+                up.job_role_id,
+                up.city_id,
+                up.country_id,
                 ARRAY_AGG(s.name) FILTER (WHERE s.name IS NOT NULL) as skills
             FROM user_profile up
-            LEFT JOIN city c ON up.city_id = c.id
-            LEFT JOIN country co ON up.country_id = co.id
-            LEFT JOIN job_role jr ON up.job_role_id = jr.id
             LEFT JOIN skills s ON up.id = s.user_profile_id
             WHERE up.user_id = $1
-            GROUP BY up.id, jr.name, c.name, co.name
+            GROUP BY up.id
             LIMIT 1
         """
 
@@ -34,8 +47,47 @@ async def get_user_profile(user_id: str, pool: asyncpg.pool.Pool) -> Optional[Us
                 profile_data = dict(row)
                 # Ensure 'skills' is an empty list if the user has no skills, instead of None
                 profile_data['skills'] = profile_data['skills'] or []
+                profile_data['role'] = dimension_cache.name("job_role", profile_data.pop('job_role_id')) or ''
+                profile_data['city'] = dimension_cache.name("city", profile_data.pop('city_id')) or 'Not specified'
+                profile_data['country'] = dimension_cache.name("country", profile_data.pop('country_id')) or 'Not specified'
                 return UserProfile(**profile_data)
             return None
         except Exception as e:
+            errors.inc("profile_fetch", type(e).__name__)
             logger.error(f"Error fetching user profile for user_id {user_id}: {e}")
-            return None
\ No newline at end of file
+            return None
+
+async def get_user_profiles(user_ids: list[str], pool: asyncpg.pool.Pool) -> dict[str, UserProfile]:
+    """
+    Profiles for many users in one query, keyed by user_id. Users without a profile are left out.
+    """
+    await dimension_cache.ensure_fresh(pool)
+    query = """
+        SELECT
+            up.user_id,
+            COALESCE(up."firstName", '') as first_name,
+            COALESCE(up."lastName", '') as last_name,
+            COALESCE(up."Availability", '') as availability,
+            COALESCE(up."Bio", '') as bio,
+            up.job_role_id,
+            up.city_id,
+            up.country_id,
+            ARRAY_AGG(s.name) FILTER (WHERE s.name IS NOT NULL) as skills
+        FROM user_profile up
+        LEFT JOIN skills s ON up.id = s.user_profile_id
+        WHERE up.user_id = ANY($1::text[])
+        GROUP BY up.id
+    """
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(query, list(set(user_ids)))
+
+    profiles = {}
+    for row in rows:
+        profile_data = dict(row)
+        user_id = profile_data.pop('user_id')
+        profile_data['skills'] = profile_data['skills'] or []
+        profile_data['role'] = dimension_cache.name("job_role", profile_data.pop('job_role_id')) or ''
+        profile_data['city'] = dimension_cache.name("city", profile_data.pop('city_id')) or 'Not specified'
+        profile_data['country'] = dimension_cache.name("country", profile_data.pop('country_id')) or 'Not specified'
+        profiles[user_id] = UserProfile(**profile_data)
+    return profiles
@@ -0,0 +1,113 @@
+# Admission control under a spike, fully offline: fake agent runs of a fixed
+# duration go through an AdmissionController the way run_chat's do. Scenarios:
+#
+#   fairness   one user queues a large burst just before light users send a few
+#              requests each: the queue serves users round-robin, so the light
+#              users aren't stuck behind the whole burst
+#   burst      a user over their request bucket gets 429 with a Retry-After
+#   overload   more concurrent users than slots and queue: the overflow is shed
+#              straight away with 503, and admitted requests wait less than the deadline
+#   tokens     a user whose runs use more LLM tokens than their per-minute
+#              budget is turned away (429) until it refills
+#
+#   python -m src.tests.admission_test
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+from src.services.admission import AdmissionController, AdmissionRejected
+
+
+def controller(**overrides) -> AdmissionController:
+    config = dict(
+        max_in_flight=4, max_queue=16, queue_timeout=1.0,
+        requests_per_minute=60, request_burst=5, tokens_per_minute=60000, token_burst=60000,
+    )
+    return AdmissionController(**{**config, **overrides})
+
+
+async def fake_run(admission: AdmissionController, user_id: str, seconds: float, tokens: int, outcomes: Counter, waits: dict) -> None:
+    started = time.perf_counter()
+    try:
+        async with admission.admit(user_id) as admitted:
+            waits.setdefault(user_id, []).append(time.perf_counter() - started)
+            await asyncio.sleep(seconds)
+            admitted.tokens_used = tokens
+        outcomes[(user_id, "ok")] += 1
+    except AdmissionRejected as e:
+        assert e.retry_after_header().isdigit() and int(e.retry_after_header()) >= 1
+        outcomes[(user_id, e.status_code)] += 1
+
+
+async def fairness(run_seconds: float) -> None:
+    admission = controller(request_burst=30, max_queue=64, queue_timeout=100 * run_seconds)
+    outcomes, waits = Counter(), {}
+    runs = [fake_run(admission, "heavy", run_seconds, 500, outcomes, waits) for _ in range(30)]
+    runs += [fake_run(admission, f"light-{i}", run_seconds, 500, outcomes, waits) for i in range(8) for _ in range(2)]
+    await asyncio.gather(*runs)
+
+    light_waits = [wait for user, user_waits in waits.items() if user != "heavy" for wait in user_waits]
+    print(
+        f"fairness   served={sum(outcomes.values())}/46  light wait max={max(light_waits) * 1000:.0f}ms  "
+        f"heavy wait p50={statistics.median(waits['heavy']) * 1000:.0f}ms max={max(waits['heavy']) * 1000:.0f}ms"
+    )
+    assert sum(outcomes.values()) == outcomes[("heavy", "ok")] + len(light_waits) == 46, outcomes
+    # First in, first out would have every light request wait for the whole burst (~0.7s at 100ms runs)
+    assert max(light_waits) < statistics.median(waits["heavy"]), waits
+    assert admission.in_flight == 0 and admission.queued == 0
+
+
+async def burst(run_seconds: float) -> None:
+    admission = controller()
+    outcomes, waits = Counter(), {}
+    await asyncio.gather(*(fake_run(admission, "bursty", run_seconds, 500, outcomes, waits) for _ in range(12)))
+    print(f"burst      ok={outcomes[('bursty', 'ok')]} 429={outcomes[('bursty', 429)]}")
+    # The bucket holds request_burst requests; the rest are refused without queueing
+    assert outcomes[("bursty", "ok")] == 5 and outcomes[("bursty", 429)] == 7, outcomes
+
+
+async def overload(run_seconds: float) -> None:
+    admission = controller(queue_timeout=10 * run_seconds)
+    outcomes, waits = Counter(), {}
+    await asyncio.gather(*(fake_run(admission, f"user-{i}", run_seconds, 500, outcomes, waits) for i in range(60)))
+
+    waits = [wait for user_waits in waits.values() for wait in user_waits]
+    ok = sum(n for (_, result), n in outcomes.items() if result == "ok")
+    shed = sum(n for (_, result), n in outcomes.items() if result == 503)
+    print(
+        f"overload   ok={ok} 503={shed}  queue wait p50={statistics.median(waits) * 1000:.0f}ms "
+        f"max={max(waits) * 1000:.0f}ms (deadline {admission.queue_timeout * 1000:.0f}ms)"
+    )
+    # 4 slots + 16 queued; everyone past that is shed without waiting
+    assert ok == 20 and shed == 40, outcomes
+    assert max(waits) < admission.queue_timeout
+    assert admission.in_flight == 0 and admission.queued == 0
+
+
+async def tokens(run_seconds: float) -> None:
+    # 3000 tokens a minute, and every run uses 2500
+    admission = controller(tokens_per_minute=3000, token_burst=3000, request_burst=100)
+    admission.avg_run_tokens = 1000
+    outcomes, waits = Counter(), {}
+    for _ in range(4):
+        await fake_run(admission, "chatty", run_seconds, 2500, outcomes, waits)
+    print(f"tokens     ok={outcomes[('chatty', 'ok')]} 429={outcomes[('chatty', 429)]}")
+    # The first run fits; its actual usage leaves too little for the next reservation
+    assert outcomes[("chatty", "ok")] == 1 and outcomes[("chatty", 429)] == 3, outcomes
+
+
+async def main(run_seconds: float) -> None:
+    await fairness(run_seconds)
+    await burst(run_seconds)
+    await overload(run_seconds)
+    await tokens(run_seconds)
+    print("All admission checks passed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Admission control checks with fake agent runs")
+    parser.add_argument("--run-ms", type=float, default=100, help="duration of each fake agent run")
+    args = parser.parse_args()
+    asyncio.run(main(args.run_ms / 1000))
@@ -1,11 +1,19 @@
+# Interactive CLI for the agent against a real database.
+# Set STUB_MODEL=1 to use the offline stub model from bench_model.py instead of OpenAI.
 import asyncio
-from src.agent import agent, AgentDeps
-from src.db import UserProfile, db_manager
+import os
+
+from src.db.session import db_manager
+from src.schemas.user import UserProfile
+from src.services.chat_service import AgentDeps, get_agent
+from src.services.dimension_cache import dimension_cache
+from src.tests.bench_model import stub_model
 
 async def main():
     # Initialize the DB pool
     await db_manager.init_pool()
     pool = db_manager.get_pool()
+    await dimension_cache.load(pool)
 
     # Create a fake user profile (adjust fields as needed)
     user_profile = UserProfile(
@@ -18,16 +26,16 @@ async def main():
         country="USA"
     )
 
-    # Example user message
-    user_message = "Find me acting jobs in Los Angeles"
-
-    # Acquire a DB connection
-    async with pool.acquire() as conn:
-        deps = AgentDeps(user_profile=user_profile, conn=conn)
+    deps = AgentDeps(user_profile=user_profile, pool=pool)
+    agent = get_agent()
+    if os.environ.get("STUB_MODEL"):
+        with agent.override(model=stub_model()):
+            await agent.to_cli(prog_name="j*b search agent", deps=deps)
+    else:
         await agent.to_cli(prog_name="j*b search agent", deps=deps)
 
     # Close the DB pool
     await db_manager.close_pool()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+# Compares two load_bench.py result files and exits non-zero if any workload's
+# p95/p99 latency or pool wait got worse, or its RPS dropped, by more than the threshold.
+#
+#   python -m src.tests.bench_compare before.json after.json --threshold 10
+import argparse
+import json
+import sys
+
+# (section, metric, True if higher is better)
+METRICS = [
+    (None, "rps", True),
+    (None, "cpu_ms_per_request", False),
+    ("latency_ms", "p50", False),
+    ("latency_ms", "p95", False),
+    ("latency_ms", "p99", False),
+    ("pool_wait_ms", "p95", False),
+    ("pool_wait_ms", "p99", False),
+]
+# Metrics that fail the comparison, the rest are informational
+GATED = {"rps", "latency_ms.p95", "latency_ms.p99", "pool_wait_ms.p99"}
+# Pool waits under this many ms are noise, not regressions
+POOL_WAIT_FLOOR_MS = 1.0
+
+
+def value(workload: dict, section: str | None, metric: str):
+    return workload.get(metric) if section is None else (workload.get(section) or {}).get(metric)
+
+
+def compare(base: dict, new: dict, threshold: float) -> list[str]:
+    regressions = []
+    if base.get("dataset") != new.get("dataset") or base.get("config") != new.get("config"):
+        print("warning: dataset or config differ between runs", file=sys.stderr)
+
+    print(f"{'workload':18} {'metric':18} {'base':>12} {'new':>12} {'change':>9}")
+    for name in sorted(set(base["workloads"]) & set(new["workloads"])):
+        for section, metric, higher_is_better in METRICS:
+            label = metric if section is None else f"{section}.{metric}"
+            before = value(base["workloads"][name], section, metric)
+            after = value(new["workloads"][name], section, metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            worse = -change if higher_is_better else change
+            if section == "pool_wait_ms" and after < POOL_WAIT_FLOOR_MS:
+                worse = 0.0
+            flag = ""
+            if label in GATED and worse > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{name} {label}")
+            print(f"{name:18} {label:18} {before:12.2f} {after:12.2f} {change:+8.1f}%{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diff two load benchmark results")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as file:
+        base = json.load(file)
+    with open(args.new, encoding="utf-8") as file:
+        new = json.load(file)
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print(f"regressed beyond {args.threshold}%: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
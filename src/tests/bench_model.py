@@ -0,0 +1,109 @@
+# Deterministic stand-in for the OpenAI model, used by the load benchmark and
+# agent_test.py. It makes the same kind of get_jobs calls the real model makes
+# for the messages below, waits a configurable time per model request to imitate
+# the provider, and never leaves the process.
+import asyncio
+import random
+import re
+from typing import AsyncIterator, Optional
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, DeltaToolCalls, FunctionModel
+
+# Messages the benchmark sends, with the get_jobs arguments the real model picks
+# for them. "{city}" and "{role}" are filled from the user details in the
+# instructions, the way a personalised search uses the profile. None means the
+# model answers without searching.
+SCENARIOS: list[tuple[str, Optional[dict]]] = [
+    ("Find me acting jobs in Mumbai", {"title": "actor", "city": "Mumbai"}),
+    ("Any voice over work in Mumbai or Delhi?", {"title": "voice", "city": "Mumbai"}),
+    ("Suggest some jobs that fit my profile", {"job_category": "{role}", "city": "{city}"}),
+    ("High paying director roles in Los Angeles", {"title": "director", "city": "Los Angeles", "min_salary": 100000}),
+    ("Part-time work near me", {"job_type": "Part-time", "city": "{city}"}),
+    ("Full-time film jobs in India under 50000", {"job_type": "Full-time", "job_category": "Film Actor", "country": "India", "max_salary": 50000}),
+    ("Is anyone hiring dancers in London?", {"title": "dancer", "city": "London"}),
+    ("How should I prepare for an audition?", None),
+]
+SCENARIO_ARGS = dict(SCENARIOS)
+
+# First line of get_jobs' compact result, e.g. "about 1200 jobs found, showing 10"
+FOUND = re.compile(r"^(?:about )?(\d+) jobs? found")
+USER_DETAIL = re.compile(r"^\s*(\w+)= (.*?),?$", re.MULTILINE)
+
+
+def _prompt_and_details(messages: list[ModelMessage]) -> tuple[str, dict]:
+    prompt, details = "", {}
+    for message in messages:
+        if isinstance(message, ModelRequest):
+            for part in message.parts:
+                if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                    prompt = part.content
+            if message.instructions:
+                details = dict(USER_DETAIL.findall(message.instructions))
+    return prompt, details
+
+
+def search_args(prompt: str, details: dict) -> Optional[dict]:
+    """The get_jobs arguments for a prompt, with profile placeholders filled in."""
+    args = SCENARIO_ARGS.get(prompt)
+    if args is None:
+        return None
+    filled = {}
+    for name, value in args.items():
+        if isinstance(value, str) and value.startswith("{"):
+            value = details.get(value.strip("{}"), "")
+            if not value or value == "Not specified":
+                # Nothing on the profile for this filter, so the model would leave it out
+                continue
+        filled[name] = value
+    return filled
+
+
+def stub_model(latency_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 0) -> FunctionModel:
+    """
+    A FunctionModel that calls get_jobs once for a known search prompt, then
+    writes a short reply from the result. Each model request sleeps for
+    latency_ms plus up to jitter_ms, drawn from a seeded generator. Streaming
+    requests get the same response, with text sent a few words at a time.
+    """
+    rng = random.Random(seed)
+
+    async def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        if latency_ms or jitter_ms:
+            await asyncio.sleep((latency_ms + rng.uniform(0, jitter_ms)) / 1000)
+
+        last = messages[-1]
+        returns = [part for part in last.parts if isinstance(part, ToolReturnPart)]
+        if returns:
+            match = FOUND.search(returns[-1].model_response_str())
+            found = match.group(1) if match else 0
+            return ModelResponse(parts=[TextPart(f"I found {found} jobs that match. Want me to narrow them down?")])
+
+        prompt, details = _prompt_and_details(messages)
+        args = search_args(prompt, details)
+        if args is None:
+            return ModelResponse(parts=[TextPart(
+                "Arrive early, know your lines, and bring a recent headshot. "
+                "Would you like me to look for auditions near you?"
+            )])
+        return ModelResponse(parts=[ToolCallPart(tool_name="get_jobs", args=args)])
+
+    async def stream(messages: list[ModelMessage], info: AgentInfo) -> AsyncIterator[str | DeltaToolCalls]:
+        response = await respond(messages, info)
+        for part in response.parts:
+            if isinstance(part, ToolCallPart):
+                yield {0: DeltaToolCall(name=part.tool_name, json_args=part.args_as_json_str())}
+            else:
+                words = part.content.split(" ")
+                for i in range(0, len(words), 4):
+                    yield " ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "")
+
+    return FunctionModel(respond, stream_function=stream, model_name="bench-stub")
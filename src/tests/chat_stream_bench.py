@@ -0,0 +1,33 @@
+# Time-to-first-byte of /chat vs /chat/stream against a running server
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+async def measure(client: httpx.AsyncClient, path: str, payload: dict) -> tuple[float, float]:
+    start = time.perf_counter()
+    first_byte = None
+    async with client.stream("POST", path, json=payload) as response:
+        async for _ in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+    return first_byte * 1000, (time.perf_counter() - start) * 1000
+
+async def bench(base_url: str, user_id: str, message: str, iterations: int):
+    payload = {"user_id": user_id, "message": message}
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        for path in ("/api/v1/chat", "/api/v1/chat/stream"):
+            samples = [await measure(client, path, payload) for _ in range(iterations)]
+            ttfb = statistics.median(sample[0] for sample in samples)
+            total = statistics.median(sample[1] for sample in samples)
+            print(f"{path:24} ttfb_p50={ttfb:8.1f}ms total_p50={total:8.1f}ms")
+
+if __name__ == "__main__":
+    asyncio.run(bench(
+        os.environ.get("BENCH_BASE_URL", "http://localhost:8000"),
+        os.environ.get("TEST_USER_ID", "usr_bollywood11"),
+        os.environ.get("BENCH_MESSAGE", "Find me acting jobs in Mumbai"),
+        int(os.environ.get("BENCH_ITERATIONS", "5")),
+    ))
@@ -0,0 +1,157 @@
+# Hedged model routing against two local stub servers standing in for OpenAI and
+# Groq (src/tests/stub_model_server.py), so it runs offline. The router is built
+# by build_router_model(), the way the app builds it, with the base URLs pointed
+# at the stubs. Scenarios:
+#
+#   healthy     both providers fast: nothing is hedged, the primary answers everything
+#   slow-tail   a share of primary requests stall: those get hedged and the
+#               secondary wins them, which cuts p99 to about hedge delay + secondary latency
+#   long-reply  the primary starts promptly but takes longer than the hedge delay to
+#               finish: nothing is hedged, since hedging waits for the first chunk only
+#   primary-down  every primary request fails: requests fail over until the breaker
+#               opens, after which the primary is skipped
+#
+# Each scenario runs plain and streamed requests and prints hedge rate, win rates
+# and latency percentiles from the router's metrics.
+#
+#   python -m src.tests.hedge_test --requests 200
+import argparse
+import asyncio
+import statistics
+import time
+
+from pydantic_ai import Agent
+
+from src.core.config import settings
+from src.services.chat_service import build_router_model
+from src.services.model_router import breaker_opens, failovers, hedges, routed_requests, wins
+from src.tests.stub_model_server import StubBehaviour, StubServer
+
+PRIMARY = "openai:stub-primary"
+SECONDARY = "groq:stub-secondary"
+
+SCENARIOS = {
+    "healthy": (
+        StubBehaviour("primary", latency_ms=40, jitter_ms=20, seed=1),
+        StubBehaviour("secondary", latency_ms=40, jitter_ms=20, seed=2),
+    ),
+    "slow-tail": (
+        StubBehaviour("primary", latency_ms=40, jitter_ms=20, slow_rate=0.2, slow_ms=2000, seed=3),
+        StubBehaviour("secondary", latency_ms=60, jitter_ms=20, seed=4),
+    ),
+    "long-reply": (
+        StubBehaviour("primary", latency_ms=40, jitter_ms=20, token_ms=200, seed=7),
+        StubBehaviour("secondary", latency_ms=40, jitter_ms=20, seed=8),
+    ),
+    "primary-down": (
+        StubBehaviour("primary", latency_ms=20, error_rate=1.0, seed=5),
+        StubBehaviour("secondary", latency_ms=40, jitter_ms=20, seed=6),
+    ),
+}
+
+
+def counts() -> dict:
+    return {
+        name: dict(counter.values)
+        for name, counter in (("routed", routed_requests), ("hedges", hedges), ("wins", wins), ("failovers", failovers), ("opens", breaker_opens))
+    }
+
+
+def delta(before: dict, after: dict, name: str, *labels: str) -> float:
+    return after[name].get(labels, 0) - before[name].get(labels, 0)
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+async def run_scenario(name: str, requests: int, concurrency: int, hedge_delay: float) -> dict:
+    primary_behaviour, secondary_behaviour = SCENARIOS[name]
+    async with StubServer(primary_behaviour, 9111) as primary, StubServer(secondary_behaviour, 9112) as secondary:
+        settings.openai_base_url = f"{primary.url}/v1"
+        settings.groq_base_url = secondary.url
+        settings.model_hedge_delay = hedge_delay
+        agent = Agent(model=build_router_model(), instructions="Reply briefly.")
+        if name != "primary-down":
+            # Open both clients' connections first; TCP setup on a cold client would otherwise trigger hedges
+            await asyncio.gather(*(agent.run("warm up") for _ in range(concurrency)))
+
+        results = {}
+        for stream in (False, True):
+            before = counts()
+            latencies, replies = [], {}
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(i: int) -> None:
+                async with semaphore:
+                    started = time.perf_counter()
+                    if stream:
+                        async with agent.run_stream(f"request {i}") as result:
+                            output = await result.get_output()
+                    else:
+                        output = (await agent.run(f"request {i}")).output
+                    latencies.append(time.perf_counter() - started)
+                    winner = output.split()[-1].rstrip(".")
+                    replies[winner] = replies.get(winner, 0) + 1
+
+            await asyncio.gather(*(one(i) for i in range(requests)))
+            after = counts()
+            label = "true" if stream else "false"
+            routed = delta(before, after, "routed", label)
+            results["stream" if stream else "plain"] = {
+                "requests": requests,
+                "hedge_rate": delta(before, after, "hedges", label) / routed,
+                "primary_wins": sum(delta(before, after, "wins", PRIMARY, h) for h in ("true", "false")) / routed,
+                "secondary_wins": sum(delta(before, after, "wins", SECONDARY, h) for h in ("true", "false")) / routed,
+                "failovers": delta(before, after, "failovers", SECONDARY),
+                "breaker_opens": delta(before, after, "opens", PRIMARY),
+                "replies": replies,
+                "p50_ms": statistics.median(latencies) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+            }
+        # Let cancelled losers finish their cleanup before the stubs shut down
+        await asyncio.sleep(0.2)
+    return results
+
+
+def check(name: str, stats: dict, hedge_delay: float, failure_threshold: int, concurrency: int) -> None:
+    if name in ("healthy", "long-reply"):
+        # The odd request can still cross the hedge delay on the client's own CPU time at this concurrency
+        assert stats["hedge_rate"] <= 0.02, stats
+        assert stats["primary_wins"] == 1, stats
+    elif name == "slow-tail":
+        # ~20% of primary requests stall for 2s; those are hedged and answered by the secondary
+        assert 0.08 <= stats["hedge_rate"] <= 0.35, stats
+        assert stats["secondary_wins"] >= 0.8 * stats["hedge_rate"], stats
+        assert stats["p99_ms"] < (hedge_delay + 1.0) * 1000, stats
+    elif name == "primary-down":
+        # Everything is still answered; only requests already sent when the breaker opened paid for a failover
+        assert stats["replies"] == {"secondary": stats["requests"]}, stats
+        assert stats["failovers"] <= failure_threshold + concurrency, stats
+
+
+async def main(requests: int, concurrency: int, hedge_delay: float) -> None:
+    settings.model_primary = PRIMARY
+    settings.model_secondary = SECONDARY
+    # Long enough that an opened breaker stays open for the rest of the scenario
+    settings.model_breaker_cooldown = 60.0
+    settings.model_breaker_latency_budget = 1.0
+    print(f"{'scenario':13} {'mode':6} {'hedged':>7} {'primary':>8} {'secondary':>10} {'failovers':>9} {'opens':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    for name in SCENARIOS:
+        for mode, stats in (await run_scenario(name, requests, concurrency, hedge_delay)).items():
+            print(
+                f"{name:13} {mode:6} {stats['hedge_rate']:>7.1%} {stats['primary_wins']:>8.1%} {stats['secondary_wins']:>10.1%} "
+                f"{stats['failovers']:>9.0f} {stats['breaker_opens']:>6.0f} {stats['p50_ms']:>8.1f} {stats['p99_ms']:>8.1f}"
+            )
+            check(name, stats, hedge_delay, settings.model_breaker_failures, concurrency)
+    print("All hedging checks passed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hedged model routing against local stub providers")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and mode")
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--hedge-delay", type=float, default=0.3, help="seconds before the secondary is also asked")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.hedge_delay))
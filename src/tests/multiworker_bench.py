@@ -0,0 +1,177 @@
+# Multi-worker benchmark: src.serve with WORKERS forked from one preloaded master,
+# against the same number of separate uvicorn processes that each load everything
+# themselves. For each worker count it measures:
+#
+#   ready_s      time from launch until every process answers /api/v1/health
+#   pss_mb       proportional set size summed over the processes, so pages shared
+#                copy-on-write or through the snapshot mapping are counted once
+#   private_mb   pages only one process maps, summed
+#   rps          POST /api/v1/jobs/search throughput from --concurrency clients
+#
+# The load generator runs on the same machine, so RPS only scales with workers
+# while there are spare cores. Writes the results as JSON and exits 1 if a
+# src.serve worker costs more than --max-worker-pss-mb of PSS.
+#
+#   JOB_INDEX_ENABLED=true python -m src.tests.multiworker_bench --workers 1 2 4 --duration 15
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import httpx
+
+# get_jobs filters as the chat client's "show more" sends them
+SEARCHES = [
+    {},
+    {"title": "actor"},
+    {"title": "dancer", "city": "mumbai"},
+    {"job_type": "full-time", "min_salary": 50000},
+    {"title": "director", "country": "india"},
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def children(pid: int) -> list[int]:
+    path = Path(f"/proc/{pid}/task/{pid}/children")
+    return [int(child) for child in path.read_text().split()] if path.exists() else []
+
+
+def memory_kb(pid: int) -> dict[str, int]:
+    fields = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        name, value = line.split(":", 1)
+        fields[name] = int(value.split()[0])
+    return {"pss": fields["Pss"], "private": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def launch(mode: str, workers: int, env: dict) -> tuple[list[subprocess.Popen], list[int]]:
+    if mode == "serve":
+        port = free_port()
+        command = [sys.executable, "-m", "src.serve", "--port", str(port), "--log-level", "warning"]
+        return [subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)], [port]
+    servers, ports = [], []
+    for _ in range(workers):
+        port = free_port()
+        command = [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"]
+        servers.append(subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE))
+        ports.append(port)
+    return servers, ports
+
+
+def wait_ready(mode: str, servers: list[subprocess.Popen], ports: list[int], workers: int, timeout: float) -> None:
+    started = time.monotonic()
+    pending = set(ports)
+    while pending or (mode == "serve" and len(children(servers[0].pid)) < workers):
+        if time.monotonic() - started > timeout:
+            raise RuntimeError(f"not ready within {timeout}s")
+        for server in servers:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited during startup:\n{server.stderr.read().decode()}")
+        for port in list(pending):
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/v1/health", timeout=1) as response:
+                    if json.load(response).get("status") == "ok":
+                        pending.discard(port)
+            except (urllib.error.URLError, ConnectionError):
+                pass
+        time.sleep(0.05)
+
+
+def measure_memory(servers: list[subprocess.Popen], mode: str) -> dict:
+    pids = [server.pid for server in servers]
+    if mode == "serve":
+        pids += children(servers[0].pid)
+    totals = [memory_kb(pid) for pid in pids]
+    return {
+        "processes": len(pids),
+        "pss_mb": round(sum(total["pss"] for total in totals) / 1024, 1),
+        "private_mb": round(sum(total["private"] for total in totals) / 1024, 1),
+    }
+
+
+async def measure_rps(ports: list[int], concurrency: int, duration: float) -> dict:
+    completed, errors = 0, 0
+    deadline = time.perf_counter() + duration
+
+    async def client(n: int) -> None:
+        nonlocal completed, errors
+        url = f"http://127.0.0.1:{ports[n % len(ports)]}/api/v1/jobs/search"
+        async with httpx.AsyncClient(timeout=30) as http:
+            while time.perf_counter() < deadline:
+                response = await http.post(url, json=SEARCHES[n % len(SEARCHES)])
+                if response.status_code == 200:
+                    completed += 1
+                else:
+                    errors += 1
+                n += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(concurrency)))
+    return {"rps": round(completed / (time.perf_counter() - started), 1), "errors": errors}
+
+
+def run(mode: str, workers: int, args) -> dict:
+    env = dict(os.environ, WORKERS=str(workers))
+    started = time.monotonic()
+    servers, ports = launch(mode, workers, env)
+    try:
+        wait_ready(mode, servers, ports, workers, args.timeout)
+        result = {"mode": mode, "workers": workers, "ready_s": round(time.monotonic() - started, 1)}
+        # Let the background loops finish their first round before taking the numbers
+        time.sleep(args.settle)
+        result |= asyncio.run(measure_rps(ports, args.concurrency, args.duration))
+        result |= measure_memory(servers, mode)
+        print(f"{mode} x{workers}: {result}", file=sys.stderr)
+        return result
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory and throughput of src.serve against separate uvicorn processes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds of load per run")
+    parser.add_argument("--settle", type=float, default=3.0, help="seconds between ready and the load")
+    parser.add_argument("--timeout", type=float, default=600.0, help="seconds to wait for every worker")
+    parser.add_argument("--skip-separate", action="store_true", help="only measure src.serve")
+    parser.add_argument("--max-worker-pss-mb", type=float, help="fail if a src.serve worker costs more PSS than this")
+    parser.add_argument("--out", help="write the JSON result here instead of stdout")
+    args = parser.parse_args()
+
+    modes = ["serve"] if args.skip_separate else ["serve", "separate"]
+    runs = [run(mode, workers, args) for workers in args.workers for mode in modes]
+    for result in runs:
+        result["pss_mb_per_worker"] = round(result["pss_mb"] / result["workers"], 1)
+
+    output = json.dumps({"python": sys.version.split()[0], "cpus": os.cpu_count(), "runs": runs}, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    failures = [
+        f"{result['workers']} workers: {result['pss_mb_per_worker']}MB PSS per worker > {args.max_worker_pss_mb}MB"
+        for result in runs
+        if result["mode"] == "serve" and args.max_worker_pss_mb is not None
+        and result["pss_mb_per_worker"] > args.max_worker_pss_mb
+    ]
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,108 @@
+# Checks that what the agent sends ahead of the per-user block - the tool
+# definitions, then the compiled prompt.md - is byte-identical for every user,
+# message and turn, so the provider's prompt cache can serve it. Fully offline:
+# the real agent runs against a model function that records each request.
+#
+#   stable      tool definitions and instructions for different profiles and
+#               messages, first turns and follow-ups, share the whole prefix
+#   suffix      what follows the prefix is exactly the user's compact block
+#   compiler    minify keeps every word, compiles the same bytes every time and
+#               is a no-op on its own output
+#   cacheable   the shared prefix is long enough for the provider to cache it
+#
+# Prints tokens per prompt section. Pass --digest to also fail when the prefix
+# changes at all, e.g. pinned in CI next to prompt.md.
+#
+#   python -m src.tests.prompt_prefix_test
+import argparse
+import asyncio
+import dataclasses
+import json
+
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from src.schemas.user import UserProfile
+from src.services.chat_service import AgentDeps, get_agent
+from src.services.history_service import estimate_tokens
+from src.services.prompt_compiler import PROMPT_PATH, compile_prompt, get_prompt, minify, user_suffix
+
+# OpenAI caches prompts from 1024 tokens on; shorter prefixes are never cached
+MIN_CACHEABLE_TOKENS = 1024
+
+PROFILES = [
+    UserProfile(
+        first_name="Asha", last_name="Rao", availability="Weekends", role="Actress", city="Pune", country="India",
+        bio="Trained in Kathak.\n\n   Five years of   regional theatre.", skills=["dance", "singing"],
+    ),
+    UserProfile(),
+    UserProfile(first_name="José", last_name="Müller", role="Voice Artist", city="Berlin", country="Germany", bio="x" * 2000),
+]
+MESSAGES = ["hello", "find me voice over jobs in Chicago", "jobs for me"]
+
+
+def recorder(requests: list[tuple[str, str]]) -> FunctionModel:
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        tools = json.dumps([dataclasses.asdict(tool) for tool in info.function_tools], sort_keys=True)
+        requests.append((tools, messages[-1].instructions))
+        return ModelResponse(parts=[TextPart("Here you go.")])
+
+    return FunctionModel(respond)
+
+
+async def render(profile: UserProfile, message: str, history: list[ModelMessage] | None = None) -> tuple[str, str, list[ModelMessage]]:
+    requests: list[tuple[str, str]] = []
+    # No tool runs against the recording model, so the run never touches the pool
+    deps = AgentDeps.model_construct(user_profile=profile, pool=None, user_id=None, tool_results={})
+    with get_agent().override(model=recorder(requests)):
+        result = await get_agent().run(user_prompt=message, deps=deps, message_history=history)
+    tools, instructions = requests[-1]
+    return tools, instructions, result.all_messages()
+
+
+async def stable() -> tuple[str, int]:
+    prefix = get_prompt().prefix
+    rendered = []
+    for profile in PROFILES:
+        for message in MESSAGES:
+            tools, instructions, messages = await render(profile, message)
+            rendered.append((profile, tools, instructions))
+            # A follow-up turn carries the history, which goes after the instructions
+            tools, instructions, _ = await render(profile, "anything in Mumbai?", messages)
+            rendered.append((profile, tools, instructions))
+
+    tool_definitions = {tools for _, tools, _ in rendered}
+    assert len(tool_definitions) == 1, "tool definitions differ between requests"
+    for profile, _, instructions in rendered:
+        assert instructions.startswith(prefix + "\n\n"), "instructions don't start with the compiled prompt"
+        assert instructions[len(prefix) + 2:] == user_suffix(profile), instructions[len(prefix):]
+    print(f"stable     {len(rendered)} requests share tools and a {len(prefix)}-character prompt")
+    print(f"suffix     {min(len(i) - len(prefix) for _, _, i in rendered)}-{max(len(i) - len(prefix) for _, _, i in rendered)} characters per user")
+    return tool_definitions.pop(), estimate_tokens(prefix)
+
+
+def compiler() -> None:
+    source = PROMPT_PATH.read_text(encoding="utf-8")
+    compiled = get_prompt()
+    assert source.replace("**", "").split() == compiled.prefix.split(), "minify dropped or reordered words"
+    assert compile_prompt(source) == compiled and minify(compiled.prefix) == compiled.prefix
+    print(f"compiler   {compiled.source_tokens} -> {compiled.tokens} tokens, digest {compiled.digest}")
+
+
+async def main(digest: str | None) -> None:
+    print(get_prompt().report())
+    tools, prompt_tokens = await stable()
+    compiler()
+    shared = estimate_tokens(tools) + prompt_tokens
+    print(f"cacheable  ~{shared} shared tokens (tools ~{estimate_tokens(tools)}, prompt ~{prompt_tokens})")
+    assert shared >= MIN_CACHEABLE_TOKENS, f"shared prefix of ~{shared} tokens is too short to be cached"
+    if digest is not None:
+        assert get_prompt().digest == digest, f"prefix digest {get_prompt().digest} != expected {digest}"
+    print("All prompt prefix checks passed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Byte-stable shared prompt prefix checks")
+    parser.add_argument("--digest", help="fail unless the compiled prompt has this digest")
+    args = parser.parse_args()
+    asyncio.run(main(args.digest))
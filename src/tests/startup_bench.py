@@ -0,0 +1,108 @@
+# Cold-start benchmark. Each run uses a fresh interpreter, as a new container
+# or autoscaled worker would, and measures:
+#
+#   import_ms         time to import src.main
+#   first_request_ms  time from launching uvicorn to the first successful
+#                     /api/v1/health response (import + lifespan + first request)
+#
+# Writes min/median/max as JSON and exits 1 if a median is over its budget.
+# The app's environment (DB_URL, API keys, ...) is passed through unchanged.
+#
+#   python -m src.tests.startup_bench --runs 5 --max-import-ms 1500 --max-first-request-ms 4000
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import src.main; "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def summary(samples: list[float]) -> dict:
+    return {
+        "min": round(min(samples), 1),
+        "median": round(statistics.median(samples), 1),
+        "max": round(max(samples), 1),
+    }
+
+
+def measure_import() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(timeout: float) -> float:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api/v1/health"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited during startup:\n{server.stderr.read().decode()}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if json.load(response).get("status") == "ok":
+                        return (time.perf_counter() - started) * 1000
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f"no successful response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time and time-to-first-request for src.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for the first response")
+    parser.add_argument("--skip-server", action="store_true", help="only measure import time")
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import time is over this")
+    parser.add_argument("--max-first-request-ms", type=float, help="fail if the median time to first request is over this")
+    parser.add_argument("--out", help="write the JSON result here instead of stdout")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    result = {"runs": args.runs, "python": sys.version.split()[0], "import_ms": summary(imports)}
+    if not args.skip_server:
+        result["first_request_ms"] = summary([measure_first_request(args.timeout) for _ in range(args.runs)])
+
+    output = json.dumps(result, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    failures = []
+    if args.max_import_ms is not None and result["import_ms"]["median"] > args.max_import_ms:
+        failures.append(f"median import {result['import_ms']['median']}ms > {args.max_import_ms}ms")
+    if (args.max_first_request_ms is not None and "first_request_ms" in result
+            and result["first_request_ms"]["median"] > args.max_first_request_ms):
+        failures.append(
+            f"median first request {result['first_request_ms']['median']}ms > {args.max_first_request_ms}ms"
+        )
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,170 @@
+# Local stand-in for the OpenAI and Groq chat completions APIs, for testing the
+# hedged model router offline. It answers every request with a short text reply
+# naming the server, after a configurable time to first token, then a token
+# every --token-ms. A share of requests can be made slow (the tail) or fail with a 500.
+#
+# Point the app at two of them to run it without any provider:
+#
+#   python -m src.tests.stub_model_server --name openai --port 9101 --latency-ms 300 --slow-rate 0.1 &
+#   python -m src.tests.stub_model_server --name groq --port 9102 --latency-ms 200 &
+#   OPENAI_BASE_URL=http://127.0.0.1:9101/v1 GROQ_BASE_URL=http://127.0.0.1:9102 uvicorn src.main:app
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+
+
+@dataclass
+class StubBehaviour:
+    name: str
+    latency_ms: float = 100.0
+    jitter_ms: float = 0.0
+    # Share of requests that take slow_ms instead of latency_ms
+    slow_rate: float = 0.0
+    slow_ms: float = 3000.0
+    # Time between tokens after the first; a plain request waits for all of them
+    token_ms: float = 0.0
+    # Share of requests answered with HTTP 500
+    error_rate: float = 0.0
+    seed: int = 0
+
+
+def create_app(behaviour: StubBehaviour) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(behaviour.seed)
+
+    def first_token_delay() -> float:
+        if rng.random() < behaviour.slow_rate:
+            return behaviour.slow_ms / 1000
+        return (behaviour.latency_ms + rng.uniform(0, behaviour.jitter_ms)) / 1000
+
+    async def completions(request: Request):
+        try:
+            body = await request.json()
+        except ClientDisconnect:
+            # The router cancelled this request because the other provider answered first
+            return Response(status_code=499)
+        model = body.get("model", "stub")
+        failing = rng.random() < behaviour.error_rate
+        delay = first_token_delay()
+        words = f"Reply from {behaviour.name}.".split(" ")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        usage = {"prompt_tokens": 20, "completion_tokens": len(words), "total_tokens": 20 + len(words)}
+
+        await asyncio.sleep(delay)
+        if failing:
+            return JSONResponse(
+                {"error": {"message": f"{behaviour.name} stub failure", "type": "server_error", "code": None}},
+                status_code=500,
+            )
+
+        if not body.get("stream"):
+            await asyncio.sleep((len(words) - 1) * behaviour.token_ms / 1000)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        def chunk(delta: dict, finish_reason=None, **extra) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            yield chunk({"role": "assistant", "content": words[0]})
+            for word in words[1:]:
+                await asyncio.sleep(behaviour.token_ms / 1000)
+                yield chunk({"content": " " + word})
+            yield chunk({}, "stop", usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    # OpenAI clients post to {base_url}/chat/completions, Groq's to {base_url}/openai/v1/chat/completions
+    app.add_api_route("/v1/chat/completions", completions, methods=["POST"])
+    app.add_api_route("/openai/v1/chat/completions", completions, methods=["POST"])
+    return app
+
+
+class StubServer:
+    """
+    Runs a stub server in a child process, so its work doesn't share the event
+    loop (and skew the latencies) of the client under test.
+    """
+
+    def __init__(self, behaviour: StubBehaviour, port: int):
+        self.behaviour = behaviour
+        self.port = port
+        self._process = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def __aenter__(self) -> "StubServer":
+        b = self.behaviour
+        self._process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "src.tests.stub_model_server", "--name", b.name, "--port", str(self.port),
+            "--latency-ms", str(b.latency_ms), "--jitter-ms", str(b.jitter_ms), "--slow-rate", str(b.slow_rate),
+            "--slow-ms", str(b.slow_ms), "--token-ms", str(b.token_ms), "--error-rate", str(b.error_rate), "--seed", str(b.seed),
+        )
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", self.port)
+                writer.close()
+                return self
+            except OSError:
+                if self._process.returncode is not None or time.monotonic() > deadline:
+                    await self.__aexit__()
+                    raise RuntimeError(f"Stub server {b.name} did not start on port {self.port}")
+                await asyncio.sleep(0.05)
+
+    async def __aexit__(self, *exc) -> None:
+        if self._process.returncode is None:
+            self._process.terminate()
+        await self._process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI/Groq-compatible stub chat completions server")
+    parser.add_argument("--name", default="stub", help="appears in every reply, to tell servers apart")
+    parser.add_argument("--port", type=int, default=9101)
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of requests that take --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=3000.0)
+    parser.add_argument("--token-ms", type=float, default=0.0, help="time between tokens after the first")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail with 500")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    behaviour = StubBehaviour(
+        name=args.name, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms, token_ms=args.token_ms, error_rate=args.error_rate, seed=args.seed,
+    )
+    uvicorn.run(create_app(behaviour), host="127.0.0.1", port=args.port, log_level="warning")
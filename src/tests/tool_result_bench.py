@@ -0,0 +1,120 @@
+# Cost of a get_jobs result after the search itself, before and after typed tool
+# results. "json" is the old path: the tool returned json.dumps of the whole
+# envelope, run_chat json.loads'ed it back out of the message parts, and FastAPI
+# encoded the response with jsonable_encoder + json.dumps. "typed" is the current
+# path: the model gets JobSearchResult.for_model(), run_chat reads the result
+# from deps, and the response is encoded with src.core.encoding.dumps.
+#
+# Reports tokens the model receives per tool call (estimated like the history
+# budget) and CPU time per response. Fully offline; no database or model.
+#
+#   python -m src.tests.tool_result_bench --jobs 10 --iterations 20000
+import argparse
+import json
+import random
+import string
+import time
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, ToolCallPart, ToolReturnPart, UserPromptPart
+
+from src.core.encoding import dumps
+from src.dependencies.tools import JobSearchResult, encode_cursor
+from src.services.chat_service import build_response
+from src.services.history_service import estimate_tokens
+
+TITLE_WORDS = ["Lead", "Supporting", "Actor", "Actress", "Voice", "Over", "Artist", "Dancer", "Film", "Theatre", "Commercial", "Role"]
+REPLY = "I found several acting jobs in Mumbai, including lead and supporting roles. Want me to narrow them down?"
+
+
+def sample_result(jobs: int, seed: int) -> JobSearchResult:
+    rng = random.Random(seed)
+    filters = {
+        "title": "actor", "min_salary": None, "max_salary": None, "city": "Mumbai", "country": None,
+        "job_type": "Full-time", "job_category": None, "currency": None,
+    }
+    return JobSearchResult(
+        jobs=[
+            {
+                # cuid-style IDs, like the ones Prisma generates
+                "job_id": "c" + "".join(rng.choices(string.ascii_lowercase + string.digits, k=24)),
+                "title": " ".join(rng.sample(TITLE_WORDS, 3)),
+            }
+            for _ in range(jobs)
+        ],
+        total_found=137,
+        total_is_estimate=False,
+        next_cursor=encode_cursor(filters, (datetime(2025, 1, 1), "job_00000001"), 137, False),
+        filters_applied={**filters, "limit": jobs},
+    )
+
+
+def messages_with(content: str) -> list:
+    call = ToolCallPart(tool_name="get_jobs", args={"title": "actor", "city": "Mumbai", "job_type": "Full-time"})
+    return [
+        ModelRequest(parts=[UserPromptPart(content="Find me full-time acting jobs in Mumbai")]),
+        ModelResponse(parts=[call]),
+        ModelRequest(parts=[ToolReturnPart(tool_name="get_jobs", content=content, tool_call_id=call.tool_call_id)]),
+        ModelResponse(parts=[TextPart(content=REPLY)]),
+    ]
+
+
+def json_envelope(tool_data: dict, final_text_reply: str) -> dict:
+    # build_response as it was when it read the parsed JSON dict
+    return {"response_type": "structured", "message": {
+        "type": "job_search_results",
+        "message": final_text_reply or "Here are the job opportunities I found:",
+        "data": tool_data.get("jobs", []),
+        "search_params": {
+            "filters_used": tool_data.get("filters_applied"),
+            "results_count": tool_data.get("total_found"),
+            "results_count_is_estimate": tool_data.get("total_is_estimate", False),
+            "next_cursor": tool_data.get("next_cursor"),
+        },
+    }}
+
+
+def json_path(result: JobSearchResult) -> bytes:
+    content = json.dumps(result.as_dict(), default=str)
+    tool_data, reply = None, ""
+    for message in messages_with(content):
+        for part in message.parts:
+            if isinstance(part, ToolReturnPart):
+                tool_data = json.loads(part.content)
+            elif isinstance(part, TextPart):
+                reply = part.content
+    response = jsonable_encoder(json_envelope(tool_data, reply))
+    return json.dumps(response, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def typed_path(result: JobSearchResult) -> bytes:
+    messages_with(result.for_model())
+    return dumps(build_response(result, REPLY))
+
+
+def cpu_us(path, result: JobSearchResult, iterations: int) -> float:
+    started = time.process_time()
+    for _ in range(iterations):
+        path(result)
+    return (time.process_time() - started) / iterations * 1_000_000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tokens per tool call and CPU per response, JSON vs typed tool results")
+    parser.add_argument("--jobs", type=int, default=10, help="jobs in the result page")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    result = sample_result(args.jobs, args.seed)
+    # Both paths must send the client the same response
+    assert json.loads(json_path(result)) == json.loads(typed_path(result))
+
+    rows = {
+        "json": (json.dumps(result.as_dict(), default=str), json_path),
+        "typed": (result.for_model(), typed_path),
+    }
+    print(f"{'path':6} {'tool chars':>10} {'tool tokens':>12} {'cpu us/response':>16}")
+    for name, (content, path) in rows.items():
+        print(f"{name:6} {len(content):>10} {estimate_tokens(content):>12} {cpu_us(path, result, args.iterations):>16.1f}")